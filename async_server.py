@@ -0,0 +1,371 @@
+"""asyncio front end for the analyzer, with HTTP/1.1 keep-alive and pipelining.
+
+An alternative to ``server.main()`` for clients that send many small
+requests, such as editors re-analyzing on every keystroke. One event loop
+owns every connection, and a connection stays open between requests.
+Pipelined requests are read ahead and answered concurrently, and their
+responses are written back in request order. Analyses run on a thread
+pool through ``AnalyzerHandler.lookup_request`` and ``run_analysis``, the
+two halves of ``analyze_request``. Both servers therefore share the result
+cache, admission control, deadlines and metrics.
+
+Served: ``POST /api/analyze``, ``GET /api/cache``, ``GET /metrics`` and the
+static frontend. Streaming and batch requests need ``server.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from server import (
+    CORS_HEADERS,
+    JSON_CONTENT_TYPE,
+    METRICS,
+    AnalysisJob,
+    AnalyzerHandler,
+    STATIC_ASSETS,
+    close_request_log,
+    exit_on_sigterm,
+    gzip_body,
+    metric_endpoint,
+)
+
+MAX_HEADER_BYTES = 64 * 1024
+# Requests read ahead of the response being written on one connection.
+PIPELINE_DEPTH = 16
+THREADED_ONLY = "streaming and batch requests are served by server.py"
+# Responses that carry neither a body nor Content-Length (RFC 9110 8.6).
+BODYLESS_STATUSES = frozenset({HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED})
+
+Response = Tuple[HTTPStatus, bytes, Dict[str, str]]
+
+
+class HTTPError(Exception):
+    """A request that cannot be parsed; answered with ``status`` and the connection closed."""
+
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Request:
+    method: str
+    target: str
+    version: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def path(self) -> str:
+        return urlparse(self.target).path
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+def parse_head(head: bytes) -> Request:
+    """Parse a request line and headers, up to and including the blank line."""
+    try:
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line") from None
+    if version not in ("HTTP/1.0", "HTTP/1.1"):
+        raise HTTPError(HTTPStatus.HTTP_VERSION_NOT_SUPPORTED, f"unsupported version {version}")
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep or not name or name != name.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed header line")
+        headers[name.lower()] = value.strip()
+    return Request(method, target, version, headers)
+
+
+def body_limit(request: Request) -> int:
+    if request.method == "POST" and request.path == "/api/analyze":
+        return AnalyzerHandler.admission.max_body_bytes
+    # Nothing else served here reads a body; allow a small one and ignore it.
+    return 64 * 1024
+
+
+def encode_response(status: HTTPStatus, body: bytes, headers: Dict[str, str], keep_alive: bool) -> bytes:
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    lines.extend(f"{name}: {value}" for name, value in CORS_HEADERS.items())
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    bodyless = status in BODYLESS_STATUSES
+    if not bodyless:
+        lines.append(f"Content-Length: {len(body)}")
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (b"" if bodyless else body)
+
+
+def _json_error(status: HTTPStatus, message: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    return status, json.dumps({"error": message}).encode("utf-8"), {"Content-Type": JSON_CONTENT_TYPE, **(headers or {})}
+
+
+class AsyncAnalyzerServer:
+    """Serves connections on one event loop, analyses on ``executor``.
+
+    Analysis requests are first validated and looked up in the result cache
+    on ``lookups``; only cache misses move on to ``executor``, where they may
+    wait for an analysis slot, so cache hits never queue behind them. The
+    default executor has a thread for every analysis slot and queue place of
+    the admission control, so that requests over the limit are turned away at
+    once rather than piling up in the executor's own queue.
+    """
+
+    def __init__(
+        self, executor: Optional[ThreadPoolExecutor] = None, lookups: Optional[ThreadPoolExecutor] = None
+    ) -> None:
+        admission = AnalyzerHandler.admission
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=admission.concurrency + admission.queue_size + 1, thread_name_prefix="analyze"
+        )
+        self.lookups = lookups or ThreadPoolExecutor(thread_name_prefix="lookup")
+        self.idle_timeout = AnalyzerHandler.timeout
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(
+            self.handle_connection, host, port, limit=MAX_HEADER_BYTES, backlog=128
+        )
+        return self._server
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+        self.lookups.shutdown(wait=False)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        admission = AnalyzerHandler.admission
+        if self.connections >= admission.max_connections:
+            admission.reject("connections")
+            status, body, headers = _json_error(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "server is at its connection limit",
+                {"Retry-After": str(admission.retry_after)},
+            )
+            writer.write(encode_response(status, body, headers, keep_alive=False))
+            await self._close(writer)
+            return
+
+        self.connections += 1
+        # Responses in request order; None marks the end of the connection.
+        pending: asyncio.Queue = asyncio.Queue(PIPELINE_DEPTH)
+        sender = asyncio.ensure_future(self._send_responses(pending, writer))
+        try:
+            await self._read_requests(reader, pending)
+        finally:
+            await pending.put(None)
+            await sender
+            self.connections -= 1
+            await self._close(writer)
+
+    async def _read_requests(self, reader: asyncio.StreamReader, pending: asyncio.Queue) -> None:
+        while True:
+            try:
+                request = await self._read_request(reader, pending)
+            except HTTPError as exc:
+                status, body, headers = _json_error(exc.status, str(exc))
+                await pending.put(_ready((status, body, headers, False)))
+                return
+            except (asyncio.TimeoutError, ConnectionError):
+                return
+            if request is None:
+                return
+            await pending.put(asyncio.ensure_future(self._respond(request)))
+            if not request.keep_alive:
+                return
+
+    async def _read_request(self, reader: asyncio.StreamReader, pending: asyncio.Queue) -> Optional[Request]:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+        except asyncio.IncompleteReadError as exc:
+            if exc.partial.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "connection closed mid-request") from None
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "request headers too large") from None
+        request = parse_head(head.lstrip(b"\r\n"))
+
+        if "transfer-encoding" in request.headers:
+            raise HTTPError(HTTPStatus.NOT_IMPLEMENTED, "chunked request bodies are not supported")
+        try:
+            length = int(request.headers.get("content-length", "0"))
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        limit = body_limit(request)
+        if length > limit:
+            AnalyzerHandler.admission.reject("body_too_large")
+            raise HTTPError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"request body is {length} bytes; the limit is {limit}"
+            )
+        if length and request.headers.get("expect", "").lower() == "100-continue":
+            # The interim response must not overtake earlier pipelined ones.
+            await pending.join()
+            await pending.put(_ready(None))
+        try:
+            request.body = await asyncio.wait_for(reader.readexactly(length), self.idle_timeout)
+        except asyncio.IncompleteReadError:
+            return None
+        return request
+
+    async def _send_responses(self, pending: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        broken = False
+        while True:
+            item = await pending.get()
+            try:
+                if item is None:
+                    return
+                result = await item
+                if broken:
+                    continue
+                if result is None:
+                    writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                else:
+                    writer.write(encode_response(*result))
+                await writer.drain()
+            except ConnectionError:
+                broken = True
+            finally:
+                pending.task_done()
+
+    async def _respond(self, request: Request) -> Tuple[HTTPStatus, bytes, Dict[str, str], bool]:
+        endpoint = metric_endpoint(request.method, request.path)
+        capture: dict = {"raw": request.body}
+        METRICS.inc("analyzer_http_requests_in_flight")
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            status, body, headers = await self._route(request, endpoint, capture)
+        except Exception as exc:  # pragma: no cover
+            status, body, headers = _json_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"request failed: {exc}")
+        try:
+            return status, body, headers, request.keep_alive
+        finally:
+            seconds = time.perf_counter() - start
+            METRICS.inc("analyzer_http_requests_in_flight", amount=-1)
+            METRICS.observe("analyzer_http_request_duration_seconds", seconds, (("endpoint", endpoint),))
+            if AnalyzerHandler.request_log is not None:
+                AnalyzerHandler.request_log.record(
+                    request.method, request.target, int(status), started, seconds, request.headers, capture
+                )
+            METRICS.inc(
+                "analyzer_http_requests_total",
+                (("endpoint", endpoint), ("method", request.method), ("status", str(int(status)))),
+            )
+
+    async def _route(self, request: Request, endpoint: str, capture: dict) -> Response:
+        loop = asyncio.get_running_loop()
+        path = request.path
+        if request.method == "OPTIONS":
+            return HTTPStatus.NO_CONTENT, b"", {}
+        if request.method == "GET":
+            if path == "/api/cache":
+                stats = AnalyzerHandler.cache.stats()
+                return HTTPStatus.OK, json.dumps(stats).encode("utf-8"), {"Content-Type": JSON_CONTENT_TYPE}
+            if path == "/metrics":
+                body = METRICS.render().encode("utf-8")
+                return HTTPStatus.OK, body, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+            if path == "/api/analyze/stream":
+                return _json_error(HTTPStatus.NOT_IMPLEMENTED, THREADED_ONLY)
+            # Served from memory; only a stat per request touches the disk.
+            return STATIC_ASSETS.response(
+                path,
+                request.headers.get("if-none-match"),
+                request.headers.get("if-modified-since"),
+                request.headers.get("accept-encoding"),
+            )
+        if request.method == "POST":
+            if path == "/api/analyze":
+                answer = await loop.run_in_executor(self.lookups, _lookup, request, endpoint, capture)
+                if isinstance(answer, AnalysisJob):
+                    answer = await loop.run_in_executor(
+                        self.executor, _run_analysis, answer, request, endpoint, capture
+                    )
+                return answer
+            if path in ("/api/analyze/stream", "/api/analyze/batch"):
+                return _json_error(HTTPStatus.NOT_IMPLEMENTED, THREADED_ONLY)
+            return _json_error(HTTPStatus.NOT_FOUND, "Not found")
+        return _json_error(HTTPStatus.NOT_IMPLEMENTED, f"unsupported method {request.method}")
+
+    @staticmethod
+    async def _close(writer: asyncio.StreamWriter) -> None:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def _lookup(request: Request, endpoint: str, capture: dict) -> Union[Response, AnalysisJob]:
+    answer = AnalyzerHandler.lookup_request(request.body, endpoint, capture)
+    return answer if isinstance(answer, AnalysisJob) else _json_response(request, *answer)
+
+
+def _run_analysis(job: AnalysisJob, request: Request, endpoint: str, capture: dict) -> Response:
+    return _json_response(request, *AnalyzerHandler.run_analysis(job, endpoint, capture))
+
+
+def _json_response(request: Request, status: HTTPStatus, body: bytes, headers: Dict[str, str]) -> Response:
+    # Compressed here too, so large responses are not gzipped on the event loop.
+    headers = {"Content-Type": JSON_CONTENT_TYPE, **headers}
+    return status, gzip_body(body, headers, request.headers.get("accept-encoding")), headers
+
+
+def _ready(value) -> asyncio.Future:
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(value)
+    return future
+
+
+async def serve(host: str, port: int) -> None:
+    server = AsyncAnalyzerServer()
+    listener = await server.start(host, port)
+    print(f"Server running at http://{host}:{port} (asyncio)")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main() -> None:
+    host = "0.0.0.0"
+    port = int(os.environ.get("PORT", 8000))
+    if os.environ.get("ANALYSIS_BACKEND", "thread") == "process":
+        # Start and warm the workers before accepting connections.
+        AnalyzerHandler.use_pool = True
+        AnalyzerHandler.pool()
+    exit_on_sigterm()
+    try:
+        asyncio.run(serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_request_log()
+
+
+if __name__ == "__main__":
+    main()
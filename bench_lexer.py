@@ -0,0 +1,59 @@
+import argparse
+import time
+from pathlib import Path
+
+from compiler_analyzer.lexer import ENGINES, Lexer
+
+ROOT = Path(__file__).resolve().parent
+
+
+def build_corpus(target_lines: int) -> str:
+    files = sorted((ROOT / "samples").glob("*.c")) + sorted((ROOT / "examples" / "c").glob("*.c"))
+    chunks = [path.read_text(encoding="utf-8") for path in files]
+    corpus = "\n".join(chunks)
+    repeat = max(1, target_lines // max(1, corpus.count("\n")))
+    return "\n".join([corpus] * repeat)
+
+
+def build_literal_corpus(target_lines: int) -> str:
+    block = (
+        '#include "vendor/generated/include/path/for/a/rather/deep/header.h"\n'
+        "/* " + "generated documentation text " * 8 + "*/\n"
+        'static const char *banner = "' + "x" * 200 + '";\n'
+    )
+    return block * max(1, target_lines // 3)
+
+
+def bench(engine: str, source: str, rounds: int, stream: bool = False) -> tuple[int, float]:
+    lexer = Lexer(engine)
+    tokenize = lexer.tokenize_stream if stream else lexer.tokenize
+    best = float("inf")
+    count = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        tokens, _ = tokenize(source)
+        best = min(best, time.perf_counter() - start)
+        count = len(tokens)
+    return count, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lexer engine throughput benchmark")
+    parser.add_argument("--lines", type=int, default=50000, help="Approximate size of the synthetic input")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds per engine (best is reported)")
+    args = parser.parse_args()
+
+    corpora = [
+        ("samples", build_corpus(args.lines)),
+        ("literals", build_literal_corpus(args.lines)),
+    ]
+    for name, source in corpora:
+        print(f"Input '{name}': {source.count(chr(10)) + 1} lines, {len(source)} chars")
+        runs = [(engine, engine, False) for engine in ENGINES] + [("stream", "regex", True)]
+        for label, engine, stream in runs:
+            count, seconds = bench(engine, source, args.rounds, stream)
+            print(f"  {label:6} {count:9} tokens  {seconds * 1000:9.1f} ms  {count / seconds:12,.0f} tokens/sec")
+
+
+if __name__ == "__main__":
+    main()
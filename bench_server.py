@@ -0,0 +1,160 @@
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+SERVERS = {
+    "threaded": "server.py",
+    "asyncio": "async_server.py",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(script: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port))
+    process = subprocess.Popen(
+        [sys.executable, str(ROOT / script)], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{script} did not start listening on port {port}")
+
+
+def request_body(client: int, index: int, distinct: bool, tag: str = "") -> bytes:
+    # Distinct sources miss the result cache; the same one measures the HTTP path.
+    suffix = f" /* {tag}{client}-{index} */" if distinct else ""
+    source = "int main() {\n    int s = 0;\n    for (int i = 0; i < n; i++) { s = s + i; }\n    return s;\n}" + suffix
+    return json.dumps({"source": source}).encode("utf-8")
+
+
+def run_clients(
+    port: int, clients: int, requests: int, distinct: bool, tag: str = ""
+) -> tuple[list[float], int, float]:
+    latencies: list[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(number: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        for index in range(requests):
+            start = time.perf_counter()
+            try:
+                # http.client reconnects by itself when the server closed the connection.
+                conn.request("POST", "/api/analyze", request_body(number, index, distinct, tag))
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                ok = False
+            mine.append(time.perf_counter() - start)
+            if not ok:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def run_pipelined(port: int, clients: int, requests: int, depth: int, distinct: bool) -> tuple[int, int, float]:
+    """Each client writes ``depth`` requests at a time on one connection, then reads the responses."""
+    done = [0, 0]
+    lock = threading.Lock()
+
+    def client(number: int) -> None:
+        sock = socket.create_connection(("127.0.0.1", port))
+        reader = sock.makefile("rb")
+        ok = 0
+        for first in range(0, requests, depth):
+            batch = []
+            for index in range(first, min(first + depth, requests)):
+                body = request_body(number, index, distinct, "pipelined")
+                head = f"POST /api/analyze HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n"
+                batch.append(head.encode("latin-1") + body)
+            sock.sendall(b"".join(batch))
+            for _ in batch:
+                status = int(reader.readline().split()[1])
+                length = 0
+                for line in iter(reader.readline, b"\r\n"):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                reader.read(length)
+                ok += status == 200
+        sock.close()
+        with lock:
+            done[0] += ok
+            done[1] += requests - ok
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return done[0], done[1], time.perf_counter() - start
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the threaded and asyncio HTTP front ends")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client")
+    parser.add_argument("--distinct", action="store_true", help="Give every request its own source (cache misses)")
+    parser.add_argument("--pipeline", type=int, default=8, help="Pipeline depth for the asyncio server (0 to skip)")
+    args = parser.parse_args()
+
+    total = args.clients * args.requests
+    print(f"{args.clients} clients x {args.requests} requests, {'distinct' if args.distinct else 'repeated'} sources")
+    for name, script in SERVERS.items():
+        port = free_port()
+        process = start_server(script, port)
+        try:
+            run_clients(port, args.clients, 5, args.distinct, "warmup")
+            latencies, errors, seconds = run_clients(port, args.clients, args.requests, args.distinct)
+            print(
+                f"  {name:9} {total / seconds:9,.0f} req/s  p50 {percentile(latencies, 0.5) * 1000:7.2f} ms"
+                f"  p99 {percentile(latencies, 0.99) * 1000:7.2f} ms  errors {errors}"
+            )
+            if name == "asyncio" and args.pipeline:
+                ok, failed, seconds = run_pipelined(port, args.clients, args.requests, args.pipeline, args.distinct)
+                print(f"  {'pipelined':9} {total / seconds:9,.0f} req/s  depth {args.pipeline}  errors {failed}")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
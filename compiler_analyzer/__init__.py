@@ -1,9 +1,19 @@
+from .deadline import AnalysisCancelled, Deadline
 from .engine import CompilerAnalyzer
-from .models import AnalysisReport, Diagnostic, Token
+from .instrumentation import PhaseObserver
+from .models import AnalysisReport, Diagnostic, PhaseTiming, Token
+from .tokens import TokenStream
+from .unit import CompilationUnit
 
 __all__ = [
     "CompilerAnalyzer",
+    "AnalysisCancelled",
     "AnalysisReport",
+    "CompilationUnit",
+    "Deadline",
     "Diagnostic",
+    "PhaseObserver",
+    "PhaseTiming",
     "Token",
+    "TokenStream",
 ]
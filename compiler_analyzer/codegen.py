@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
 
 from .models import IRInstruction
 
+if TYPE_CHECKING:
+    from .deadline import Deadline
+
 
 class CodeGenerator:
-    def generate(self, ir: List[IRInstruction]) -> List[str]:
+    def generate(self, ir: List[IRInstruction], deadline: Optional[Deadline] = None) -> List[str]:
         target: List[str] = []
         register_map = {}
         registers = ["R1", "R2", "R3", "R4", "R5", "R6"]
@@ -29,6 +32,8 @@ class CodeGenerator:
 
         for ins in ir:
             if ins.op == "FUNC_BEGIN":
+                if deadline is not None:
+                    deadline.check()
                 target.append(f"{ins.result}:")
                 target.append("  PUSH BP")
                 target.append("  MOV BP, SP")
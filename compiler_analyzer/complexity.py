@@ -2,7 +2,10 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .deadline import Deadline
 
 
 @dataclass
@@ -21,7 +24,7 @@ class LoopFactor:
 
 
 class ComplexityAnalyzer:
-    def analyze(self, source: str) -> ComplexityResult:
+    def analyze(self, source: str, deadline: Optional[Deadline] = None) -> ComplexityResult:
         steps: List[str] = []
         lines = source.splitlines()
 
@@ -33,8 +36,10 @@ class ComplexityAnalyzer:
             steps.append(f"Final time complexity: {complexity}.")
             return ComplexityResult(complexity=complexity, steps=steps)
 
-        recursion = self._detect_recursion(source)
-        loop_factors, max_factor = self._analyze_loops(lines)
+        if deadline is not None:
+            deadline.check()
+        recursion = self._detect_recursion(source, deadline)
+        loop_factors, max_factor = self._analyze_loops(lines, deadline)
 
         for line_no, factor, reason in loop_factors:
             steps.append(f"Line {line_no}: {reason} -> contributes {self._format_factor(factor)}.")
@@ -103,7 +108,9 @@ class ComplexityAnalyzer:
 
         return None
 
-    def _analyze_loops(self, lines: List[str]) -> tuple[List[Tuple[int, LoopFactor, str]], LoopFactor]:
+    def _analyze_loops(
+        self, lines: List[str], deadline: Optional[Deadline] = None
+    ) -> tuple[List[Tuple[int, LoopFactor, str]], LoopFactor]:
         records: List[Tuple[int, LoopFactor, str]] = []
         stack: List[LoopFactor] = []
         scope_stack: List[str] = []
@@ -115,6 +122,8 @@ class ComplexityAnalyzer:
             line = raw.strip()
             if not line:
                 continue
+            if deadline is not None:
+                deadline.check()
 
             loop_factor, reason = self._classify_loop_line(line)
             if loop_factor is not None:
@@ -270,7 +279,7 @@ class ComplexityAnalyzer:
             return "O(2^n)"
         return "O(n)"
 
-    def _detect_recursion(self, source: str) -> dict:
+    def _detect_recursion(self, source: str, deadline: Optional[Deadline] = None) -> dict:
         """Analyze recursion using recursion tree methodology: pattern, depth, and work.
         
         Returns:
@@ -297,6 +306,8 @@ class ComplexityAnalyzer:
         for fn in set(function_names):
             if fn == "main":
                 continue
+            if deadline is not None:
+                deadline.check()
             
             # Find function body
             start = None
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+
+class AnalysisCancelled(Exception):
+    """Raised inside a phase once its ``Deadline`` has passed or been cancelled."""
+
+
+class Deadline:
+    """Cooperative time limit for one analysis.
+
+    ``Deadline(seconds)`` expires that long after it is created (never, for
+    ``None``), and ``cancel`` ends it at once from any thread. Phases call
+    ``check`` from their main loops; ``CompilerAnalyzer`` turns the resulting
+    ``AnalysisCancelled`` into a report marked ``truncated``. A single long
+    regular-expression match cannot be interrupted this way; hard limits for
+    those are the process pool's job.
+    """
+
+    __slots__ = ("expires_at", "_cancelled")
+
+    def __init__(self, seconds: Optional[float] = None) -> None:
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    @property
+    def expired(self) -> bool:
+        return self._cancelled or (self.expires_at is not None and time.monotonic() >= self.expires_at)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a time limit."""
+        if self._cancelled:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def check(self) -> None:
+        if self.expired:
+            raise AnalysisCancelled("analysis deadline exceeded" if not self._cancelled else "analysis cancelled")
@@ -1,50 +1,240 @@
 from __future__ import annotations
 
-from typing import List
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from .codegen import CodeGenerator
 from .complexity import ComplexityAnalyzer
+from .deadline import AnalysisCancelled, Deadline
+from .incremental import FunctionCache
+from .instrumentation import MemoryTracing, PhaseObserver, PhaseTimer
 from .ir import IRGenerator
-from .lexer import Lexer
+from .lexer import Lexer, SourceBuffer
 from .models import AnalysisReport, ExprNode, ExpressionRecord
 from .optimizer import Optimizer
 from .parser import Parser
 from .reporter import ReportFormatter
 from .semantic import SemanticAnalyzer
+from .unit import CompilationUnit
+
+
+PHASES = ("lexical", "syntax", "parse_tree", "semantic", "ir", "optimization", "codegen", "complexity")
+
+# The phases whose results each phase reads. Complexity works on the raw text.
+PHASE_REQUIRES = {
+    "lexical": (),
+    "syntax": ("lexical",),
+    "parse_tree": ("syntax",),
+    "semantic": ("syntax",),
+    "ir": ("syntax",),
+    "optimization": ("ir",),
+    "codegen": ("optimization",),
+    "complexity": (),
+}
+
+
+def resolve_phases(phases: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    """The phases to run for ``phases`` and everything they need, in pipeline order.
+
+    ``None`` selects the whole pipeline. Unknown names raise ``ValueError``.
+    """
+    if phases is None:
+        return PHASES
+    selected = set()
+    pending = list(phases)
+    while pending:
+        phase = pending.pop()
+        if phase not in PHASE_REQUIRES:
+            raise ValueError(f"unknown phase {phase!r}")
+        if phase not in selected:
+            selected.add(phase)
+            pending.extend(PHASE_REQUIRES[phase])
+    return tuple(phase for phase in PHASES if phase in selected)
 
 
 class CompilerAnalyzer:
-    def __init__(self) -> None:
-        self.lexer = Lexer()
+    def __init__(self, incremental: bool = False, trace_memory: bool = False) -> None:
+        """``incremental`` keeps per-function results between ``analyze`` calls.
+
+        It pays off when the same analyzer sees successive versions of one
+        program (an editor session); reports are identical either way.
+
+        Every report lists the wall and CPU time of each phase in
+        ``timings``; ``trace_memory`` adds ``tracemalloc`` allocation figures,
+        at a large cost in speed while it is on.
+
+        The phases keep no state between calls, so a plain analyzer can be
+        shared by any number of threads. An incremental analyzer's cache is
+        shared state; its ``analyze`` calls take turns.
+        """
+        self.lexer = Lexer("regex")
         self.ir_generator = IRGenerator()
         self.optimizer = Optimizer()
         self.codegen = CodeGenerator()
         self.complexity = ComplexityAnalyzer()
         self.semantic = SemanticAnalyzer()
+        self.cache: Optional[FunctionCache] = FunctionCache() if incremental else None
+        self._cache_lock = threading.Lock()
+        self.trace_memory = trace_memory
+        self.observers: List[PhaseObserver] = []
+
+    def add_observer(self, observer: PhaseObserver) -> None:
+        """Call ``observer`` around every phase of later analyses."""
+        self.observers.append(observer)
 
-    def analyze(self, source: str) -> AnalysisReport:
-        report = AnalysisReport(source=source)
+    def remove_observer(self, observer: PhaseObserver) -> None:
+        self.observers.remove(observer)
 
-        report.tokens, report.lexical_errors = self.lexer.tokenize(source)
+    def analyze(
+        self,
+        source: SourceBuffer,
+        phases: Optional[Iterable[str]] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> AnalysisReport:
+        """Analyze ``source``; ``phases`` limits the work to those phases.
+
+        The phases each selected phase depends on run as well (see
+        ``resolve_phases``); the report fields of the others keep their
+        defaults.
+
+        When ``deadline`` expires (or is cancelled) the phase that is running
+        stops at its next check and the report comes back with ``truncated``
+        set; ``phases_completed`` lists the phases whose results it holds.
+        """
+        report = AnalysisReport(source=source if isinstance(source, str) else "")
+        for _ in self._iterate(report, source, resolve_phases(phases), deadline):
+            pass
+        return report
 
-        parser = Parser(report.tokens)
-        parse_result = parser.parse()
-        report.syntax_errors = parse_result.errors
-        report.parse_tree = self._build_parse_tree(parse_result.expressions)
+    def analyze_iter(
+        self,
+        source: SourceBuffer,
+        phases: Optional[Iterable[str]] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Iterator[Tuple[str, AnalysisReport]]:
+        """Run the pipeline, yielding ``(phase, report)`` as each phase finishes.
 
-        report.semantic_errors, report.semantic_warnings = self.semantic.analyze(report.tokens, parse_result.expressions)
+        Phases come in the order of ``PHASES``; the report is the same object
+        every time, filled in up to and including that phase, so a caller can
+        publish results while later phases are still running. ``phases`` and
+        ``deadline`` work as in ``analyze``; only the phases that run to
+        completion are yielded.
+        """
+        report = AnalysisReport(source=source if isinstance(source, str) else "")
+        yield from self._iterate(report, source, resolve_phases(phases), deadline)
 
-        report.ir = self.ir_generator.generate(report.tokens, parse_result.expressions)
-        report.optimized_ir, report.optimizations_applied = self.optimizer.optimize(report.ir)
-        report.target_code = self.codegen.generate(report.optimized_ir)
+    def _iterate(
+        self, report: AnalysisReport, source: SourceBuffer, selected: Tuple[str, ...], deadline: Optional[Deadline]
+    ) -> Iterator[Tuple[str, AnalysisReport]]:
+        if self.cache is None:
+            yield from self._measure(report, self._run(report, source, selected, deadline), selected, deadline)
+            return
+        with self._cache_lock:
+            yield from self._measure(report, self._run(report, source, selected, deadline), selected, deadline)
 
-        complexity_result = self.complexity.analyze(source)
+    def _measure(
+        self,
+        report: AnalysisReport,
+        steps: Iterator[str],
+        selected: Tuple[str, ...],
+        deadline: Optional[Deadline],
+    ) -> Iterator[Tuple[str, AnalysisReport]]:
+        # ``_run`` yields exactly the selected phases, in order, so the phase
+        # about to run is known before resuming it.
+        observers = list(self.observers)
+        with MemoryTracing(self.trace_memory):
+            for phase in selected:
+                if deadline is not None and deadline.expired:
+                    report.truncated = True
+                    return
+                for observer in observers:
+                    observer.phase_started(phase)
+                timer = PhaseTimer(phase, self.trace_memory)
+                timer.start()
+                try:
+                    next(steps)
+                except AnalysisCancelled:
+                    report.truncated = True
+                timing = timer.stop()
+                report.timings.append(timing)
+                if not report.truncated:
+                    report.phases_completed.append(phase)
+                for observer in observers:
+                    observer.phase_finished(phase, report, timing)
+                if report.truncated:
+                    return
+                yield phase, report
+
+    def _run(
+        self, report: AnalysisReport, source: SourceBuffer, selected: Tuple[str, ...], deadline: Optional[Deadline]
+    ) -> Iterator[str]:
+        cache = self.cache
+
+        if "lexical" in selected:
+            if cache is not None and isinstance(source, str):
+                report.tokens, report.lexical_errors = cache.lex(self.lexer, source)
+            else:
+                if cache is not None:
+                    cache.forget_source()
+                report.tokens, report.lexical_errors = self.lexer.tokenize_stream(source)
+            yield "lexical"
+
+        if "syntax" in selected:
+            # Filtered tokens and indexes every phase reads, built once.
+            unit = CompilationUnit.build(report.tokens)
+            if cache is not None:
+                cache.begin()
+
+            parser = Parser(unit, cache, deadline)
+            parse_result = parser.parse()
+            report.syntax_errors = parse_result.errors
+            yield "syntax"
+
+        if "parse_tree" in selected:
+            report.parse_tree = self._build_parse_tree(parse_result.expressions, deadline)
+            yield "parse_tree"
+
+        if "semantic" in selected:
+            # Scope checks follow the raw braces, not parse_result.program.
+            report.semantic_errors, report.semantic_warnings = self.semantic.analyze(
+                unit, parse_result.expressions, deadline
+            )
+            yield "semantic"
+
+        if "ir" in selected:
+            report.ir = self.ir_generator.generate(
+                unit, parse_result.expressions, parse_result.program, cache, deadline
+            )
+            yield "ir"
+
+        if "optimization" in selected:
+            folded = cache.fold(self.optimizer, report.ir) if cache is not None else None
+            report.optimized_ir, report.optimizations_applied = self.optimizer.optimize(report.ir, folded, deadline)
+            if cache is not None:
+                cache.finish()
+            yield "optimization"
+        elif cache is not None and "syntax" in selected:
+            # Keep what this run cached; functions whose IR was not built
+            # this time are lowered again by the next full run.
+            cache.finish()
+
+        if "codegen" in selected:
+            report.target_code = self.codegen.generate(report.optimized_ir, deadline)
+            yield "codegen"
+
+        if "complexity" not in selected:
+            return
+        if not isinstance(source, str):
+            # Byte buffers such as memory-mapped files are lexed in place; the
+            # text-based complexity pass is the first phase that needs a str.
+            report.source = str(source, "utf-8")
+        # Line-based: its steps are keyed by source line.
+        complexity_result = self.complexity.analyze(report.source, deadline)
         report.complexity = complexity_result.complexity
         report.complexity_steps = complexity_result.steps
+        yield "complexity"
 
-        return report
-
-    def _build_parse_tree(self, expressions: List[ExpressionRecord]) -> str:
+    def _build_parse_tree(self, expressions: List[ExpressionRecord], deadline: Optional[Deadline] = None) -> str:
         if not expressions:
             return "No parse tree nodes available."
 
@@ -54,6 +244,8 @@ class CompilerAnalyzer:
         for idx, record in enumerate(expressions, start=1):
             if record.expr is None:
                 continue
+            if deadline is not None:
+                deadline.check()
             rendered_count += 1
             target_suffix = f" -> {record.target}" if record.target else ""
             lines.append(f"[{idx}] {record.context} (line {record.line}){target_suffix}")
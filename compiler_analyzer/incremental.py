@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, replace
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from .ir import relocate_instructions
+from .lexer import Lexer
+from .models import Diagnostic, ExpressionRecord, IRInstruction, Statement
+from .optimizer import Optimizer
+from .tokens import TokenStream
+from .unit import CLOSERS, OPENERS, CompilationUnit
+
+
+@dataclass
+class _ParsedFunction:
+    # Positions are stored relative to the function's first token and line.
+    node: Statement
+    expressions: List[ExpressionRecord]
+    errors: List[Diagnostic]
+
+
+@dataclass
+class _LoweredFunction:
+    # Labels are numbered from 1 and lines relative to the function's first line.
+    ir: List[IRInstruction]
+    label_count: int
+    folded: Optional[List[IRInstruction]] = None
+    fold_log: Optional[List[str]] = None
+
+
+@dataclass
+class _Segment:
+    key: Optional[Hashable]
+    length: int
+    first_label: int
+    line: int
+
+
+class FunctionCache:
+    """Per-function results carried from one analysis to the next.
+
+    Each top-level function definition is fingerprinted by its tokens
+    (values, kinds, columns and lines relative to its first line) plus the
+    token that follows it, which the parser may peek at. A function whose
+    fingerprint was seen in the previous analysis reuses its parse result,
+    its IR and its constant-folded IR, shifted to its new token index, line
+    and label numbers; only the other functions are processed again.
+
+    Only self-contained definitions are cached: every bracket in them must
+    match inside the definition, so the parser never looked past it.
+    Lexing reuses the previous token stream through ``Lexer.relex``. Phases
+    that look at the whole program (semantic checks, dead-code and common
+    subexpression elimination, code generation, complexity) always rerun.
+
+    Entries not used by the latest analysis are dropped, so the cache holds
+    one program's worth of functions.
+    """
+
+    def __init__(self) -> None:
+        self._source: Optional[str] = None
+        self._tokens: Optional[TokenStream] = None
+        self._lexical_errors: List[Diagnostic] = []
+        self._parsed: Dict[Hashable, _ParsedFunction] = {}
+        self._lowered: Dict[Hashable, _LoweredFunction] = {}
+        self.begin()
+
+    def begin(self) -> None:
+        """Start an analysis, discarding what an interrupted one left behind."""
+        self._next_parsed: Dict[Hashable, _ParsedFunction] = {}
+        self._next_lowered: Dict[Hashable, _LoweredFunction] = {}
+        # Fingerprints of this run's cacheable functions, by first token index.
+        self._keys: Dict[int, Hashable] = {}
+        self._segments: List[_Segment] = []
+
+    def lex(self, lexer: Lexer, source: str) -> Tuple[TokenStream, List[Diagnostic]]:
+        """Tokenize ``source``, re-lexing only what changed since the last call."""
+        if self._source is None:
+            stream, errors = lexer.tokenize_stream(source)
+        else:
+            old = self._source
+            prefix = _common_prefix(old, source)
+            suffix = _common_suffix(old, source, min(len(old), len(source)) - prefix)
+            result = lexer.relex(
+                self._tokens,
+                prefix,
+                len(old) - prefix - suffix,
+                source[prefix : len(source) - suffix],
+                self._lexical_errors,
+            )
+            stream, errors = result.stream, result.errors
+        self._source, self._tokens, self._lexical_errors = source, stream, errors
+        return stream, list(errors)
+
+    def forget_source(self) -> None:
+        """Drop the previous token stream, e.g. after analyzing a byte buffer."""
+        self._source, self._tokens, self._lexical_errors = None, None, []
+
+    def parsed(
+        self, unit: CompilationUnit, start: int
+    ) -> Optional[Tuple[Statement, List[ExpressionRecord], List[Diagnostic]]]:
+        """Cached parse of the function definition starting at token ``start``, if any."""
+        key = _fingerprint(unit, start)
+        if key is None:
+            return None
+        entry = self._parsed.get(key)
+        if entry is None:
+            return None
+        self._next_parsed[key] = entry
+        self._keys[start] = key
+        line = unit.tokens.lines[start]
+        return (
+            _shift_statement(entry.node, start, line),
+            [replace(record, line=record.line + line) for record in entry.expressions],
+            [replace(error, line=error.line + line) for error in entry.errors],
+        )
+
+    def store_parsed(
+        self,
+        unit: CompilationUnit,
+        node: Statement,
+        expressions: List[ExpressionRecord],
+        errors: List[Diagnostic],
+    ) -> None:
+        if node.kind != "function" or not node.body or node.body[0] is None:
+            return
+        key = _fingerprint(unit, node.start)
+        if key is None or node.end != node.start + len(key[0]):
+            return
+        line = unit.tokens.lines[node.start]
+        self._next_parsed[key] = _ParsedFunction(
+            node=_shift_statement(node, -node.start, -line),
+            expressions=[replace(record, line=record.line - line) for record in expressions],
+            errors=[replace(error, line=error.line - line) for error in errors],
+        )
+        self._keys[node.start] = key
+
+    def lowered(self, node: Statement, first_label: int) -> Optional[Tuple[List[IRInstruction], int]]:
+        """Cached IR for ``node`` with labels numbered after ``first_label``."""
+        key = self._keys.get(node.start)
+        entry = self._lowered.get(key) if key is not None else None
+        if entry is None:
+            return None
+        self._next_lowered[key] = entry
+        self._segments.append(_Segment(key, len(entry.ir), first_label, node.line))
+        return relocate_instructions(entry.ir, first_label, node.line), entry.label_count
+
+    def store_lowered(
+        self, node: Statement, instructions: List[IRInstruction], first_label: int, label_count: int
+    ) -> None:
+        key = self._keys.get(node.start)
+        self._segments.append(_Segment(key, len(instructions), first_label, node.line))
+        if key is not None:
+            self._next_lowered[key] = _LoweredFunction(
+                ir=relocate_instructions(instructions, -first_label, -node.line),
+                label_count=label_count,
+            )
+
+    def fold(self, optimizer: Optimizer, ir: List[IRInstruction]) -> Tuple[List[IRInstruction], List[str]]:
+        """``optimizer.fold(ir)``, reusing the folded IR of unchanged functions."""
+        if sum(segment.length for segment in self._segments) != len(ir):
+            # Not built function by function (e.g. the no-function placeholder).
+            return optimizer.fold(ir)
+        folded: List[IRInstruction] = []
+        log: List[str] = []
+        pos = 0
+        for segment in self._segments:
+            piece = ir[pos : pos + segment.length]
+            pos += segment.length
+            entry = self._next_lowered.get(segment.key) if segment.key is not None else None
+            if entry is None:
+                piece_folded, piece_log = optimizer.fold(piece)
+            elif entry.folded is None:
+                piece_folded, piece_log = optimizer.fold(piece)
+                entry.folded = relocate_instructions(piece_folded, -segment.first_label, -segment.line)
+                entry.fold_log = piece_log
+            else:
+                piece_folded = relocate_instructions(entry.folded, segment.first_label, segment.line)
+                piece_log = entry.fold_log
+            folded.extend(piece_folded)
+            log.extend(piece_log)
+        return folded, log
+
+    def finish(self) -> None:
+        """End an analysis: keep only the entries it used or produced."""
+        self._parsed, self._lowered = self._next_parsed, self._next_lowered
+        self.begin()
+
+
+def _fingerprint(unit: CompilationUnit, start: int) -> Optional[Hashable]:
+    """Key for the function definition starting at ``start``, or None.
+
+    The definition runs to the brace closing the first ``{`` at its own
+    depth; it is only eligible when all of its brackets match inside it.
+    """
+    values = unit.values
+    depths = unit.depths
+    partners = unit.partners
+    count = len(values)
+    depth = depths[start]
+    end = -1
+    for i in range(start, count):
+        v = values[i]
+        if depths[i] == depth and v in {";", "{"}:
+            if v == "{" and partners[i] > i:
+                end = partners[i] + 1
+            break
+    if end < 0:
+        return None
+    for i in range(start, end):
+        if values[i] in OPENERS or values[i] in CLOSERS:
+            if not start <= partners[i] < end:
+                return None
+
+    tokens = unit.tokens
+    first_line = tokens.lines[start]
+    if end < count:
+        lookahead = (values[end], tokens.kind_ids[end], tokens.lines[end] - first_line, tokens.columns[end])
+    else:
+        lookahead = None
+    return (
+        values[start:end],
+        tokens.kind_ids[start:end].tobytes(),
+        array("i", [line - first_line for line in tokens.lines[start:end]]).tobytes(),
+        tokens.columns[start:end].tobytes(),
+        lookahead,
+    )
+
+
+def _shift_statement(node: Statement, index_delta: int, line_delta: int) -> Statement:
+    return Statement(
+        kind=node.kind,
+        line=node.line + line_delta,
+        start=node.start + index_delta,
+        end=node.end + index_delta,
+        name=node.name,
+        parts=[range(part.start + index_delta, part.stop + index_delta) for part in node.parts],
+        body=[
+            _shift_statement(child, index_delta, line_delta) if child is not None else None
+            for child in node.body
+        ],
+    )
+
+
+def _common_prefix(a: str, b: str) -> int:
+    # Binary search over slice comparisons, so the scanning happens in C.
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid : len(a) - lo] == b[len(b) - mid : len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import threading
+import time
+import tracemalloc
+from typing import Optional
+
+from .models import AnalysisReport, PhaseTiming
+
+
+class PhaseObserver:
+    """Hooks called around every phase ``CompilerAnalyzer`` runs.
+
+    Subclass and override either method, then register the instance with
+    ``CompilerAnalyzer.add_observer``. Observers run on the analyzing thread,
+    inside the measured time of neither phase. A phase stopped by its
+    deadline is still reported as finished, with ``report.truncated`` set.
+    """
+
+    def phase_started(self, phase: str) -> None:
+        pass
+
+    def phase_finished(self, phase: str, report: AnalysisReport, timing: PhaseTiming) -> None:
+        pass
+
+
+class PhaseTimer:
+    """Measures one phase: ``start()`` before it runs, ``stop()`` after."""
+
+    def __init__(self, phase: str, trace_memory: bool = False) -> None:
+        self.phase = phase
+        self.trace_memory = trace_memory and tracemalloc.is_tracing()
+        self._wall = 0.0
+        self._cpu = 0.0
+        self._memory = 0
+
+    def start(self) -> None:
+        if self.trace_memory:
+            self._memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._cpu = time.thread_time()
+        self._wall = time.perf_counter()
+
+    def stop(self) -> PhaseTiming:
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        allocated: Optional[int] = None
+        peak: Optional[int] = None
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            allocated, peak = current - self._memory, max(peak - self._memory, 0)
+        return PhaseTiming(self.phase, wall, cpu, allocated, peak)
+
+
+class MemoryTracing:
+    """Context manager keeping ``tracemalloc`` on while analyses run.
+
+    Tracing is process-wide; it starts with the first analysis that asks for
+    it and stops when the last one still running finishes, unless something
+    else had started it.
+    """
+
+    _users = 0
+    _owned = False
+    _lock = threading.Lock()
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def __enter__(self) -> "MemoryTracing":
+        if self.enabled:
+            cls = type(self)
+            with cls._lock:
+                if cls._users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    cls._owned = True
+                cls._users += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.enabled:
+            cls = type(self)
+            with cls._lock:
+                cls._users -= 1
+                if cls._users == 0 and cls._owned:
+                    tracemalloc.stop()
+                    cls._owned = False
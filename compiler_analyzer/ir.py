@@ -1,144 +1,216 @@
 from __future__ import annotations
 
-from typing import List
-
-from .models import ExpressionRecord, IRInstruction, Token
+import re
+from dataclasses import replace
+from typing import TYPE_CHECKING, List, Optional, Sequence, Union
+
+from .models import ExpressionRecord, IRInstruction, Statement, Token
+from .parser import Parser
+from .unit import CompilationUnit
+
+if TYPE_CHECKING:
+    from .deadline import Deadline
+    from .incremental import FunctionCache
+
+
+LABEL_OPS = {"LABEL", "GOTO", "IF_FALSE"}
+# Source positions are baked into some comments ("assign@12") and into the
+# placeholder condition of an empty if ("cond@12").
+_LINE_TAG = re.compile(r"(\w+)@(\d+)")
+
+
+def relocate_instructions(
+    instructions: Sequence[IRInstruction], label_delta: int, line_delta: int
+) -> List[IRInstruction]:
+    """Copy ``instructions`` with label numbers and source lines shifted.
+
+    Used to reuse one function's IR when the labels generated before it, or
+    the lines above it, have changed.
+    """
+    out: List[IRInstruction] = []
+    for ins in instructions:
+        changes = {}
+        if ins.op in LABEL_OPS and label_delta:
+            prefix, _, number = ins.result.rpartition("_")
+            changes["result"] = f"{prefix}_{int(number) + label_delta}"
+        if line_delta:
+            tag = _LINE_TAG.fullmatch(ins.comment)
+            if tag:
+                changes["comment"] = f"{tag.group(1)}@{int(tag.group(2)) + line_delta}"
+            if ins.op == "IF_FALSE":
+                tag = _LINE_TAG.fullmatch(ins.arg1)
+                if tag and tag.group(1) == "cond":
+                    changes["arg1"] = f"cond@{int(tag.group(2)) + line_delta}"
+        out.append(replace(ins, **changes))
+    return out
 
 
 class IRGenerator:
-    def __init__(self) -> None:
+    """Lowers parse results to three-address code.
+
+    The generator holds no per-run state: each ``generate`` call works on its
+    own ``_Lowering``, so one instance can serve concurrent analyses, and
+    label numbers start from 1 in every run.
+    """
+
+    def generate(
+        self,
+        tokens: Union[CompilationUnit, Sequence[Token]],
+        expressions: List[ExpressionRecord],
+        program: Optional[Statement] = None,
+        cache: Optional[FunctionCache] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> List[IRInstruction]:
+        """Lower the parser's statement tree to three-address code.
+
+        ``program`` is the tree from ``Parser.parse``; it is built here when
+        the caller does not already have one. With a ``cache``, functions whose
+        tokens are unchanged since the previous analysis reuse their IR.
+        """
+        unit = CompilationUnit.coerce(tokens)
+        if program is None:
+            program = Parser(unit).parse().program
+        run = _Lowering(unit, deadline)
+
+        for node in program.body:
+            if node.kind != "function" or not node.body or node.body[0] is None:
+                continue
+            if cache is None:
+                run.emit_function(node)
+                continue
+            first_label = run.label_index
+            reused = cache.lowered(node, first_label)
+            if reused is not None:
+                instructions, label_count = reused
+                run.ir.extend(instructions)
+                run.label_index += label_count
+            else:
+                start = len(run.ir)
+                run.emit_function(node)
+                cache.store_lowered(node, run.ir[start:], first_label, run.label_index - first_label)
+
+        if not run.ir:
+            run.ir.append(IRInstruction(op="NOP", comment="No intermediate representation generated."))
+        return run.ir
+
+
+class _Lowering:
+    """State of one ``IRGenerator.generate`` call."""
+
+    def __init__(self, unit: CompilationUnit, deadline: Optional[Deadline] = None) -> None:
+        self.tokens = unit.tokens
+        self._values = unit.values
+        self.deadline = deadline
+        self.ir: List[IRInstruction] = []
         self.label_index = 0
 
     def _new_label(self, prefix: str = "L") -> str:
         self.label_index += 1
         return f"{prefix}{self.label_index}"
 
-    def generate(self, tokens: List[Token], expressions: List[ExpressionRecord]) -> List[IRInstruction]:
-        self.tokens = [t for t in tokens if t.kind != "PREPROCESSOR"]
-        self.pos = 0
-        self.ir: List[IRInstruction] = []
-        self.expr_by_line = {e.line: e for e in expressions if e.expr is not None}
-
-        while not self._at_end():
-            if self._is_function_start():
-                self._parse_function()
-            else:
-                self.pos += 1
-
-        if not self.ir:
-            self.ir.append(IRInstruction(op="NOP", comment="No intermediate representation generated."))
-        return self.ir
-
-    def _parse_function(self) -> None:
-        fn = self.tokens[self.pos + 1].value
+    def emit_function(self, node: Statement) -> None:
+        fn = node.name
         self.ir.append(IRInstruction(op="FUNC_BEGIN", result=fn, comment=f"function {fn} entry"))
-
-        # Move to function body start.
-        while not self._at_end() and self._current().value != "{":
-            self.pos += 1
-        if self._current().value == "{":
-            self.pos += 1
-            self._parse_block()
+        self._emit_statement(node.body[0])
         self.ir.append(IRInstruction(op="FUNC_END", comment="function exit"))
 
-    def _parse_block(self) -> None:
-        while not self._at_end() and self._current().value != "}":
-            self._parse_statement()
-        if self._current().value == "}":
-            self.pos += 1
-
-    def _parse_statement(self) -> None:
-        t = self._current()
-        if t.value == "if":
-            self._parse_if()
-            return
-        if t.value == "while":
-            self._parse_while()
-            return
-        if t.value == "for":
-            self._parse_for()
+    def _emit_statement(self, node: Optional[Statement]) -> None:
+        if node is None:
             return
-        if t.value == "return":
-            self._parse_return()
-            return
-        if t.value == "{":
-            self.pos += 1
-            self._parse_block()
-            return
-        self._parse_linear_statement()
-
-    def _parse_if(self) -> None:
-        if_line = self._current().line
+        if self.deadline is not None:
+            self.deadline.check()
+        kind = node.kind
+        if kind == "block":
+            for child in node.body:
+                self._emit_statement(child)
+        elif kind == "if":
+            self._emit_if(node)
+        elif kind == "while":
+            self._emit_while(node, self._text(node.parts[0]), node.body[0])
+        elif kind == "for":
+            self._emit_for(node)
+        elif kind == "do":
+            self._emit_do(node)
+        elif kind == "return":
+            self._emit_return(node)
+        else:
+            self._emit_linear(range(node.start, node.end))
+
+    def _emit_if(self, node: Statement) -> None:
         else_label = self._new_label("IF_ELSE_")
         end_label = self._new_label("IF_END_")
-        self.pos += 1
-        cond = self._collect_paren_text()
-        self.ir.append(IRInstruction(op="IF_FALSE", arg1=cond or f"cond@{if_line}", result=else_label, comment="if condition false jump"))
-        self._parse_statement()
+        cond = self._text(node.parts[0])
+        self.ir.append(IRInstruction(op="IF_FALSE", arg1=cond or f"cond@{node.line}", result=else_label, comment="if condition false jump"))
+        self._emit_statement(node.body[0])
         self.ir.append(IRInstruction(op="GOTO", result=end_label, comment="if end jump"))
         self.ir.append(IRInstruction(op="LABEL", result=else_label, comment="else block"))
-        if self._current().value == "else":
-            self.pos += 1
-            self._parse_statement()
+        if len(node.body) > 1:
+            self._emit_statement(node.body[1])
         self.ir.append(IRInstruction(op="LABEL", result=end_label, comment="if merge"))
 
-    def _parse_while(self) -> None:
+    def _emit_while(self, node: Statement, cond: str, body: Optional[Statement]) -> None:
         start = self._new_label("WHILE_BEGIN_")
         end = self._new_label("WHILE_END_")
         self.ir.append(IRInstruction(op="LABEL", result=start, comment="while condition"))
-        self.pos += 1
-        cond = self._collect_paren_text()
         self.ir.append(IRInstruction(op="IF_FALSE", arg1=cond or "cond", result=end, comment="while exit"))
-        self._parse_statement()
+        self._emit_statement(body)
         self.ir.append(IRInstruction(op="GOTO", result=start, comment="while back-edge"))
         self.ir.append(IRInstruction(op="LABEL", result=end, comment="while end"))
 
-    def _parse_for(self) -> None:
+    def _emit_for(self, node: Statement) -> None:
         start = self._new_label("FOR_BEGIN_")
         update = self._new_label("FOR_UPDATE_")
         end = self._new_label("FOR_END_")
 
-        self.pos += 1
-        init_text, cond_text, update_text = self._collect_for_header()
+        init_text, cond_text, update_text = (self._text(part) for part in node.parts)
         if init_text:
             self.ir.append(IRInstruction(op="EXPR", arg1=init_text, comment="for init"))
         self.ir.append(IRInstruction(op="LABEL", result=start, comment="for condition"))
         self.ir.append(IRInstruction(op="IF_FALSE", arg1=cond_text or "true", result=end, comment="for exit"))
-        self._parse_statement()
+        self._emit_statement(node.body[0])
         self.ir.append(IRInstruction(op="LABEL", result=update, comment="for update"))
         if update_text:
             self.ir.append(IRInstruction(op="EXPR", arg1=update_text, comment="for update expr"))
         self.ir.append(IRInstruction(op="GOTO", result=start, comment="for back-edge"))
         self.ir.append(IRInstruction(op="LABEL", result=end, comment="for end"))
 
-    def _parse_return(self) -> None:
-        line = self._current().line
-        self.pos += 1
-        parts: List[str] = []
-        while not self._at_end() and self._current().value != ";":
-            parts.append(self._current().value)
-            self.pos += 1
-        if not self._at_end() and self._current().value == ";":
-            self.pos += 1
-        value = " ".join(parts).strip() or "0"
-        self.ir.append(IRInstruction(op="RETURN", arg1=value, comment=f"return@{line}"))
-
-    def _parse_linear_statement(self) -> None:
-        line = self._current().line
-        parts: List[str] = []
-        while not self._at_end() and self._current().value not in {";", "}", "{"}:
-            parts.append(self._current().value)
-            self.pos += 1
-        if self._current().value == ";":
-            self.pos += 1
-
-        text = " ".join(parts).strip()
+    def _emit_do(self, node: Statement) -> None:
+        # There is no dedicated do-while lowering: the 'do' keyword is kept as
+        # an expression marker, followed by the body and a while loop with an
+        # empty body for the trailing condition.
+        body = node.body[0]
+        if body is not None and body.kind == "block":
+            self._emit_linear(range(node.start, body.start))
+            self._emit_statement(body)
+        else:
+            self._emit_linear(range(node.start, body.end if body is not None else node.start + 1))
+        self._emit_while(node, self._text(node.parts[0]), None)
+
+    def _emit_return(self, node: Statement) -> None:
+        value = (self._text(node.parts[0]) if node.parts else "") or "0"
+        self.ir.append(IRInstruction(op="RETURN", arg1=value, comment=f"return@{node.line}"))
+
+    def _emit_linear(self, span: range) -> None:
+        # Braces and semicolons split the tokens into separate statements,
+        # e.g. the declarator and the values of a brace initializer.
+        values = self._values
+        first = span.start
+        for i in span:
+            if values[i] in {";", "{", "}"}:
+                self._emit_linear_statement(first, i)
+                first = i + 1
+        self._emit_linear_statement(first, span.stop)
+
+    def _emit_linear_statement(self, start: int, end: int) -> None:
+        text = " ".join(self._values[start:end]).strip()
         if not text:
             return
+        line = self.tokens.lines[start]
 
         if "=" in text and "==" not in text:
             lhs, rhs = text.split("=", 1)
-            lhs = lhs.strip().split()[-1]
+            # Damaged statements such as "= 1" have no target.
+            lhs = (lhs.split() or ["unknown"])[-1]
             rhs = rhs.strip()
             if "(" in rhs and rhs.endswith(")"):
                 fn = rhs[: rhs.index("(")].strip()
@@ -148,67 +220,11 @@ class IRGenerator:
             return
 
         if "(" in text and text.endswith(")"):
-            fn = text[: text.index("(")].split()[-1]
+            fn = (text[: text.index("(")].split() or ["unknown"])[-1]
             self.ir.append(IRInstruction(op="CALL", arg1=fn, comment=f"call@{line}"))
             return
 
         self.ir.append(IRInstruction(op="EXPR", arg1=text, comment=f"expr@{line}"))
 
-    def _collect_paren_text(self) -> str:
-        if self._current().value != "(":
-            return ""
-        self.pos += 1
-        depth = 1
-        parts: List[str] = []
-        while not self._at_end() and depth > 0:
-            t = self._current()
-            if t.value == "(":
-                depth += 1
-                parts.append(t.value)
-            elif t.value == ")":
-                depth -= 1
-                if depth > 0:
-                    parts.append(t.value)
-            else:
-                parts.append(t.value)
-            self.pos += 1
-        return " ".join(parts).strip()
-
-    def _collect_for_header(self) -> tuple[str, str, str]:
-        if self._current().value != "(":
-            return "", "", ""
-        self.pos += 1
-        sections: List[List[str]] = [[], [], []]
-        sec = 0
-        depth = 0
-        while not self._at_end():
-            t = self._current()
-            if t.value == "(":
-                depth += 1
-                sections[sec].append(t.value)
-            elif t.value == ")":
-                if depth == 0:
-                    self.pos += 1
-                    break
-                depth -= 1
-                sections[sec].append(t.value)
-            elif t.value == ";" and depth == 0:
-                sec = min(2, sec + 1)
-            else:
-                sections[sec].append(t.value)
-            self.pos += 1
-        return (" ".join(sections[0]).strip(), " ".join(sections[1]).strip(), " ".join(sections[2]).strip())
-
-    def _is_function_start(self) -> bool:
-        if self.pos + 2 >= len(self.tokens):
-            return False
-        a, b, c = self.tokens[self.pos], self.tokens[self.pos + 1], self.tokens[self.pos + 2]
-        return a.kind in {"TYPE", "KEYWORD"} and b.kind == "IDENTIFIER" and c.value == "("
-
-    def _current(self) -> Token:
-        if self.pos >= len(self.tokens):
-            return Token("EOF", "EOF", self.tokens[-1].line if self.tokens else 1, 1)
-        return self.tokens[self.pos]
-
-    def _at_end(self) -> bool:
-        return self.pos >= len(self.tokens)
+    def _text(self, span: range) -> str:
+        return " ".join(self._values[span.start : span.stop]).strip()
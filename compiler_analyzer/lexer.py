@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+import codecs
+import mmap
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, replace
+from typing import IO, Callable, Iterator, List, Optional, Tuple, Union
 
 from .models import Diagnostic, Token
+from .tokens import KIND_IDS, TokenStream
 
 
 KEYWORDS = {
@@ -24,9 +31,430 @@ MULTI_OPS = {
 SINGLE_OPS = set("+-*/%=<>!&|^~?:")
 SYMBOLS = set("(){}[];,.")
 
+ENGINES = ("scan", "regex")
+
+# One alternation for the whole token grammar, preceded by inline whitespace.
+# Branch order mirrors the character-by-character checks in
+# ``Lexer._tokenize_scan`` so both engines agree on every input. Non-ASCII
+# starts are routed to FALLBACK and classified with the same ``str`` predicates
+# the scan engine uses.
+_MASTER_PATTERN = r"[ \t\r]*(?:" + "|".join([
+    r"(?P<NEWLINE>\n)",
+    r"(?P<LINE_COMMENT>//[^\n]*)",
+    r"(?P<BLOCK_COMMENT>/\*[^*]*(?:\*+[^*/][^*]*)*(?:\*+(?P<COMMENT_CLOSE>/)|\**\Z))",
+    r"(?P<PREPROCESSOR>#[^\n]*)",
+    r'(?P<STRING>"[^"\\]*(?:\\[\s\S][^"\\]*)*(?:(?P<STRING_CLOSE>")|\\?\Z))',
+    r"(?P<CHAR>'[^'\\]*(?:\\[\s\S][^'\\]*)*(?:(?P<CHAR_CLOSE>')|\\?\Z))",
+    r"(?P<NUMBER>\.?[0-9][\w.]*)",
+    r"(?P<WORD>[A-Za-z_]\w*)",
+    r"(?P<FALLBACK>[^\x00-\x7f]|\.(?=[^\x00-\x7f]))",
+    "(?P<OPERATOR>" + "|".join(re.escape(op) for op in sorted(MULTI_OPS, key=len, reverse=True))
+    + "|[" + re.escape("".join(sorted(SINGLE_OPS))) + "])",
+    "(?P<SYMBOL>[" + re.escape("".join(sorted(SYMBOLS))) + "])",
+    r"(?P<INVALID>[^ \t\r])",
+]) + ")"
+_MASTER_RE = re.compile(_MASTER_PATTERN)
+# Same grammar over ASCII byte buffers (bytes, memoryview, mmap). Buffers with
+# any non-ASCII byte are decoded first, since columns count characters.
+_MASTER_RE_BYTES = re.compile(_MASTER_PATTERN.encode("ascii"))
+_NON_ASCII_BYTE_RE = re.compile(rb"[\x80-\xff]")
+_WORD_TAIL_RE = re.compile(r"\w*")
+_NUMBER_TAIL_RE = re.compile(r"[\w.]*")
+
+
+_WORD_KINDS = {**{kw: "KEYWORD" for kw in KEYWORDS}, **{ty: "TYPE" for ty in TYPES}}
+_WORD_KIND_IDS = {word: KIND_IDS[kind] for word, kind in _WORD_KINDS.items()}
+_WORD_KIND_IDS_BYTES = {word.encode("ascii"): kind_id for word, kind_id in _WORD_KIND_IDS.items()}
+
+SourceBuffer = Union[str, bytes, bytearray, memoryview, mmap.mmap]
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class RelexResult:
+    """Outcome of ``Lexer.relex``.
+
+    Tokens ``stream[first:new_end]`` replace ``previous[first:old_end]``;
+    everything outside that range is carried over from the previous stream,
+    with offsets (and positions after the edit) shifted to the new source.
+    """
+
+    stream: TokenStream
+    errors: List[Diagnostic]
+    first: int
+    old_end: int
+    new_end: int
+
 
 class Lexer:
+    def __init__(self, engine: str = "scan") -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown lexer engine '{engine}'. Expected one of: {', '.join(ENGINES)}.")
+        self.engine = engine
+
     def tokenize(self, source: str) -> Tuple[List[Token], List[Diagnostic]]:
+        if self.engine == "regex":
+            stream, errors = self._tokenize_regex(source)
+            return stream.to_tokens(), errors
+        return self._tokenize_scan(source)
+
+    def tokenize_stream(self, source: SourceBuffer) -> Tuple[TokenStream, List[Diagnostic]]:
+        """Tokenize into a compact ``TokenStream`` instead of ``Token`` objects.
+
+        ``source`` may also be a UTF-8 byte buffer such as a memory-mapped
+        file; ASCII buffers are tokenized in place and token values are only
+        decoded when read. Only the regex engine records source offsets, so
+        the scan engine's output is converted with ``TokenStream.from_tokens``.
+        """
+        if not isinstance(source, str) and (self.engine != "regex" or _NON_ASCII_BYTE_RE.search(source)):
+            source = str(source, "utf-8")
+        if self.engine == "regex":
+            return self._tokenize_regex(source)
+        tokens, errors = self._tokenize_scan(source)
+        return TokenStream.from_tokens(tokens), errors
+
+    def iter_tokens(
+        self,
+        reader: Union[IO[str], IO[bytes], mmap.mmap],
+        errors: Optional[List[Diagnostic]] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> Iterator[Token]:
+        """Lazily tokenize a file object or mmap, reading ``chunk_size`` at a time.
+
+        Byte readers are decoded as UTF-8 incrementally. Diagnostics are
+        appended to ``errors`` as they are found. Tokens, comments and string
+        literals may straddle chunk boundaries: each chunk is only lexed up to
+        its last whitespace and the remainder is carried into the next read,
+        so memory stays bounded by the chunk size plus the longest single
+        token or comment. The output is the same as ``tokenize`` on the whole
+        text.
+        """
+        if errors is None:
+            errors = []
+        decoder = None
+        buffer = ""
+        line, line_start = 1, 0
+        size = chunk_size
+        eof = False
+        while not eof:
+            chunk = reader.read(size)
+            eof = not chunk
+            if not isinstance(chunk, str):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder("utf-8")()
+                chunk = decoder.decode(chunk, final=eof)
+            buffer += chunk
+
+            stream = TokenStream(buffer)
+            if eof:
+                self._scan_regex(buffer, stream, errors, 0, line, line_start)
+                yield from stream.to_tokens()
+                return
+
+            # Matches ending at or before the last whitespace that precedes
+            # some other character cannot change with more input; stop at the
+            # first match past it, which always exists.
+            last = len(buffer.rstrip(" \t\r\n")) - 1
+            cut = -1
+            if last > 0:
+                cut = max(buffer.rfind(" ", 0, last), buffer.rfind("\t", 0, last), buffer.rfind("\n", 0, last))
+            if cut < 0:
+                # No safe split point yet (one long token or comment); read
+                # bigger chunks so rescanning the carried text stays linear.
+                size *= 2
+                continue
+            resume: List[int] = []
+
+            def stop(start: int, end: int, line: int, line_start: int) -> int:
+                if end <= cut:
+                    return -1
+                resume.extend((start, line, line_start))
+                return 0
+
+            self._scan_regex(buffer, stream, errors, 0, line, line_start, sync=stop)
+            start, line, line_start = resume
+            buffer = buffer[start:]
+            line_start -= start
+            size = chunk_size if start else size * 2
+            yield from stream.to_tokens()
+
+    def relex(
+        self,
+        previous: TokenStream,
+        offset: int,
+        deleted: int,
+        inserted: str,
+        previous_errors: Optional[List[Diagnostic]] = None,
+    ) -> RelexResult:
+        """Re-tokenize after replacing ``deleted`` characters at ``offset`` with ``inserted``.
+
+        Only the damaged region is scanned: lexing restarts at the last token
+        that begins before the edit and stops at the first token boundary past
+        the edit that lines up with a token of ``previous``. From there on the
+        old tokens are reused. The result matches a full ``tokenize_stream`` of
+        the edited source, provided ``previous`` (and ``previous_errors``) came
+        from one. Re-lexing always runs the regex engine, which records the
+        source offsets it needs.
+        """
+        if previous._values is not None:
+            raise ValueError("relex() needs a stream with source offsets; tokenize it with the regex engine.")
+        old_source = previous.source
+        if not isinstance(old_source, str):
+            # Byte buffers are only tokenized in place when they are ASCII.
+            old_source = str(old_source, "ascii")
+        if offset < 0 or deleted < 0 or offset + deleted > len(old_source):
+            raise ValueError(f"Edit range {offset}:{offset + deleted} is outside the source.")
+        source = old_source[:offset] + inserted + old_source[offset + deleted :]
+        delta = len(inserted) - deleted
+        old_errors = previous_errors or []
+
+        old_starts = previous.starts
+        old_count = len(old_starts)
+        first = bisect_left(old_starts, offset) - 1
+        stream = TokenStream(source)
+        if first < 0:
+            first = 0
+            pos, line, line_start = 0, 1, 0
+            errors: List[Diagnostic] = []
+        else:
+            pos = old_starts[first]
+            line = previous.lines[first]
+            line_start = pos - previous.columns[first] + 1
+            restart = (line, previous.columns[first])
+            errors = [e for e in old_errors if (e.line, e.column) < restart]
+            stream.kind_ids = previous.kind_ids[:first]
+            stream.lines = previous.lines[:first]
+            stream.columns = previous.columns[:first]
+            stream.starts = old_starts[:first]
+            stream.ends = previous.ends[:first]
+
+        # Matches at or past the end of the inserted text are compared with the
+        # old token starts, walking both in step since each side only grows.
+        floor = offset + len(inserted)
+        cursor = bisect_left(old_starts, offset + deleted)
+        synced_at: List[int] = []
+
+        def sync(start: int, end: int, line: int, line_start: int) -> int:
+            nonlocal cursor
+            if start < floor:
+                return -1
+            target = start - delta
+            while cursor < old_count and old_starts[cursor] < target:
+                cursor += 1
+            if cursor < old_count and old_starts[cursor] == target:
+                synced_at.extend((line, start - line_start + 1))
+                return cursor
+            return -1
+
+        old_end = self._scan_regex(source, stream, errors, pos, line, line_start, sync=sync)
+        new_end = len(stream.kind_ids)
+        if old_end < 0:
+            return RelexResult(stream, errors, first, old_count, new_end)
+
+        new_line, new_col = synced_at
+        sync_line = previous.lines[old_end]
+        sync_col = previous.columns[old_end]
+        line_delta = new_line - sync_line
+        col_delta = new_col - sync_col
+        # Columns only move for tokens sharing the synced token's line; every
+        # later line restarts its columns from an absolute offset.
+        same_line = bisect_right(previous.lines, sync_line, old_end)
+        stream.kind_ids.extend(previous.kind_ids[old_end:])
+        stream.lines.extend(array("i", map(line_delta.__add__, previous.lines[old_end:])))
+        stream.columns.extend(array("i", map(col_delta.__add__, previous.columns[old_end:same_line])))
+        stream.columns.extend(previous.columns[same_line:])
+        stream.starts.extend(array("i", map(delta.__add__, old_starts[old_end:])))
+        stream.ends.extend(array("i", map(delta.__add__, previous.ends[old_end:])))
+
+        for e in old_errors:
+            if (e.line, e.column) < (sync_line, sync_col):
+                continue
+            column = e.column + col_delta if e.line == sync_line else e.column
+            errors.append(replace(e, line=e.line + line_delta, column=column))
+        return RelexResult(stream, errors, first, old_end, new_end)
+
+    def _tokenize_regex(self, source: SourceBuffer) -> Tuple[TokenStream, List[Diagnostic]]:
+        stream = TokenStream(source)
+        errors: List[Diagnostic] = []
+        self._scan_regex(source, stream, errors, pos=0, line=1, line_start=0)
+        return stream, errors
+
+    def _scan_regex(
+        self,
+        source: SourceBuffer,
+        stream: TokenStream,
+        errors: List[Diagnostic],
+        pos: int,
+        line: int,
+        line_start: int,
+        sync: Optional[Callable[[int, int, int, int], int]] = None,
+    ) -> int:
+        """Append tokens from ``pos`` onward to ``stream``.
+
+        The whole lexer state between tokens is ``(pos, line, line_start)``, so
+        scanning can resume at any token boundary. When ``sync`` is given it is
+        called with each match's span and the state before it, and scanning
+        stops as soon as it returns a non-negative value, which is passed back
+        to the caller; otherwise the scan runs to the end of ``source`` and -1
+        is returned.
+        """
+        if isinstance(source, str):
+            master, word_kind_ids, newline = _MASTER_RE, _WORD_KIND_IDS, "\n"
+        else:
+            master, word_kind_ids, newline = _MASTER_RE_BYTES, _WORD_KIND_IDS_BYTES, b"\n"
+
+        # Columns are derived from offsets: col = start - line_start + 1.
+        # ``line_start`` is shifted where the scan engine's counters drift from
+        # the real layout (escaped newlines inside string literals).
+        n = len(source)
+        emit = stream.append
+        push_kind = stream.kind_ids.append
+        push_line = stream.lines.append
+        push_col = stream.columns.append
+        push_start = stream.starts.append
+        push_end = stream.ends.append
+        word_kind_id = word_kind_ids.get
+        identifier_id = KIND_IDS["IDENTIFIER"]
+
+        while pos < n:
+            resume = n
+            for m in master.finditer(source, pos):
+                kind = m.lastgroup
+                value = m.group(kind)
+                end = m.end()
+                start = end - len(value)
+
+                if sync is not None:
+                    synced = sync(start, end, line, line_start)
+                    if synced >= 0:
+                        return synced
+
+                # The hot branches fill the columns directly instead of going
+                # through TokenStream.append.
+                if kind == "WORD":
+                    push_kind(word_kind_id(value, identifier_id))
+                    push_line(line)
+                    push_col(start - line_start + 1)
+                    push_start(start)
+                    push_end(end)
+                elif kind == "NEWLINE":
+                    line += 1
+                    line_start = end
+                elif kind == "SYMBOL" or kind == "OPERATOR" or kind == "NUMBER":
+                    push_kind(KIND_IDS[kind])
+                    push_line(line)
+                    push_col(start - line_start + 1)
+                    push_start(start)
+                    push_end(end)
+                elif kind == "LINE_COMMENT":
+                    continue
+                elif kind == "BLOCK_COMMENT":
+                    newlines = value.count(newline)
+                    if newlines:
+                        line += newlines
+                        line_start = start + value.rfind(newline) + 1
+                    if m.group("COMMENT_CLOSE") is None:
+                        errors.append(Diagnostic(
+                            phase="Lexical Analysis",
+                            level="error",
+                            message="Unterminated block comment.",
+                            line=line,
+                            column=end - line_start + 1,
+                            suggestion="Close comments with */.",
+                        ))
+                elif kind == "PREPROCESSOR":
+                    # The directive starts with '#', so strip() only trims the tail.
+                    emit("PREPROCESSOR", line, start - line_start + 1, start, start + len(value.rstrip()))
+                elif kind == "STRING":
+                    col = start - line_start + 1
+                    if m.group("STRING_CLOSE") is None:
+                        errors.append(Diagnostic(
+                            phase="Lexical Analysis",
+                            level="error",
+                            message="Unterminated string literal.",
+                            line=line,
+                            column=col,
+                            suggestion="Add closing double quote.",
+                        ))
+                    emit("STRING", line, col, start, end)
+                    if newline in value:
+                        text = value if isinstance(value, str) else value.decode("ascii")
+                        line, col = self._advance_string_position(text, line, col)
+                        line_start = end - col + 1
+                elif kind == "CHAR":
+                    # Character literals never start a new line, even when an
+                    # unterminated literal runs across newlines, so line_start
+                    # is deliberately left alone.
+                    col = start - line_start + 1
+                    if m.group("CHAR_CLOSE") is None:
+                        errors.append(Diagnostic(
+                            phase="Lexical Analysis",
+                            level="error",
+                            message="Unterminated character literal.",
+                            line=line,
+                            column=col,
+                            suggestion="Add closing single quote.",
+                        ))
+                    emit("CHAR", line, col, start, end)
+                elif kind == "FALLBACK":
+                    col = start - line_start + 1
+                    if value.isdigit() or (value == "." and source[end].isdigit()):
+                        resume = _NUMBER_TAIL_RE.match(source, end).end()
+                        emit("NUMBER", line, col, start, resume)
+                    elif value.isalpha():
+                        resume = _WORD_TAIL_RE.match(source, end).end()
+                        emit(_WORD_KINDS.get(source[start:resume], "IDENTIFIER"), line, col, start, resume)
+                    else:
+                        resume = end
+                        if value == ".":
+                            emit("SYMBOL", line, col, start, end)
+                        else:
+                            errors.append(self._illegal_character(value, line, col))
+                            emit("INVALID", line, col, start, end)
+                    # The tail of a fallback token extends past this match, so
+                    # restart the scan after it.
+                    break
+                else:
+                    col = start - line_start + 1
+                    ch = value if isinstance(value, str) else value.decode("ascii")
+                    errors.append(self._illegal_character(ch, line, col))
+                    emit("INVALID", line, col, start, end)
+            pos = resume
+
+        return -1
+
+    @staticmethod
+    def _advance_string_position(value: str, line: int, col: int) -> Tuple[int, int]:
+        # Mirrors the scan engine: a newline consumed as part of an escape
+        # sequence advances the column but does not start a new line.
+        i = 0
+        n = len(value)
+        while i < n:
+            c = value[i]
+            i += 1
+            col += 1
+            if c == "\\" and i < n:
+                i += 1
+                col += 1
+                continue
+            if c == "\n":
+                line += 1
+                col = 1
+        return line, col
+
+    @staticmethod
+    def _illegal_character(ch: str, line: int, col: int) -> Diagnostic:
+        return Diagnostic(
+            phase="Lexical Analysis",
+            level="error",
+            message=f"Illegal character: {ch}",
+            line=line,
+            column=col,
+            suggestion="Remove the character or replace it with a valid C/C++ symbol.",
+        )
+
+    def _tokenize_scan(self, source: str) -> Tuple[List[Token], List[Diagnostic]]:
         tokens: List[Token] = []
         errors: List[Diagnostic] = []
 
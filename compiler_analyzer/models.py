@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
 
 @dataclass
@@ -48,10 +48,53 @@ class ExpressionRecord:
     expr: Optional[ExprNode]
 
 
+@dataclass
+class Statement:
+    """Statement-level syntax tree node produced by the parser.
+
+    ``start``/``end`` delimit the statement's tokens in the compilation
+    unit's filtered token view. ``parts`` holds the token ranges of the
+    statement's own expressions (condition, for-header sections, return
+    value, function type and parameters) and ``body`` its nested statements:
+    the then/else branches of an ``if``, a loop body, a function's block
+    (empty for prototypes) or a block's statements. A ``None`` entry marks a
+    statement the parser reported an error for and skipped.
+
+    Only IR generation walks this tree. Semantic analysis still scans the
+    tokens and expression records, and complexity estimation the source
+    lines.
+    """
+
+    kind: str
+    line: int
+    start: int
+    end: int
+    name: Optional[str] = None
+    parts: List[range] = field(default_factory=list)
+    body: List[Optional["Statement"]] = field(default_factory=list)
+
+
+@dataclass
+class PhaseTiming:
+    """Resources one analysis phase used.
+
+    ``wall_time`` and ``cpu_time`` are in seconds; ``cpu_time`` counts the
+    analyzing thread only. The memory figures are bytes from ``tracemalloc``
+    (net growth and peak above the phase's starting point), or None when
+    memory tracing is off.
+    """
+
+    phase: str
+    wall_time: float
+    cpu_time: float
+    allocated_bytes: Optional[int] = None
+    peak_bytes: Optional[int] = None
+
+
 @dataclass
 class AnalysisReport:
     source: str
-    tokens: List[Token] = field(default_factory=list)
+    tokens: Sequence[Token] = field(default_factory=list)
     lexical_errors: List[Diagnostic] = field(default_factory=list)
     syntax_errors: List[Diagnostic] = field(default_factory=list)
     semantic_errors: List[Diagnostic] = field(default_factory=list)
@@ -63,6 +106,11 @@ class AnalysisReport:
     parse_tree: str = ""
     complexity: str = "O(1)"
     complexity_steps: List[str] = field(default_factory=list)
+    timings: List[PhaseTiming] = field(default_factory=list)
+    # Phases that ran to completion; when ``truncated``, the deadline stopped
+    # the pipeline after these and the other fields keep their defaults.
+    phases_completed: List[str] = field(default_factory=list)
+    truncated: bool = False
 
     def has_errors(self) -> bool:
         return bool(self.lexical_errors or self.syntax_errors or self.semantic_errors)
@@ -2,24 +2,39 @@ from __future__ import annotations
 
 from copy import deepcopy
 import re
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
 
 from .models import IRInstruction
 
+if TYPE_CHECKING:
+    from .deadline import Deadline
 
-class Optimizer:
-    def optimize(self, ir: List[IRInstruction]) -> tuple[List[IRInstruction], List[str]]:
-        optimized = deepcopy(ir)
-        applied: List[str] = []
-
-        optimized, changed = self._constant_folding(optimized)
-        if changed:
-            applied.extend(changed)
 
+class Optimizer:
+    def optimize(
+        self,
+        ir: List[IRInstruction],
+        folded: Optional[tuple[List[IRInstruction], List[str]]] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> tuple[List[IRInstruction], List[str]]:
+        """Run every pass over a copy of ``ir``.
+
+        ``folded`` may carry the result of ``fold(ir)`` computed elsewhere
+        (the incremental engine assembles it per function); its instruction
+        list is modified in place. Each pass is linear in the IR, so
+        ``deadline`` is checked between passes.
+        """
+        optimized, changed = folded if folded is not None else self.fold(ir)
+        applied: List[str] = list(changed)
+
+        if deadline is not None:
+            deadline.check()
         optimized, changed = self._dead_code_elimination(optimized)
         if changed:
             applied.extend(changed)
 
+        if deadline is not None:
+            deadline.check()
         optimized, changed = self._common_subexpression_elimination(optimized)
         if changed:
             applied.extend(changed)
@@ -29,6 +44,14 @@ class Optimizer:
 
         return optimized, applied
 
+    def fold(self, ir: List[IRInstruction]) -> tuple[List[IRInstruction], List[str]]:
+        """Constant-fold a copy of ``ir``.
+
+        Folding looks at one instruction at a time, so folding a list piece by
+        piece and concatenating gives the same result as folding it whole.
+        """
+        return self._constant_folding(deepcopy(ir))
+
     def _constant_folding(self, ir: List[IRInstruction]) -> tuple[List[IRInstruction], List[str]]:
         changes: List[str] = []
         for ins in ir:
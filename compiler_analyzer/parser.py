@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Sequence, Union
 
-from .models import Diagnostic, ExprNode, ExpressionRecord, Token
+from .models import Diagnostic, ExprNode, ExpressionRecord, Statement, Token
+from .tokens import KIND_IDS, KIND_NAMES
+from .unit import CLOSERS, OPENERS, CompilationUnit
+
+if TYPE_CHECKING:
+    from .deadline import Deadline
+    from .incremental import FunctionCache
 
 
 TYPE_STARTERS = {
@@ -13,11 +19,15 @@ TYPE_STARTERS = {
 
 STATEMENT_START_KEYWORDS = {"if", "for", "while", "do", "return", "break", "continue", "else", "switch", "case", "default"}
 
+LITERAL_KIND_IDS = frozenset(KIND_IDS[kind] for kind in ("NUMBER", "STRING", "CHAR"))
+IDENTIFIER_ID = KIND_IDS["IDENTIFIER"]
+
 
 @dataclass
 class ParseResult:
     errors: List[Diagnostic]
     expressions: List[ExpressionRecord] = field(default_factory=list)
+    program: Optional[Statement] = None
 
 
 class _ExprParser:
@@ -37,12 +47,16 @@ class _ExprParser:
         "%": 6,
     }
 
-    def __init__(self, tokens: List[Token]) -> None:
-        self.tokens = tokens
-        self.pos = 0
+    def __init__(self, unit: CompilationUnit, span: range) -> None:
+        self.unit = unit
+        self.values = unit.values
+        self.kind_ids = unit.tokens.kind_ids
+        self.partners = unit.partners
+        self.pos = span.start
+        self.end = span.stop
 
     def parse(self) -> Optional[ExprNode]:
-        if not self.tokens:
+        if self.pos >= self.end:
             return None
         return self._parse_expr(0)
 
@@ -51,12 +65,11 @@ class _ExprParser:
         if left is None:
             return None
 
-        while self.pos < len(self.tokens):
-            tok = self.tokens[self.pos]
-            prec = self.PRECEDENCE.get(tok.value)
+        while self.pos < self.end:
+            op = self.values[self.pos]
+            prec = self.PRECEDENCE.get(op)
             if prec is None or prec < min_prec:
                 break
-            op = tok.value
             self.pos += 1
             right = self._parse_expr(prec + 1)
             if right is None:
@@ -65,171 +78,209 @@ class _ExprParser:
         return left
 
     def _parse_unary(self) -> Optional[ExprNode]:
-        if self.pos >= len(self.tokens):
+        if self.pos >= self.end:
             return None
-        tok = self.tokens[self.pos]
-        if tok.value in {"+", "-", "!", "~", "++", "--"}:
+        value = self.values[self.pos]
+        if value in {"+", "-", "!", "~", "++", "--"}:
             self.pos += 1
             node = self._parse_unary()
-            return ExprNode(kind="unary", value=tok.value, left=node)
+            return ExprNode(kind="unary", value=value, left=node)
         return self._parse_primary()
 
     def _parse_primary(self) -> Optional[ExprNode]:
-        if self.pos >= len(self.tokens):
+        if self.pos >= self.end:
             return None
-        tok = self.tokens[self.pos]
+        value = self.values[self.pos]
+        kind_id = self.kind_ids[self.pos]
 
-        if tok.value == "(":
+        if value == "(":
             self.pos += 1
             expr = self._parse_expr(0)
-            if self.pos < len(self.tokens) and self.tokens[self.pos].value == ")":
+            if self.pos < self.end and self.values[self.pos] == ")":
                 self.pos += 1
             return expr
 
-        if tok.kind in {"NUMBER", "STRING", "CHAR"}:
+        if kind_id in LITERAL_KIND_IDS:
             self.pos += 1
-            return ExprNode(kind="literal", value=tok.value)
+            return ExprNode(kind="literal", value=value)
 
-        if tok.kind == "IDENTIFIER":
+        if kind_id == IDENTIFIER_ID:
             self.pos += 1
-            node: ExprNode = ExprNode(kind="identifier", value=tok.value)
-            while self.pos < len(self.tokens):
-                if self.tokens[self.pos].value == "(":
-                    self.pos += 1
+            node: ExprNode = ExprNode(kind="identifier", value=value)
+            while self.pos < self.end:
+                if self.values[self.pos] == "(":
+                    close = self._closing(self.pos)
                     args: List[ExprNode] = []
-                    current: List[Token] = []
-                    depth = 0
-                    while self.pos < len(self.tokens):
-                        t = self.tokens[self.pos]
-                        if t.value == "(":
-                            depth += 1
-                            current.append(t)
-                        elif t.value == ")":
-                            if depth == 0:
-                                if current:
-                                    arg = _ExprParser(current).parse()
-                                    if arg is not None:
-                                        args.append(arg)
-                                self.pos += 1
-                                break
-                            depth -= 1
-                            current.append(t)
-                        elif t.value == "," and depth == 0:
-                            arg = _ExprParser(current).parse()
+                    # Arguments are split on top-level commas; nested calls
+                    # are stepped over using the bracket index.
+                    arg_start = i = self.pos + 1
+                    while i < close:
+                        v = self.values[i]
+                        if v == "(":
+                            i = self._closing(i) + 1
+                            continue
+                        if v == ",":
+                            arg = _ExprParser(self.unit, range(arg_start, i)).parse()
                             if arg is not None:
                                 args.append(arg)
-                            current = []
-                        else:
-                            current.append(t)
-                        self.pos += 1
+                            arg_start = i + 1
+                        i += 1
+                    if close < self.end and arg_start < close:
+                        arg = _ExprParser(self.unit, range(arg_start, close)).parse()
+                        if arg is not None:
+                            args.append(arg)
+                    self.pos = min(close + 1, self.end)
                     node = ExprNode(kind="call", value=node.value, args=args)
                     continue
 
-                if self.tokens[self.pos].value == "[":
-                    self.pos += 1
-                    idx_tokens: List[Token] = []
-                    depth = 0
-                    while self.pos < len(self.tokens):
-                        t = self.tokens[self.pos]
-                        if t.value == "[":
-                            depth += 1
-                            idx_tokens.append(t)
-                        elif t.value == "]":
-                            if depth == 0:
-                                self.pos += 1
-                                break
-                            depth -= 1
-                            idx_tokens.append(t)
-                        else:
-                            idx_tokens.append(t)
-                        self.pos += 1
-                    idx_node = _ExprParser(idx_tokens).parse()
+                if self.values[self.pos] == "[":
+                    close = self._closing(self.pos)
+                    idx_node = _ExprParser(self.unit, range(self.pos + 1, min(close, self.end))).parse()
+                    self.pos = min(close + 1, self.end)
                     node = ExprNode(kind="index", value="[]", left=node, right=idx_node)
                     continue
 
                 break
             return node
 
-        if tok.value in {"[", "]", "{" , "}"}:
+        if value in {"[", "]", "{" , "}"}:
             self.pos += 1
             return None
 
         self.pos += 1
-        return ExprNode(kind="unknown", value=tok.value)
+        return ExprNode(kind="unknown", value=value)
+
+    def _closing(self, open_idx: int) -> int:
+        """Partner of the bracket at ``open_idx``, or ``end`` if it closes outside this expression."""
+        close = self.partners[open_idx]
+        return close if 0 <= close < self.end else self.end
 
 
 class Parser:
-    def __init__(self, tokens: List[Token]) -> None:
-        self.raw_tokens = tokens
-        self.tokens = [t for t in tokens if t.kind != "PREPROCESSOR"]
+    def __init__(
+        self,
+        tokens: Union[CompilationUnit, Sequence[Token]],
+        cache: Optional[FunctionCache] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> None:
+        self.unit = CompilationUnit.coerce(tokens)
+        # Function definitions unchanged since the previous analysis are
+        # taken from here instead of being parsed again.
+        self.cache = cache
+        # Checked once per statement; parsing stops with AnalysisCancelled.
+        self.deadline = deadline
+        self.raw_tokens = self.unit.raw
+        self.tokens = self.unit.tokens
+        self._values = self.unit.values
+        self._count = len(self._values)
         self.pos = 0
+        self._cached_pos = -1
+        self._cached_token: Optional[Token] = None
         self.errors: List[Diagnostic] = []
         self.expressions: List[ExpressionRecord] = []
         self.defined_functions: set[str] = set()
 
     def parse(self) -> ParseResult:
+        program: List[Statement] = []
+        cache = self.cache
+        deadline = self.deadline
         while not self._at_end():
+            if deadline is not None:
+                deadline.check()
             before = self.pos
-            self._parse_top_level()
+            if cache is not None:
+                cached = cache.parsed(self.unit, before)
+                if cached is not None:
+                    node, expressions, errors = cached
+                    program.append(node)
+                    self.expressions.extend(expressions)
+                    self.errors.extend(errors)
+                    self.defined_functions.add(node.name)
+                    self.pos = node.end
+                    continue
+                first_expression, first_error = len(self.expressions), len(self.errors)
+            node = self._parse_top_level()
+            if node is not None:
+                program.append(node)
+                if cache is not None:
+                    cache.store_parsed(self.unit, node, self.expressions[first_expression:], self.errors[first_error:])
             if self.pos == before:
                 t = self._current()
                 self._error(t, f"Parser stalled near '{t.value}'.", "Remove or fix this token.")
                 self._advance()
         self._post_syntax_checks()
-        return ParseResult(errors=self.errors, expressions=self.expressions)
+        return ParseResult(
+            errors=self.errors,
+            expressions=self.expressions,
+            program=Statement(kind="program", line=1, start=0, end=self._count, body=program),
+        )
 
-    def _parse_top_level(self) -> None:
+    def _parse_top_level(self) -> Optional[Statement]:
         t = self._current()
         if t.value in {"struct", "class"}:
-            self._parse_struct_or_class()
-            return
+            return self._parse_struct_or_class()
         if self._is_type_start(t):
-            self._parse_decl_or_function()
-            return
+            return self._parse_decl_or_function()
         self._error(t, f"Unexpected token '{t.value}' at top level.", "Top level should contain declarations or function definitions.")
         self._advance()
+        return None
 
-    def _parse_struct_or_class(self) -> None:
+    def _parse_struct_or_class(self) -> Statement:
+        start = self.pos
         self._advance()
+        name = None
         if self._current().kind == "IDENTIFIER":
+            name = self._current().value
             self._advance()
         if not self._match("{"):
             t = self._current()
             self._error(t, "Expected '{' to start struct/class body.", "Add '{' after the name.")
-            return
-        self._parse_block_already_opened()
+            return self._node("struct", start, name=name)
+        body = self._parse_block_already_opened(self.pos - 1)
         self._consume(";", "Expected ';' after struct/class declaration.", "Add ';' after closing brace.")
+        return self._node("struct", start, name=name, body=[body])
 
-    def _parse_decl_or_function(self) -> None:
+    def _parse_decl_or_function(self) -> Statement:
+        start = self.pos
         while self._is_type_start(self._current()):
             self._advance()
 
         while self._current().value in {"*", "&"}:
             self._advance()
+        type_span = range(start, self.pos)
 
         ident = self._current()
         if ident.kind != "IDENTIFIER":
             self._error(ident, "Expected identifier after type.", "Give a variable or function name.")
             self._sync({";", "{"})
             self._match(";")
-            return
+            return self._node("decl", start)
         func_or_var_name = ident.value
         self._advance()
 
         if self._match("("):
+            params_start = self.pos
             self._parse_param_list()
+            params_span = range(params_start, self.pos)
             self._consume(")", "Expected ')' after parameter list.", "Close function parameters with ')'.")
             if self._match(";"):
-                return
+                return self._node("function", start, name=func_or_var_name, parts=[type_span, params_span])
             if self._current().value == "{":
                 self.defined_functions.add(func_or_var_name)
-                self._parse_block()
-                return
+                body = self._parse_block()
+                return self._node("function", start, name=func_or_var_name, parts=[type_span, params_span], body=[body])
             t = self._current()
             self._error(t, "Expected '{' for function body.", "Start function body with '{'.")
+            brace = self._find_body_brace()
+            if brace is not None:
+                # A stray token between the header and the body: parse the body anyway.
+                self.pos = brace
+                self.defined_functions.add(func_or_var_name)
+                body = self._parse_block()
+                return self._node("function", start, name=func_or_var_name, parts=[type_span, params_span], body=[body])
             self._sync({"}"})
             self._match("}")
-            return
+            return self._node("function", start, name=func_or_var_name, parts=[type_span, params_span])
 
         self._parse_declarator_tail("decl_init", ident.value)
         while self._match(","):
@@ -243,6 +294,7 @@ class Parser:
                 self._error(self._current(), "Expected identifier in declaration list.", "Add a variable name after ','.")
             self._parse_declarator_tail("decl_init", next_ident)
         self._consume(";", "Expected ';' after declaration.", "End declaration with ';'.")
+        return self._node("decl", start, name=func_or_var_name)
 
     def _parse_declarator_tail(self, context: str, target: Optional[str]) -> None:
         if self._match("["):
@@ -254,7 +306,7 @@ class Parser:
                 self._parse_brace_initializer()
             else:
                 expr_tokens = self._collect_expr_tokens(stop_values={";", ",", "}"}.union(STATEMENT_START_KEYWORDS))
-                expr = _ExprParser(expr_tokens).parse()
+                expr = _ExprParser(self.unit, expr_tokens).parse()
                 self.expressions.append(ExpressionRecord(context=context, line=self._line_of_tokens(expr_tokens), target=target, expr=expr))
 
     def _parse_brace_initializer(self) -> None:
@@ -286,89 +338,101 @@ class Parser:
             if not self._match(","):
                 break
 
-    def _parse_block(self) -> None:
+    def _parse_block(self) -> Optional[Statement]:
+        start = self.pos
         if not self._match("{"):
             self._error(self._current(), "Expected '{' to start block.", "Insert '{' before statements.")
-            return
-        self._parse_block_already_opened()
+            return None
+        return self._parse_block_already_opened(start)
 
-    def _parse_block_already_opened(self) -> None:
+    def _parse_block_already_opened(self, start: int) -> Statement:
+        body: List[Statement] = []
         while not self._at_end() and self._current().value != "}":
             before = self.pos
-            self._parse_statement()
+            node = self._parse_statement()
+            if node is not None:
+                body.append(node)
             if self.pos == before:
                 t = self._current()
                 self._error(t, f"Could not parse statement near '{t.value}'.", "Check statement syntax around this token.")
                 self._advance()
         self._consume("}", "Missing closing '}' for block.", "Add '}' to close this block.")
+        return self._node("block", start, body=body)
 
-    def _parse_statement(self) -> None:
+    def _parse_statement(self) -> Optional[Statement]:
+        if self.deadline is not None:
+            self.deadline.check()
         t = self._current()
+        start = self.pos
 
         if t.value == "{":
-            self._parse_block()
-            return
+            return self._parse_block()
 
         if t.value == "if":
             self._advance()
             self._consume("(", "Expected '(' after if.", "Write condition as if (condition).")
-            cond_tokens = self._collect_expr_tokens(stop_values={")"})
-            self.expressions.append(ExpressionRecord(context="condition", line=self._line_of_tokens(cond_tokens), target=None, expr=_ExprParser(cond_tokens).parse()))
+            cond_tokens = self._collect_expr_tokens(stop_values={")"}, limit=self._header_limit())
+            self.expressions.append(ExpressionRecord(context="condition", line=self._line_of_tokens(cond_tokens), target=None, expr=_ExprParser(self.unit, cond_tokens).parse()))
             self._consume(")", "Expected ')' after if condition.", "Close condition with ')'.")
-            self._parse_statement()
+            body = [self._parse_statement()]
             if self._match("else"):
-                self._parse_statement()
-            return
+                body.append(self._parse_statement())
+            return self._node("if", start, parts=[cond_tokens], body=body)
 
         if t.value in {"for", "while"}:
             keyword = t.value
             self._advance()
             self._consume("(", f"Expected '(' after {keyword}.", f"Write loop header as {keyword} (...).")
+            limit = self._header_limit(semicolons=2 if keyword == "for" else 0)
             if keyword == "for":
-                init_tokens = self._collect_expr_tokens(stop_values={";"})
-                self.expressions.append(ExpressionRecord(context="for_init", line=self._line_of_tokens(init_tokens), target=None, expr=_ExprParser(init_tokens).parse()))
+                init_tokens = self._collect_expr_tokens(stop_values={";"}, limit=limit)
+                self.expressions.append(ExpressionRecord(context="for_init", line=self._line_of_tokens(init_tokens), target=None, expr=_ExprParser(self.unit, init_tokens).parse()))
                 self._consume(";", "Expected ';' in for header.", "for header needs init;condition;update.")
 
-                cond_tokens = self._collect_expr_tokens(stop_values={";"})
-                self.expressions.append(ExpressionRecord(context="for_cond", line=self._line_of_tokens(cond_tokens), target=None, expr=_ExprParser(cond_tokens).parse()))
+                cond_tokens = self._collect_expr_tokens(stop_values={";"}, limit=limit)
+                self.expressions.append(ExpressionRecord(context="for_cond", line=self._line_of_tokens(cond_tokens), target=None, expr=_ExprParser(self.unit, cond_tokens).parse()))
                 self._consume(";", "Expected second ';' in for header.", "for header needs two semicolons.")
 
-                upd_tokens = self._collect_expr_tokens(stop_values={")"})
-                self.expressions.append(ExpressionRecord(context="for_update", line=self._line_of_tokens(upd_tokens), target=None, expr=_ExprParser(upd_tokens).parse()))
+                upd_tokens = self._collect_expr_tokens(stop_values={")"}, limit=limit)
+                self.expressions.append(ExpressionRecord(context="for_update", line=self._line_of_tokens(upd_tokens), target=None, expr=_ExprParser(self.unit, upd_tokens).parse()))
+                parts = [init_tokens, cond_tokens, upd_tokens]
             else:
-                cond_tokens = self._collect_expr_tokens(stop_values={")"})
-                self.expressions.append(ExpressionRecord(context="condition", line=self._line_of_tokens(cond_tokens), target=None, expr=_ExprParser(cond_tokens).parse()))
+                cond_tokens = self._collect_expr_tokens(stop_values={")"}, limit=limit)
+                self.expressions.append(ExpressionRecord(context="condition", line=self._line_of_tokens(cond_tokens), target=None, expr=_ExprParser(self.unit, cond_tokens).parse()))
+                parts = [cond_tokens]
             self._consume(")", f"Expected ')' after {keyword} header.", "Close loop header with ')'.")
-            self._parse_statement()
-            return
+            body = [self._parse_statement()]
+            return self._node(keyword, start, parts=parts, body=body)
 
         if t.value == "do":
             self._advance()
-            self._parse_statement()
+            body = [self._parse_statement()]
             self._consume("while", "Expected 'while' after do-body.", "Use do { ... } while (condition);")
             self._consume("(", "Expected '(' after while.", "Add while condition in parentheses.")
-            cond_tokens = self._collect_expr_tokens(stop_values={")"})
-            self.expressions.append(ExpressionRecord(context="condition", line=self._line_of_tokens(cond_tokens), target=None, expr=_ExprParser(cond_tokens).parse()))
+            cond_tokens = self._collect_expr_tokens(stop_values={")"}, limit=self._header_limit())
+            self.expressions.append(ExpressionRecord(context="condition", line=self._line_of_tokens(cond_tokens), target=None, expr=_ExprParser(self.unit, cond_tokens).parse()))
             self._consume(")", "Expected ')' after condition.", "Close condition with ')'.")
             self._consume(";", "Expected ';' after do-while.", "End do-while with ';'.")
-            return
+            return self._node("do", start, parts=[cond_tokens], body=body)
 
         if t.value in {"return", "break", "continue"}:
             kw = t.value
             self._advance()
+            parts = []
             if kw == "return" and self._current().value != ";":
                 ret_tokens = self._collect_expr_tokens(stop_values={";", "}"}.union(STATEMENT_START_KEYWORDS))
-                self.expressions.append(ExpressionRecord(context="return", line=self._line_of_tokens(ret_tokens), target=None, expr=_ExprParser(ret_tokens).parse()))
+                self.expressions.append(ExpressionRecord(context="return", line=self._line_of_tokens(ret_tokens), target=None, expr=_ExprParser(self.unit, ret_tokens).parse()))
+                parts = [ret_tokens]
             self._consume(";", f"Expected ';' after {t.value}.", "End statement with ';'.")
-            return
+            return self._node(kw, start, parts=parts)
 
         if self._is_type_start(t):
-            self._parse_local_decl()
-            return
+            return self._parse_local_decl()
 
-        self._parse_expression_statement()
+        return self._parse_expression_statement()
 
-    def _parse_local_decl(self) -> None:
+    def _parse_local_decl(self) -> Statement:
+        start = self.pos
         while self._is_type_start(self._current()):
             self._advance()
         while self._current().value in {"*", "&"}:
@@ -377,7 +441,7 @@ class Parser:
             self._error(self._current(), "Expected variable name after type.", "Provide an identifier in declaration.")
             self._sync({";"})
             self._match(";")
-            return
+            return self._node("decl", start)
         ident = self._current().value
         self._advance()
         self._parse_declarator_tail("decl_init", ident)
@@ -392,89 +456,143 @@ class Parser:
                 self._error(self._current(), "Expected variable name after ','.", "Add a variable identifier.")
             self._parse_declarator_tail("decl_init", next_ident)
         self._consume(";", "Expected ';' after local declaration.", "End declaration with ';'.")
+        return self._node("decl", start, name=ident)
 
-    def _parse_expression_statement(self) -> None:
-        if self._match(";"):
-            return
+    def _parse_expression_statement(self) -> Optional[Statement]:
         start_pos = self.pos
+        if self._match(";"):
+            return self._node("empty", start_pos)
         expr_tokens = self._collect_expr_tokens(stop_values={";", "}"}.union(STATEMENT_START_KEYWORDS))
         if not expr_tokens:
             self._error(self._current(), f"Invalid expression near '{self._current().value}'.", "Rewrite this expression.")
             self._advance()
-            return
+            return None
 
         context = "expr"
         target = None
         assign_idx = self._find_top_level_op(expr_tokens, "=")
-        if assign_idx > 0 and expr_tokens[0].kind == "IDENTIFIER":
+        first = expr_tokens.start
+        if assign_idx > 0 and self.tokens.kind_ids[first] == IDENTIFIER_ID:
             context = "assign"
-            target = expr_tokens[0].value
+            target = self._values[first]
             rhs = expr_tokens[assign_idx + 1 :]
-            expr = _ExprParser(rhs).parse()
-            self.expressions.append(ExpressionRecord(context=context, line=expr_tokens[0].line, target=target, expr=expr))
+            expr = _ExprParser(self.unit, rhs).parse()
+            self.expressions.append(ExpressionRecord(context=context, line=self.tokens.lines[first], target=target, expr=expr))
         else:
-            expr = _ExprParser(expr_tokens).parse()
-            self.expressions.append(ExpressionRecord(context=context, line=expr_tokens[0].line, target=None, expr=expr))
+            expr = _ExprParser(self.unit, expr_tokens).parse()
+            self.expressions.append(ExpressionRecord(context=context, line=self.tokens.lines[first], target=None, expr=expr))
 
         if self.pos == start_pos:
             self._advance()
         self._consume(";", "Expected ';' after expression.", "End statement with ';'.")
+        return self._node("expr", start_pos, name=target, parts=[expr_tokens])
+
+    def _node(self, kind: str, start: int, **fields) -> Statement:
+        """Build a statement spanning ``start`` up to the current position."""
+        line = self.tokens.lines[start] if start < self._count else self._current().line
+        return Statement(kind=kind, line=line, start=start, end=self.pos, **fields)
 
     def _parse_expression(self) -> None:
         _ = self._collect_expr_tokens(stop_values={";", ")", "]", "}", "{"})
 
-    def _collect_expr_tokens(self, stop_values: set[str]) -> List[Token]:
-        out: List[Token] = []
-        depth_paren = 0
-        depth_bracket = 0
-        depth_brace = 0
-        while not self._at_end():
-            t = self._current()
-            if depth_paren == 0 and depth_bracket == 0 and depth_brace == 0 and t.value in stop_values:
+    def _collect_expr_tokens(self, stop_values: set[str], limit: Optional[int] = None) -> range:
+        """Advance past an expression and return the span of tokens it covers.
+
+        The expression ends at the first token in ``stop_values`` that is not
+        inside brackets opened within the span, and never past ``limit``.
+        ``reach`` tracks the furthest closing partner seen so far, so the
+        check is O(1) per token. A bracket that is never closed does not
+        swallow the rest of the file: the span then ends at the next statement
+        boundary (see ``_statement_boundary``).
+        """
+        start = self.pos
+        values = self._values
+        partners = self.unit.partners
+        count = self._count
+        if limit is None:
+            limit = count
+        reach = -1
+        pos = start
+        while pos < limit:
+            v = values[pos]
+            if reach < pos and v in stop_values:
                 break
-            if t.value == "(":
-                depth_paren += 1
-            elif t.value == ")":
-                depth_paren = max(0, depth_paren - 1)
-            elif t.value == "[":
-                depth_bracket += 1
-            elif t.value == "]":
-                depth_bracket = max(0, depth_bracket - 1)
-            elif t.value == "{":
-                depth_brace += 1
-            elif t.value == "}":
-                depth_brace = max(0, depth_brace - 1)
-            out.append(t)
-            self._advance()
-        return out
-
-    def _find_top_level_op(self, tokens: List[Token], op: str) -> int:
-        depth_paren = 0
-        depth_bracket = 0
-        depth_brace = 0
-        for i, t in enumerate(tokens):
-            if t.value == "(":
-                depth_paren += 1
-            elif t.value == ")":
-                depth_paren -= 1
-            elif t.value == "[":
-                depth_bracket += 1
-            elif t.value == "]":
-                depth_bracket -= 1
-            elif t.value == "{":
-                depth_brace += 1
-            elif t.value == "}":
-                depth_brace -= 1
-            elif t.value == op and depth_paren == 0 and depth_bracket == 0 and depth_brace == 0:
-                return i
+            if v in OPENERS:
+                partner = partners[pos]
+                if partner >= 0:
+                    reach = max(reach, partner)
+                elif limit == count:
+                    limit = self._statement_boundary(pos + 1)
+            pos += 1
+        self.pos = pos
+        return range(start, pos)
+
+    def _header_limit(self, semicolons: int = 0) -> int:
+        """Furthest a ``(...)`` header can reach, called just after its '(' is consumed.
+
+        That is the ')' closing it, so a stray bracket inside cannot carry the
+        header past it; when the '(' is missing or never closed, it is the
+        next statement boundary after the header's own ``semicolons``.
+        """
+        opener = self.pos - 1
+        if self._values[opener] == "(" and self.unit.partners[opener] > opener:
+            return self.unit.partners[opener]
+        return self._statement_boundary(self.pos, semicolons)
+
+    def _statement_boundary(self, pos: int, semicolons: int = 0) -> int:
+        """Index of the next ';', '{' or '}' from ``pos``, or the token count if there is none.
+
+        Closed brackets are stepped over, and so are the first ``semicolons`` ';'.
+        """
+        values = self._values
+        partners = self.unit.partners
+        while pos < self._count:
+            v = values[pos]
+            if v == ";" and semicolons:
+                semicolons -= 1
+            elif v in {";", "{", "}"}:
+                return pos
+            if v in OPENERS and partners[pos] > pos:
+                pos = partners[pos]
+            pos += 1
+        return pos
+
+    def _find_top_level_op(self, span: range, op: str) -> int:
+        # Unlike _collect_expr_tokens this keeps signed per-kind counts: a
+        # stray closer followed by an opener cancels out, which the partner
+        # index cannot express. It runs once per statement, over its own span.
+        values = self._values
+        depth = {"(": 0, "[": 0, "{": 0}
+        for offset, i in enumerate(span):
+            v = values[i]
+            if v in OPENERS:
+                depth[v] += 1
+            elif v in CLOSERS:
+                depth[CLOSERS[v]] -= 1
+            elif v == op and not any(depth.values()):
+                return offset
         return -1
 
-    def _line_of_tokens(self, tokens: List[Token]) -> int:
-        return tokens[0].line if tokens else self._current().line
+    def _line_of_tokens(self, span: range) -> int:
+        return self.tokens.lines[span.start] if span else self._current().line
 
     def _is_type_start(self, token: Token) -> bool:
         return token.kind == "TYPE" or token.value in TYPE_STARTERS
 
+    def _find_body_brace(self) -> Optional[int]:
+        """Index of the next '{' outside parentheses opened after the current token, or None."""
+        values = self._values
+        depth = 0
+        for i in range(self.pos, self._count):
+            v = values[i]
+            if v == "(":
+                depth += 1
+            elif v == ")":
+                depth = max(depth - 1, 0)
+            elif v == "{" and depth == 0:
+                return i
+        return None
+
     def _sync(self, stop_values: set[str]) -> None:
         while not self._at_end() and self._current().value not in stop_values:
             self._advance()
@@ -490,9 +608,21 @@ class Parser:
         return False
 
     def _current(self) -> Token:
-        if self.pos >= len(self.tokens):
-            return Token("EOF", "EOF", self.tokens[-1].line if self.tokens else 1, 1)
-        return self.tokens[self.pos]
+        # The parser asks for the same position many times in a row, so keep
+        # the last materialized token around.
+        if self.pos != self._cached_pos:
+            tokens = self.tokens
+            if self.pos >= self._count:
+                self._cached_token = Token("EOF", "EOF", tokens.lines[-1] if self._count else 1, 1)
+            else:
+                self._cached_token = Token(
+                    KIND_NAMES[tokens.kind_ids[self.pos]],
+                    self._values[self.pos],
+                    tokens.lines[self.pos],
+                    tokens.columns[self.pos],
+                )
+            self._cached_pos = self.pos
+        return self._cached_token
 
     def _advance(self) -> Token:
         t = self._current()
@@ -500,7 +630,7 @@ class Parser:
         return t
 
     def _at_end(self) -> bool:
-        return self.pos >= len(self.tokens)
+        return self.pos >= self._count
 
     def _error(self, token: Token, message: str, suggestion: str) -> None:
         self.errors.append(Diagnostic(
@@ -513,9 +643,11 @@ class Parser:
         ))
 
     def _post_syntax_checks(self) -> None:
+        raw = self.raw_tokens
+        preprocessor = KIND_IDS["PREPROCESSOR"]
         has_include = any(
-            t.kind == "PREPROCESSOR" and t.value.strip().startswith("#include")
-            for t in self.raw_tokens
+            kind_id == preprocessor and raw.value(i).strip().startswith("#include")
+            for i, kind_id in enumerate(raw.kind_ids)
         )
         if not has_include:
             self.errors.append(Diagnostic(
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Iterable
+from typing import Iterable, Mapping
 
 from .models import AnalysisReport, Diagnostic, IRInstruction, Token
 
@@ -18,6 +18,15 @@ class ReportFormatter:
         ]
         return "\n\n".join(sections)
 
+    def format_token_summary(self, counts: Mapping[str, int], errors: Iterable[Diagnostic]) -> str:
+        """Summary for streamed lexing, where individual tokens are not kept."""
+        out = ["=== Lexical Analysis (streamed) ==="]
+        out.append(f"Total tokens: {sum(counts.values())}")
+        for kind, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            out.append(f"  {kind:12} {count}")
+        out.extend(self._diag_block(errors))
+        return "\n".join(out)
+
     def _lexical_section(self, report: AnalysisReport) -> str:
         out = ["=== Lexical Analysis ==="]
         out.append("Tokens:")
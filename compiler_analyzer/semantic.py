@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Set, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 from .models import Diagnostic, ExprNode, ExpressionRecord, Token
+from .unit import OPENERS, CompilationUnit
+
+if TYPE_CHECKING:
+    from .deadline import Deadline
 
 
 @dataclass
@@ -31,7 +35,18 @@ TYPE_KEYWORDS = {
 
 
 class SemanticAnalyzer:
-    def analyze(self, tokens: List[Token], expressions: List[ExpressionRecord]) -> tuple[List[Diagnostic], List[Diagnostic]]:
+    def analyze(
+        self,
+        tokens: Union[CompilationUnit, Sequence[Token]],
+        expressions: List[ExpressionRecord],
+        deadline: Optional[Deadline] = None,
+    ) -> tuple[List[Diagnostic], List[Diagnostic]]:
+        unit = CompilationUnit.coerce(tokens)
+        tokens = unit.tokens
+        values = unit.values
+        partners = unit.partners
+        kind = tokens.kind
+        n = len(values)
         errors: List[Diagnostic] = []
         warnings: List[Diagnostic] = []
 
@@ -47,103 +62,99 @@ class SemanticAnalyzer:
         scope_declared: List[Set[str]] = [set()]
 
         i = 0
-        while i < len(tokens):
-            t = tokens[i]
+        while i < n:
+            v = values[i]
 
-            if t.value == "{":
+            if v == "{":
+                if deadline is not None:
+                    deadline.check()
                 scope_declared.append(set())
                 i += 1
                 continue
 
-            if t.value == "}":
+            if v == "}":
                 if len(scope_declared) > 1:
                     scope_declared.pop()
                 i += 1
                 continue
 
-            if t.value in TYPE_KEYWORDS:
-                declared_type = t.value
+            if v in TYPE_KEYWORDS:
+                if deadline is not None:
+                    deadline.check()
+                declared_type = v
                 i += 1
-                while i < len(tokens) and tokens[i].value in TYPE_KEYWORDS.union({"*", "&"}):
-                    if tokens[i].value in {"*", "&"}:
-                        declared_type += tokens[i].value
+                while i < n and values[i] in TYPE_KEYWORDS.union({"*", "&"}):
+                    if values[i] in {"*", "&"}:
+                        declared_type += values[i]
                     i += 1
 
                 # Function declaration/definition starts here: type name (...)
-                if i < len(tokens) and tokens[i].kind == "IDENTIFIER" and i + 1 < len(tokens) and tokens[i + 1].value == "(":
-                    fn_tok = tokens[i]
-                    fn_name = fn_tok.value
+                if i < n and kind(i) == "IDENTIFIER" and i + 1 < n and values[i + 1] == "(":
+                    fn_name = values[i]
+                    fn_line = tokens.line(i)
                     functions.add(fn_name)
 
-                    params, end_idx = self._extract_function_params(tokens, i + 2)
+                    params, end_idx = self._extract_function_params(unit, i + 2)
                     for p in params:
                         symbols.setdefault(p.name, []).append(p)
 
-                    if end_idx + 1 < len(tokens) and tokens[end_idx + 1].value == "{":
-                        user_defined_functions[fn_name] = fn_tok.line
+                    if end_idx + 1 < n and values[end_idx + 1] == "{":
+                        user_defined_functions[fn_name] = fn_line
                         function_defs.append(FunctionDef(
                             name=fn_name,
                             return_type=declared_type,
-                            line=fn_tok.line,
+                            line=fn_line,
                             body_open_idx=end_idx + 1,
                         ))
-                        if fn_name == "main" and self._is_empty_function_body(tokens, end_idx + 1):
-                            empty_main_line = fn_tok.line
+                        if fn_name == "main" and self._is_empty_function_body(unit, end_idx + 1):
+                            empty_main_line = fn_line
                         # Continue scanning from the opening brace so local declarations are analyzed.
                         i = end_idx + 1
                     else:
                         i = end_idx + 1
-                        if i < len(tokens) and tokens[i].value == ";":
+                        if i < n and values[i] == ";":
                             i += 1
                     continue
 
                 expect_decl_name = True
-                depth_paren = 0
-                depth_bracket = 0
-                depth_brace = 0
-
-                while i < len(tokens) and tokens[i].value != ";":
-                    tok = tokens[i]
-                    if tok.value == "(":
-                        depth_paren += 1
-                    elif tok.value == ")":
-                        depth_paren = max(0, depth_paren - 1)
-                    elif tok.value == "[":
-                        depth_bracket += 1
-                    elif tok.value == "]":
-                        depth_bracket = max(0, depth_bracket - 1)
-                    elif tok.value == "{":
-                        depth_brace += 1
-                    elif tok.value == "}":
-                        depth_brace = max(0, depth_brace - 1)
-
-                    at_top_decl_level = depth_paren == 0 and depth_bracket == 0 and depth_brace == 0
-
-                    if tok.kind == "IDENTIFIER" and expect_decl_name and at_top_decl_level:
-                        name = tok.value
+                # Furthest closing bracket of anything opened in this
+                # declaration; tokens past it are at the declaration's top level.
+                reach = -1
+
+                while i < n and values[i] != ";":
+                    tv = values[i]
+                    if tv in OPENERS:
+                        partner = partners[i]
+                        reach = max(reach, partner if partner >= 0 else n)
+
+                    at_top_decl_level = reach <= i
+
+                    if kind(i) == "IDENTIFIER" and expect_decl_name and at_top_decl_level:
+                        name = tv
+                        line = tokens.line(i)
 
                         if name in scope_declared[-1]:
                             errors.append(Diagnostic(
                                 phase="Semantic Analysis",
                                 level="error",
                                 message=f"Multiple declaration of variable '{name}'.",
-                                line=tok.line,
-                                column=tok.column,
+                                line=line,
+                                column=tokens.column(i),
                                 suggestion=f"Rename one declaration of '{name}' or remove duplicate.",
                             ))
                         else:
                             scope_declared[-1].add(name)
                             symbols.setdefault(name, []).append(
-                                Symbol(name=name, data_type=declared_type, line=tok.line, declared_at=tok.line)
+                                Symbol(name=name, data_type=declared_type, line=line, declared_at=line)
                             )
                         expect_decl_name = False
 
-                    if tok.value == "," and at_top_decl_level:
+                    if tv == "," and at_top_decl_level:
                         expect_decl_name = True
 
                     i += 1
 
-                if i < len(tokens) and tokens[i].value == ";":
+                if i < n and values[i] == ";":
                     i += 1
                 continue
 
@@ -152,6 +163,8 @@ class SemanticAnalyzer:
         # AST-driven type propagation and usage checks.
         called_functions: Set[str] = set()
         for record in expressions:
+            if deadline is not None:
+                deadline.check()
             self._collect_called_functions(record.expr, called_functions)
             expr_type = self._infer_expr_type(record.expr, symbols, functions, errors, record.line)
 
@@ -178,7 +191,7 @@ class SemanticAnalyzer:
                             suggestion="Use a compatible type or cast explicitly.",
                         ))
 
-        self._validate_function_returns(tokens, function_defs, errors)
+        self._validate_function_returns(unit, function_defs, errors)
 
         for sym_list in symbols.values():
             for sym in sym_list:
@@ -219,25 +232,32 @@ class SemanticAnalyzer:
 
         return errors, warnings
 
-    def _validate_function_returns(self, tokens: List[Token], defs: List[FunctionDef], errors: List[Diagnostic]) -> None:
+    def _validate_function_returns(
+        self,
+        unit: CompilationUnit,
+        defs: List[FunctionDef],
+        errors: List[Diagnostic],
+    ) -> None:
+        tokens = unit.tokens
+        values = unit.values
         for fn in defs:
-            close_idx = self._find_matching_brace(tokens, fn.body_open_idx)
+            close_idx = self._find_matching_brace(unit, fn.body_open_idx)
             if close_idx <= fn.body_open_idx:
                 continue
 
             is_void = self._normalized_base_type(fn.return_type) == "void"
             for i in range(fn.body_open_idx + 1, close_idx):
-                if tokens[i].value != "return":
+                if values[i] != "return":
                     continue
 
-                has_expr = i + 1 < len(tokens) and tokens[i + 1].value != ";"
+                has_expr = i + 1 < len(values) and values[i + 1] != ";"
                 if is_void and has_expr:
                     errors.append(Diagnostic(
                         phase="Semantic Analysis",
                         level="error",
                         message=f"Void function '{fn.name}' should not return a value.",
-                        line=tokens[i].line,
-                        column=tokens[i].column,
+                        line=tokens.line(i),
+                        column=tokens.column(i),
                         suggestion="Use 'return;' in void functions, or change the function return type.",
                     ))
 
@@ -258,23 +278,15 @@ class SemanticAnalyzer:
             out.append(d)
         return out
 
-    def _is_empty_function_body(self, tokens: List[Token], open_brace_idx: int) -> bool:
-        close_idx = self._find_matching_brace(tokens, open_brace_idx)
+    def _is_empty_function_body(self, unit: CompilationUnit, open_brace_idx: int) -> bool:
+        close_idx = self._find_matching_brace(unit, open_brace_idx)
         if close_idx <= open_brace_idx:
             return False
-        body_tokens = [t for t in tokens[open_brace_idx + 1 : close_idx] if t.value not in {"{" ,"}", ";"}]
-        return len(body_tokens) == 0
-
-    def _find_matching_brace(self, tokens: List[Token], open_idx: int) -> int:
-        depth = 0
-        for i in range(open_idx, len(tokens)):
-            if tokens[i].value == "{":
-                depth += 1
-            elif tokens[i].value == "}":
-                depth -= 1
-                if depth == 0:
-                    return i
-        return open_idx
+        return all(v in {"{", "}", ";"} for v in unit.values[open_brace_idx + 1 : close_idx])
+
+    def _find_matching_brace(self, unit: CompilationUnit, open_idx: int) -> int:
+        close_idx = unit.partners[open_idx]
+        return close_idx if close_idx >= 0 else open_idx
 
     def _collect_called_functions(self, node: Optional[ExprNode], called: Set[str]) -> None:
         if node is None:
@@ -289,27 +301,32 @@ class SemanticAnalyzer:
         for arg in node.args:
             self._collect_called_functions(arg, called)
 
-    def _extract_function_params(self, tokens: List[Token], start_idx: int) -> tuple[List[Symbol], int]:
+    def _extract_function_params(self, unit: CompilationUnit, start_idx: int) -> tuple[List[Symbol], int]:
         params: List[Symbol] = []
+        tokens = unit.tokens
+        values = unit.values
+        n = len(values)
+        # The parameter list ends at the partner of the '(' before start_idx;
+        # nested parentheses inside it are skipped whole.
+        end = unit.partners[start_idx - 1]
+        if end < 0:
+            end = n
         i = start_idx
-        depth = 1
         current_type = ""
-        while i < len(tokens) and depth > 0:
-            t = tokens[i]
-            if t.value == "(":
-                depth += 1
-            elif t.value == ")":
-                depth -= 1
-                if depth == 0:
-                    break
-            elif depth == 1:
-                if t.value in TYPE_KEYWORDS:
-                    current_type = t.value
-                elif t.value in {"*", "&"} and current_type:
-                    current_type += t.value
-                elif t.kind == "IDENTIFIER" and current_type:
-                    params.append(Symbol(name=t.value, data_type=current_type, line=t.line, declared_at=t.line, used=False))
-                    current_type = ""
+        while i < end:
+            v = values[i]
+            if v == "(":
+                nested = unit.partners[i]
+                i = nested + 1 if nested >= 0 else end
+                continue
+            if v in TYPE_KEYWORDS:
+                current_type = v
+            elif v in {"*", "&"} and current_type:
+                current_type += v
+            elif tokens.kind(i) == "IDENTIFIER" and current_type:
+                line = tokens.line(i)
+                params.append(Symbol(name=v, data_type=current_type, line=line, declared_at=line, used=False))
+                current_type = ""
             i += 1
         return params, i
 
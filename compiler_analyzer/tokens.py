@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import sys
+from array import array
+from itertools import compress
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Union, overload
+
+from .models import Token
+
+
+KIND_NAMES = (
+    "KEYWORD", "TYPE", "IDENTIFIER", "NUMBER", "STRING", "CHAR",
+    "OPERATOR", "SYMBOL", "PREPROCESSOR", "INVALID",
+)
+KIND_IDS = {name: idx for idx, name in enumerate(KIND_NAMES)}
+# Kinds whose values repeat heavily; these are interned so every occurrence of
+# the same name shares one string.
+WORD_KIND_IDS = frozenset(KIND_IDS[name] for name in ("KEYWORD", "TYPE", "IDENTIFIER"))
+
+
+class TokenStream(Sequence[Token]):
+    """Struct-of-arrays token container.
+
+    Each token is a row across parallel ``array('i')`` columns (kind id, line,
+    column, start/end offsets into ``source``). Values are sliced from the
+    source only when asked for, and indexing returns a freshly built ``Token``
+    so code written against ``List[Token]`` keeps working.
+
+    ``source`` is normally a ``str``, but may be an ASCII byte buffer (for
+    example a memory-mapped file), in which case values are decoded on read.
+    Identifier, keyword and type values are interned.
+    """
+
+    __slots__ = ("source", "kind_ids", "lines", "columns", "starts", "ends", "_values")
+
+    def __init__(self, source: Any = "") -> None:
+        self.source = source
+        self.kind_ids = array("i")
+        self.lines = array("i")
+        self.columns = array("i")
+        self.starts = array("i")
+        self.ends = array("i")
+        # Only set for streams built from Token objects, which carry no offsets.
+        self._values: Optional[List[str]] = None
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[Token]) -> "TokenStream":
+        stream = cls()
+        stream._values = []
+        for t in tokens:
+            stream.kind_ids.append(KIND_IDS[t.kind])
+            stream.lines.append(t.line)
+            stream.columns.append(t.column)
+            stream.starts.append(-1)
+            stream.ends.append(-1)
+            stream._values.append(t.value)
+        return stream
+
+    @classmethod
+    def coerce(cls, tokens: Union["TokenStream", Iterable[Token]]) -> "TokenStream":
+        if isinstance(tokens, TokenStream):
+            return tokens
+        return cls.from_tokens(tokens)
+
+    def append(self, kind: str, line: int, column: int, start: int, end: int) -> None:
+        self.kind_ids.append(KIND_IDS[kind])
+        self.lines.append(line)
+        self.columns.append(column)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def kind(self, index: int) -> str:
+        return KIND_NAMES[self.kind_ids[index]]
+
+    def value(self, index: int) -> str:
+        if self._values is not None:
+            return self._values[index]
+        text = self.source[self.starts[index] : self.ends[index]]
+        if not isinstance(text, str):
+            text = str(text, "ascii")
+        if self.kind_ids[index] in WORD_KIND_IDS:
+            return sys.intern(text)
+        return text
+
+    def line(self, index: int) -> int:
+        return self.lines[index]
+
+    def column(self, index: int) -> int:
+        return self.columns[index]
+
+    def token(self, index: int) -> Token:
+        return Token(KIND_NAMES[self.kind_ids[index]], self.value(index), self.lines[index], self.columns[index])
+
+    def without(self, kind: str) -> "TokenStream":
+        """Return a new stream sharing ``source`` with every ``kind`` token dropped."""
+        drop = KIND_IDS[kind]
+        keep = [k != drop for k in self.kind_ids]
+        out = TokenStream(self.source)
+        out.kind_ids = array("i", compress(self.kind_ids, keep))
+        out.lines = array("i", compress(self.lines, keep))
+        out.columns = array("i", compress(self.columns, keep))
+        out.starts = array("i", compress(self.starts, keep))
+        out.ends = array("i", compress(self.ends, keep))
+        if self._values is not None:
+            out._values = list(compress(self._values, keep))
+        return out
+
+    def values(self) -> List[str]:
+        """Materialize every value at once, for loops that read them repeatedly.
+
+        The list is not kept on the stream; callers hold it only as long as
+        they need it.
+        """
+        if self._values is not None:
+            return list(self._values)
+        source = self.source
+        if isinstance(source, str):
+            values = [source[s:e] for s, e in zip(self.starts, self.ends)]
+        else:
+            values = [str(source[s:e], "ascii") for s, e in zip(self.starts, self.ends)]
+        intern = sys.intern
+        words = WORD_KIND_IDS
+        for i, kind_id in enumerate(self.kind_ids):
+            if kind_id in words:
+                values[i] = intern(values[i])
+        return values
+
+    def to_tokens(self) -> List[Token]:
+        names = KIND_NAMES
+        return [
+            Token(names[k], v, ln, col)
+            for k, v, ln, col in zip(self.kind_ids, self.values(), self.lines, self.columns)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.kind_ids)
+
+    @overload
+    def __getitem__(self, index: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Token]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.token(i) for i in range(*index.indices(len(self.kind_ids)))]
+        if index < 0:
+            index += len(self.kind_ids)
+        if not 0 <= index < len(self.kind_ids):
+            raise IndexError("token index out of range")
+        return self.token(index)
+
+    def __iter__(self) -> Iterator[Token]:
+        for i in range(len(self.kind_ids)):
+            yield self.token(i)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Sequence, Tuple, Union
+
+from .models import Token
+from .tokens import TokenStream
+
+
+OPENERS = {"(": ")", "[": "]", "{": "}"}
+CLOSERS = {close: open_ for open_, close in OPENERS.items()}
+
+
+@dataclass(frozen=True)
+class CompilationUnit:
+    """Token views shared by every phase of one analysis.
+
+    ``tokens`` is the lexer output with preprocessor lines dropped, which is
+    what the parser, semantic analyzer and IR generator all walk; ``raw``
+    keeps the directives for checks that need them. Everything here is
+    computed once by ``build`` and must be treated as read-only.
+
+    ``partners[i]`` is the index of the bracket matching token ``i`` (each of
+    ``()``, ``[]`` and ``{}`` is matched on its own), or -1 when token ``i``
+    is not a bracket or has no partner. ``depths[i]`` is the number of
+    brackets enclosing token ``i``; a bracket pair sits at the depth of its
+    surroundings, an unclosed opener nests everything after it and a stray
+    closer is ignored. ``line_starts[k]`` is the index of the first token on
+    line ``k + 1`` or later.
+    """
+
+    raw: TokenStream
+    tokens: TokenStream
+    values: Tuple[str, ...]
+    partners: array
+    depths: array
+    line_starts: array
+
+    @classmethod
+    def build(cls, raw: Union[TokenStream, Sequence[Token]]) -> "CompilationUnit":
+        raw = TokenStream.coerce(raw)
+        tokens = raw.without("PREPROCESSOR")
+        values = tuple(tokens.values())
+        partners, depths = cls._match_brackets(values)
+        return cls(
+            raw=raw,
+            tokens=tokens,
+            values=values,
+            partners=partners,
+            depths=depths,
+            line_starts=cls._index_lines(tokens.lines),
+        )
+
+    @classmethod
+    def coerce(cls, tokens: Union["CompilationUnit", TokenStream, Sequence[Token]]) -> "CompilationUnit":
+        if isinstance(tokens, CompilationUnit):
+            return tokens
+        return cls.build(tokens)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def tokens_on_line(self, line: int) -> range:
+        """Indexes into ``tokens`` of the tokens that start on ``line``."""
+        starts = self.line_starts
+        if line < 1 or line > len(starts):
+            return range(0)
+        end = starts[line] if line < len(starts) else len(self.values)
+        return range(starts[line - 1], end)
+
+    @staticmethod
+    def _match_brackets(values: Sequence[str]) -> Tuple[array, array]:
+        partners = array("i", [-1]) * len(values)
+        depths = array("i", [0]) * len(values)
+        stacks = {open_: [] for open_ in OPENERS}
+        depth = 0
+        for i, v in enumerate(values):
+            if v in OPENERS:
+                stacks[v].append(i)
+                depths[i] = depth
+                depth += 1
+            elif v in CLOSERS:
+                stack = stacks[CLOSERS[v]]
+                if stack:
+                    j = stack.pop()
+                    partners[i] = j
+                    partners[j] = i
+                    depth -= 1
+                depths[i] = depth
+            else:
+                depths[i] = depth
+        return partners, depths
+
+    @staticmethod
+    def _index_lines(lines: array) -> array:
+        last = lines[-1] if lines else 0
+        return array("i", [bisect_left(lines, line) for line in range(1, last + 1)])
@@ -98,17 +98,7 @@ async function runAnalysis() {
   setBusy(true);
 
   try {
-    const response = await fetch("/api/analyze", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ source: src }),
-    });
-
-    if (!response.ok) {
-      throw new Error("Backend endpoint not available yet. Add /api/analyze server route next.");
-    }
-
-    const result = await response.json();
+    const result = await analyzeStreaming(src);
     renderResult(result);
     renderVisualAnalytics(src, result);
     setStatus("Analysis completed.", true);
@@ -121,6 +111,63 @@ async function runAnalysis() {
   }
 }
 
+// Streams phase results from /api/analyze/stream (one JSON event per line)
+// and fills each panel as soon as its phase arrives. Falls back to the
+// single-response endpoint when the browser cannot read response streams.
+async function analyzeStreaming(src) {
+  const response = await fetch("/api/analyze/stream?format=ndjson", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ source: src }),
+  });
+  if (!response.ok || !response.body || typeof TextDecoder === "undefined") {
+    return analyzeOnce(src);
+  }
+
+  const result = {};
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+    let newline = buffered.indexOf("\n");
+    while (newline >= 0) {
+      const line = buffered.slice(0, newline).trim();
+      buffered = buffered.slice(newline + 1);
+      if (line) {
+        const message = JSON.parse(line);
+        if (message.event === "error") {
+          throw new Error(message.data.error || "Analysis failed.");
+        }
+        if (message.event === "done") {
+          return result;
+        }
+        Object.assign(result, message.data);
+        renderPhase(message.event, result);
+      }
+      newline = buffered.indexOf("\n");
+    }
+    if (done) {
+      throw new Error("Analysis stream ended early.");
+    }
+  }
+}
+
+async function analyzeOnce(src) {
+  const response = await fetch("/api/analyze", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ source: src }),
+  });
+
+  if (!response.ok) {
+    throw new Error("Backend endpoint not available yet. Add /api/analyze server route next.");
+  }
+  return response.json();
+}
+
 analyzeBtn.addEventListener("click", runAnalysis);
 
 sourceInput.addEventListener("keydown", (event) => {
@@ -147,7 +194,30 @@ function setStatus(text, ok) {
   statusDot.style.background = ok ? "var(--ok)" : "var(--danger)";
 }
 
-function renderResult(result) {
+function renderPhase(phase, result) {
+  renderSummary(result);
+  if (phase === "lexical") {
+    panels.lexicalOut.textContent = result.lexical || "No lexical output.";
+  } else if (phase === "syntax") {
+    panels.syntaxOut.textContent = result.syntax || "No syntax output.";
+  } else if (phase === "parse_tree") {
+    renderParseTree3D(result.parse_tree || "No parse tree output.");
+  } else if (phase === "semantic") {
+    panels.semanticOut.textContent = result.semantic || "No semantic output.";
+  } else if (phase === "ir") {
+    panels.irOut.textContent = result.ir || "No IR output.";
+  } else if (phase === "optimization") {
+    panels.optOut.textContent = result.optimization || "No optimization output.";
+  } else if (phase === "codegen") {
+    panels.codegenOut.textContent = result.codegen || "No code generation output.";
+  } else if (phase === "complexity") {
+    panels.complexityOut.textContent = result.complexity_detail || result.complexity || "No complexity output.";
+  } else if (phase === "guided_feedback") {
+    panels.suggestionOut.textContent = buildSuggestionOutput(result);
+  }
+}
+
+function renderSummary(result) {
   summaryCards.innerHTML = "";
   const cards = [
     ["Tokens", String(result.tokens_count || "-")],
@@ -163,7 +233,10 @@ function renderResult(result) {
     el.innerHTML = `<span>${label}</span><strong>${value}</strong>`;
     summaryCards.appendChild(el);
   });
+}
 
+function renderResult(result) {
+  renderSummary(result);
   panels.lexicalOut.textContent = result.lexical || "No lexical output.";
   panels.syntaxOut.textContent = result.syntax || "No syntax output.";
   renderParseTree3D(result.parse_tree || "No parse tree output.");
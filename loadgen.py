@@ -0,0 +1,346 @@
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+from bench_server import SERVERS, free_port, percentile, start_server
+from request_log import REPLAYED_HEADERS
+
+ROOT = Path(__file__).resolve().parent
+
+
+@dataclass(frozen=True)
+class Job:
+    """One request to send. ``offset`` is its recorded start, in seconds after the first."""
+
+    label: str
+    method: str
+    path: str
+    body: bytes = b""
+    headers: tuple = ()
+    offset: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class Result:
+    label: str
+    status: int  # 0 when no response arrived
+    seconds: float
+    error: str = ""
+
+
+def _source_label(source: str) -> str:
+    first = next((line.strip() for line in source.splitlines() if line.strip()), "")
+    return first[:60]
+
+
+def load_log(path: Path) -> tuple[list[Job], int]:
+    """Jobs from a JSONL capture log, plus the number of lines that cannot be replayed.
+
+    A line is either a captured request (``method``, ``path`` and a JSON
+    ``body`` or raw ``body_text``, with an optional ``ts``), as written by
+    ``request_log.RequestLog``, or a bare ``{"source": ...}`` record, which
+    becomes a POST to ``/api/analyze``. Captured POSTs logged without their
+    body (not sampled) are skipped.
+    """
+    jobs: list[Job] = []
+    skipped = 0
+    first_ts = None
+    with path.open(encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                skipped += bool(line.strip())
+                continue
+            if not isinstance(record, dict):
+                skipped += 1
+                continue
+            if "path" not in record:
+                if not isinstance(record.get("source"), str):
+                    skipped += 1
+                    continue
+                record = {"method": "POST", "path": "/api/analyze", "body": record}
+            method = str(record.get("method", "POST")).upper()
+            if method == "POST" and "body" not in record and "body_text" not in record:
+                skipped += 1
+                continue
+            if "body" in record:
+                body = json.dumps(record["body"]).encode("utf-8")
+            else:
+                body = str(record.get("body_text", "")).encode("utf-8")
+            headers = {
+                name.lower(): str(value)
+                for name, value in (record.get("headers") or {}).items()
+                if name.lower() in REPLAYED_HEADERS
+            }
+            if body and "content-type" not in headers:
+                headers["content-type"] = "application/json"
+            offset = None
+            if isinstance(record.get("ts"), (int, float)):
+                first_ts = record["ts"] if first_ts is None else first_ts
+                offset = record["ts"] - first_ts
+            source = record["body"].get("source") if isinstance(record.get("body"), dict) else None
+            label = f"{path.name}:{number} {record['path']}"
+            if isinstance(source, str):
+                label += f" {_source_label(source)}"
+            jobs.append(Job(label, method, record["path"], body, tuple(headers.items()), offset))
+    return jobs, skipped
+
+
+def _analyze_job(label: str, source: str) -> Job:
+    body = json.dumps({"source": source}).encode("utf-8")
+    return Job(label, "POST", "/api/analyze", body, (("content-type", "application/json"),))
+
+
+def load_corpus(paths: list[Path]) -> list[Job]:
+    """One analysis per C/C++ file; directories are searched recursively."""
+    files: list[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix in (".c", ".cc", ".cpp", ".h")))
+        else:
+            files.append(path)
+    return [_analyze_job(str(path), path.read_text(encoding="utf-8")) for path in files]
+
+
+def synthetic_corpus(count: int) -> list[Job]:
+    """``count`` generated programs of growing size: nested loops, calls and a few errors."""
+    jobs = []
+    for index in range(count):
+        functions = 1 + index % 8
+        body = []
+        for number in range(functions):
+            depth = 1 + number % 3
+            loops = "".join(f"{'    ' * (d + 1)}for (int i{d} = 0; i{d} < n; i{d}++) {{\n" for d in range(depth))
+            closes = "".join(f"{'    ' * (d + 1)}}}\n" for d in reversed(range(depth)))
+            inner = "    " * (depth + 1) + "s = s + 1;\n"
+            body.append(f"int f{number}(int n) {{\n    int s = 0;\n{loops}{inner}{closes}    return s;\n}}\n")
+        if index % 5 == 4:
+            body.append("int broken(int n) {\n    int x = n\n    return y;\n}\n")
+        calls = " + ".join(f"f{number}(n)" for number in range(functions))
+        body.append(f"int main() {{\n    int n = {10 + index};\n    return {calls};\n}}\n")
+        jobs.append(_analyze_job(f"synthetic-{index} ({functions} functions)", "".join(body)))
+    return jobs
+
+
+def schedule(jobs: list[Job], total: int, rate: float, replay_timing: bool, speed: float) -> list[tuple[Optional[float], Job]]:
+    """``total`` jobs, cycling through ``jobs``, each with a planned start time.
+
+    A fixed ``rate`` spaces starts evenly. ``replay_timing`` keeps the log's
+    own gaps, divided by ``speed``, and adds one log span per pass. Without
+    either, starts are None and the workers send as fast as they can.
+    """
+    planned: list[tuple[Optional[float], Job]] = []
+    span = 0.0
+    if replay_timing:
+        offsets = [job.offset or 0.0 for job in jobs]
+        span = max(offsets) + (max(offsets) / max(len(jobs) - 1, 1))
+    for index in range(total):
+        job = jobs[index % len(jobs)]
+        if rate > 0:
+            start = index / rate
+        elif replay_timing:
+            start = ((index // len(jobs)) * span + (job.offset or 0.0)) / speed
+        else:
+            start = None
+        planned.append((start, job))
+    return planned
+
+
+def run(
+    url: str, planned: list[tuple[Optional[float], Job]], concurrency: int, timeout: float = 60.0
+) -> tuple[list[Result], float]:
+    """Send the planned requests from ``concurrency`` keep-alive connections.
+
+    Paced requests are timed from their planned start, not from when a
+    worker got to them, so a slow server cannot hide its queueing delay
+    by holding back the next request (coordinated omission).
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    results: list[Result] = []
+    lock = threading.Lock()
+    cursor = [0]
+    began = time.perf_counter()
+
+    def worker() -> None:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        mine = []
+        while True:
+            with lock:
+                index = cursor[0]
+                cursor[0] += 1
+            if index >= len(planned):
+                break
+            start, job = planned[index]
+            if start is not None:
+                delay = began + start - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                sent = began + start
+            else:
+                sent = time.perf_counter()
+            status, error = 0, ""
+            try:
+                # http.client reconnects by itself when the server closed the connection.
+                conn.request(job.method, job.path, job.body or None, dict(job.headers))
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if status >= 400:
+                    error = f"HTTP {status}"
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                error = f"{type(exc).__name__}: {exc}"
+            mine.append(Result(job.label, status, time.perf_counter() - sent, error))
+        conn.close()
+        with lock:
+            results.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(concurrency, len(planned))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - began
+
+
+def summarize(results: list[Result], seconds: float, slowest: int = 5) -> dict:
+    latencies = [result.seconds for result in results]
+    statuses: dict[str, int] = {}
+    errors: dict[str, int] = {}
+    for result in results:
+        statuses[str(result.status)] = statuses.get(str(result.status), 0) + 1
+        if result.error:
+            errors[result.error] = errors.get(result.error, 0) + 1
+    failed = sum(errors.values())
+    summary = {
+        "requests": len(results),
+        "seconds": round(seconds, 3),
+        "throughput": round(len(results) / seconds, 1) if seconds else 0.0,
+        "errors": failed,
+        "error_rate": round(failed / len(results), 4) if results else 0.0,
+        "statuses": dict(sorted(statuses.items())),
+        "error_kinds": dict(sorted(errors.items(), key=lambda item: -item[1])),
+        "latency_ms": {},
+        "slowest": [],
+    }
+    if latencies:
+        summary["latency_ms"] = {
+            name: round(value * 1000, 2)
+            for name, value in (
+                ("p50", percentile(latencies, 0.5)),
+                ("p95", percentile(latencies, 0.95)),
+                ("p99", percentile(latencies, 0.99)),
+                ("max", max(latencies)),
+            )
+        }
+        # Each input's worst time, so one slow input does not fill the list.
+        worst: dict[str, Result] = {}
+        for result in results:
+            if result.label not in worst or result.seconds > worst[result.label].seconds:
+                worst[result.label] = result
+        summary["slowest"] = [
+            {"input": result.label, "ms": round(result.seconds * 1000, 2), "status": result.status}
+            for result in sorted(worst.values(), key=lambda item: -item.seconds)[:slowest]
+        ]
+    return summary
+
+
+def format_report(summary: dict) -> str:
+    latency = summary["latency_ms"]
+    lines = [
+        f"requests   {summary['requests']} in {summary['seconds']:.2f} s ({summary['throughput']:,.1f} req/s)",
+        f"errors     {summary['errors']} ({summary['error_rate']:.2%})"
+        + "".join(f"\n  {count:6}  {kind}" for kind, count in summary["error_kinds"].items()),
+        "statuses   " + ", ".join(f"{status}: {count}" for status, count in summary["statuses"].items()),
+    ]
+    if latency:
+        lines.append(
+            f"latency    p50 {latency['p50']:.2f} ms  p95 {latency['p95']:.2f} ms"
+            f"  p99 {latency['p99']:.2f} ms  max {latency['max']:.2f} ms"
+        )
+        lines.append("slowest inputs:")
+        lines.extend(f"  {item['ms']:9.2f} ms  [{item['status']}]  {item['input']}" for item in summary["slowest"])
+    return "\n".join(lines)
+
+
+def check_thresholds(summary: dict, max_p99: Optional[float], max_error_rate: Optional[float]) -> list[str]:
+    """The limits the run broke, as messages."""
+    problems = []
+    p99 = summary["latency_ms"].get("p99")
+    if max_p99 is not None and p99 is not None and p99 > max_p99:
+        problems.append(f"p99 {p99:.2f} ms is over the {max_p99:.2f} ms limit")
+    if max_error_rate is not None and summary["error_rate"] > max_error_rate:
+        problems.append(f"error rate {summary['error_rate']:.2%} is over the {max_error_rate:.2%} limit")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay request logs or corpora against the analyzer server")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://127.0.0.1:8000", help="Server to load (default %(default)s)")
+    target.add_argument("--spawn", choices=sorted(SERVERS), help="Start this front end on a free port and load it")
+    parser.add_argument("--log", type=Path, action="append", default=[], help="JSONL request log to replay")
+    parser.add_argument("--corpus", type=Path, action="append", default=[], help="C/C++ file or directory to analyze")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add this many generated programs")
+    parser.add_argument("--requests", type=int, help="Requests to send, cycling through the inputs (default: each once)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client connections")
+    parser.add_argument("--rate", type=float, default=0.0, help="Requests per second (default: as fast as possible)")
+    parser.add_argument("--replay-timing", action="store_true", help="Keep the gaps recorded in --log files")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed-up factor for --replay-timing")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request socket timeout in seconds")
+    parser.add_argument("--slowest", type=int, default=5, help="Slowest inputs to list")
+    parser.add_argument("--json", type=Path, help="Also write the summary to this file")
+    parser.add_argument("--max-p99", type=float, help="Exit with status 1 if p99 latency (ms) is higher")
+    parser.add_argument("--max-error-rate", type=float, help="Exit with status 1 if the error rate (0-1) is higher")
+    args = parser.parse_args()
+
+    jobs: list[Job] = []
+    for path in args.log:
+        logged, skipped = load_log(path)
+        if skipped:
+            print(f"{path}: skipped {skipped} lines that cannot be replayed", file=sys.stderr)
+        jobs.extend(logged)
+    jobs.extend(load_corpus(args.corpus))
+    jobs.extend(synthetic_corpus(args.synthetic))
+    if not args.log and not args.corpus and not args.synthetic:
+        jobs = load_corpus([ROOT / "samples"]) + synthetic_corpus(20)
+    if not jobs:
+        parser.error("no requests to send")
+    planned = schedule(jobs, args.requests or len(jobs), args.rate, args.replay_timing, args.speed)
+
+    process = None
+    url = args.url
+    if args.spawn:
+        port = free_port()
+        process = start_server(SERVERS[args.spawn], port)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        results, seconds = run(url, planned, args.concurrency, args.timeout)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    summary = summarize(results, seconds, args.slowest)
+    print(f"{len(planned)} requests from {len(jobs)} inputs to {url}, concurrency {args.concurrency}")
+    print(format_report(summary))
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+    problems = check_thresholds(summary, args.max_p99, args.max_error_rate)
+    for problem in problems:
+        print(f"FAIL: {problem}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
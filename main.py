@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import argparse
+import mmap
+from collections import Counter
 from pathlib import Path
 
 from compiler_analyzer import CompilerAnalyzer
+from compiler_analyzer.lexer import Lexer
 from compiler_analyzer.reporter import ReportFormatter
 
 
@@ -18,9 +21,36 @@ def build_parser() -> argparse.ArgumentParser:
         default=None,
         help="Optional path to save full analysis report",
     )
+    parser.add_argument(
+        "--tokens-only",
+        action="store_true",
+        help="Only stream the lexer over the file and print token counts (for very large inputs)",
+    )
     return parser
 
 
+def analyze_file(path: Path) -> str:
+    analyzer = CompilerAnalyzer()
+    with path.open("rb") as handle:
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be memory-mapped.
+            return ReportFormatter().format(analyzer.analyze(""))
+        with mapped:
+            # Token values point into the mapping, so format before it closes.
+            return ReportFormatter().format(analyzer.analyze(mapped))
+
+
+def summarize_tokens(path: Path) -> str:
+    counts: Counter[str] = Counter()
+    errors = []
+    with path.open("rb") as handle:
+        for token in Lexer("regex").iter_tokens(handle, errors):
+            counts[token.kind] += 1
+    return ReportFormatter().format_token_summary(counts, errors)
+
+
 def main() -> int:
     args = build_parser().parse_args()
 
@@ -28,11 +58,7 @@ def main() -> int:
         print(f"Input file not found: {args.input}")
         return 1
 
-    source = args.input.read_text(encoding="utf-8")
-    analyzer = CompilerAnalyzer()
-    report = analyzer.analyze(source)
-
-    text = ReportFormatter().format(report)
+    text = summarize_tokens(args.input) if args.tokens_only else analyze_file(args.input)
     print(text)
 
     if args.save:
@@ -0,0 +1,149 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Each thread updates its own shard of counters and histograms, so recording a
+sample takes no lock; ``render`` sums the shards when ``/metrics`` is
+scraped. Shards of threads that have exited (``ThreadingHTTPServer`` runs
+one thread per connection) are folded into a retired total at that point.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+# (name, type, help, [(labels, value)]) produced by a collector at scrape time.
+Family = Tuple[str, str, str, List[Tuple[Labels, float]]]
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._families: Dict[str, Tuple[str, str]] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._families[name] = ("counter", help_text)
+
+    def gauge(self, name: str, help_text: str) -> None:
+        """A gauge moved with ``inc``: in-flight work that starts and ends on one thread."""
+        self._families[name] = ("gauge", help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        self._families[name] = ("histogram", help_text)
+        self._buckets[name] = tuple(buckets)
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """Add families computed when scraped, e.g. from another object's stats."""
+        self._collectors.append(collector)
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1) -> None:
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        shard = self._shard()
+        key = (name, labels)
+        state = shard.get(key)
+        if state is None:
+            # One slot per bucket plus +Inf, then the sum.
+            state = shard[key] = [0] * (len(self._buckets[name]) + 2)
+        state[bisect_left(self._buckets[name], value)] += 1
+        state[-1] += value
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) % 256 == 0:
+                    # Keep the list bounded even if nothing scrapes.
+                    self._retire_dead()
+            return shard
+
+    def _retire_dead(self) -> None:
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _merge(self._retired, shard)
+        self._shards = live
+
+    def snapshot(self) -> dict:
+        """Totals over every thread, keyed by ``(name, labels)``."""
+        with self._lock:
+            self._retire_dead()
+            totals = _merge({}, self._retired)
+            for _, shard in self._shards:
+                _merge(totals, shard.copy())
+        return totals
+
+    def render(self) -> str:
+        totals = self.snapshot()
+        samples: Dict[str, List[Tuple[Labels, object]]] = {name: [] for name in self._families}
+        for (name, labels), value in sorted(totals.items()):
+            samples[name].append((labels, value))
+
+        out: List[str] = []
+        for name, (kind, help_text) in self._families.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                for labels, value in samples[name] or [((), 0)]:
+                    out.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            bounds = self._buckets[name]
+            for labels, state in samples[name]:
+                running = 0
+                for bound, count in zip(bounds + (float("inf"),), state):
+                    running += count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    out.append(f"{name}_bucket{_labels(labels + (('le', le),))} {running}")
+                out.append(f"{name}_sum{_labels(labels)} {_number(state[-1])}")
+                out.append(f"{name}_count{_labels(labels)} {running}")
+        for collector in self._collectors:
+            for name, kind, help_text, values in collector():
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                for labels, value in values:
+                    out.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(out) + "\n"
+
+
+def _merge(into: dict, shard: dict) -> dict:
+    for key, value in shard.items():
+        if isinstance(value, list):
+            current = into.get(key)
+            into[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            into[key] = into.get(key, 0) + value
+    return into
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
@@ -0,0 +1,224 @@
+"""Structured request log: one JSON object per request in a rotating JSONL file.
+
+Request threads, and the asyncio server's event loop, only append a small
+record to a bounded buffer: timings and results, a reference to the source,
+plus the raw request body for requests logged in full. A background thread
+hashes and measures the source, encodes the JSON lines and writes them in
+batches, so neither a large source nor a slow disk delays a response; when
+the buffer is full, records are dropped and counted instead. Lines carry
+``method``, ``path``, ``headers``, ``body`` and ``ts`` in the shape
+``loadgen.py --log`` replays. The source itself (the request ``body``) is
+only kept for sampled and slow requests; the other lines still record its
+hash and size.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Mapping, Optional
+from urllib.parse import urlsplit
+
+# Request headers kept with a full record, because they change the response.
+REPLAYED_HEADERS = ("content-type", "accept", "accept-encoding", "if-none-match", "if-modified-since")
+
+
+class RequestLog:
+    """Buffered JSONL log rotated at ``max_bytes``, keeping ``backups`` old files.
+
+    Requests slower than ``slow_ms``, and a ``sample_rate`` share of the
+    rest, are logged in full: headers and request body included.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = 64 * 1024 * 1024,
+        backups: int = 5,
+        sample_rate: float = 0.0,
+        slow_ms: Optional[float] = None,
+        buffer_size: int = 10_000,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._buffer: deque = deque()
+        self._pending = 0  # records taken from the buffer but not yet written
+        self._cond = threading.Condition()
+        self._closed = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("ab")
+        self._thread = threading.Thread(target=self._run, name="request-log", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_env(cls) -> Optional["RequestLog"]:
+        """Configure from ``ANALYSIS_REQUEST_LOG`` and friends; None when it is unset."""
+        env = os.environ.get
+        path = env("ANALYSIS_REQUEST_LOG")
+        if not path:
+            return None
+        return cls(
+            Path(path),
+            max_bytes=int(env("ANALYSIS_REQUEST_LOG_BYTES", 64 * 1024 * 1024)),
+            backups=int(env("ANALYSIS_REQUEST_LOG_BACKUPS", 5)),
+            sample_rate=float(env("ANALYSIS_REQUEST_LOG_SAMPLE", 0.0)),
+            slow_ms=float(env("ANALYSIS_REQUEST_LOG_SLOW_MS")) if env("ANALYSIS_REQUEST_LOG_SLOW_MS") else None,
+        )
+
+    def record(
+        self,
+        method: str,
+        target: str,
+        status: int,
+        started: float,
+        seconds: float,
+        headers: Mapping[str, str],
+        capture: dict,
+    ) -> None:
+        """Queue one request without blocking.
+
+        ``started`` is the wall-clock start and ``seconds`` the time taken.
+        ``capture`` holds what the handler learned: the ``raw`` request body,
+        the ``source``, per-phase ``phases`` timings in ms, the ``cache``
+        status, the ``complexity`` result and the ``truncated`` flag.
+        """
+        duration_ms = seconds * 1000
+        full = (self.slow_ms is not None and duration_ms >= self.slow_ms) or (
+            self.sample_rate > 0 and random.random() < self.sample_rate
+        )
+        entry = {
+            "ts": round(started, 6),
+            "method": method,
+            # The query may hold the source (GET streams), so it is only kept in full records.
+            "path": target if full else urlsplit(target).path,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+        }
+        for name in ("cache", "complexity"):
+            if capture.get(name) is not None:
+                entry[name] = capture[name]
+        if capture.get("truncated"):
+            entry["truncated"] = True
+        if capture.get("phases"):
+            entry["phases"] = capture["phases"]
+        raw = None
+        if full:
+            entry["headers"] = {name: headers.get(name) for name in REPLAYED_HEADERS if headers.get(name) is not None}
+            raw = capture.get("raw")
+        # The source is hashed on the writer thread and dropped there.
+        item = (entry, capture.get("source"), raw)
+        with self._cond:
+            if self._closed or len(self._buffer) >= self.buffer_size:
+                self.dropped += 1
+                return
+            self._buffer.append(item)
+            if len(self._buffer) >= self.buffer_size // 2:
+                self._cond.notify()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is on disk; False on timeout."""
+        end = time.monotonic() + timeout
+        with self._cond:
+            while self._buffer or self._pending:
+                left = end - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(min(left, 0.05))
+        return True
+
+    def close(self) -> None:
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"written": self.written, "dropped": self.dropped, "buffered": len(self._buffer)}
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._buffer and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                if not self._buffer and self._closed:
+                    return
+                items = list(self._buffer)
+                self._buffer.clear()
+                self._pending = len(items)
+            written = dropped = 0
+            lines = []
+            for item in items:
+                try:
+                    lines.append(self._line(*item))
+                except Exception:  # one bad record must not stop the writer
+                    dropped += 1
+            if lines:
+                try:
+                    self._write(lines)
+                except (OSError, ValueError):
+                    dropped += len(lines)
+                else:
+                    written = len(lines)
+            with self._cond:
+                self.written += written
+                self.dropped += dropped
+                self._pending = 0
+                self._cond.notify_all()
+
+    @staticmethod
+    def _line(entry: dict, source: Optional[str], raw: Optional[bytes]) -> bytes:
+        if source is not None:
+            encoded = source.encode("utf-8")
+            entry["source_sha256"] = hashlib.sha256(encoded).hexdigest()
+            entry["source_bytes"] = len(encoded)
+            entry["source_lines"] = source.count("\n") + 1
+        if raw:
+            try:
+                entry["body"] = json.loads(raw)
+            except (ValueError, UnicodeDecodeError):
+                entry["body_text"] = raw.decode("utf-8", "replace")
+        return json.dumps(entry).encode("utf-8") + b"\n"
+
+    def _write(self, lines: list[bytes]) -> None:
+        chunk: list[bytes] = []
+        size = self._file.tell()
+        for line in lines:
+            if self.max_bytes and size and size + len(line) > self.max_bytes:
+                self._file.write(b"".join(chunk))
+                chunk = []
+                self._rotate()
+                size = 0
+            chunk.append(line)
+            size += len(line)
+        self._file.write(b"".join(chunk))
+        self._file.flush()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backups > 0:
+            for number in range(self.backups - 1, 0, -1):
+                older = self.path.with_name(f"{self.path.name}.{number}")
+                if older.exists():
+                    os.replace(older, self.path.with_name(f"{self.path.name}.{number + 1}"))
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+            self._file = self.path.open("ab")
+        else:
+            self._file = self.path.open("wb")
@@ -1,18 +1,186 @@
 from __future__ import annotations
 
+import base64
+import gzip
+import hashlib
+import io
 import json
 import mimetypes
+import multiprocessing
+import os
+import queue
 import re
+import signal
+import socket
+import tarfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
 from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from urllib.parse import urlparse
+from stat import S_ISREG
+from typing import Dict, Optional, Union
+from urllib.parse import parse_qs, urlparse
 
-from compiler_analyzer import CompilerAnalyzer
+from compiler_analyzer import AnalysisReport, CompilerAnalyzer, Deadline
+from compiler_analyzer.engine import PHASES, resolve_phases
+from compiler_analyzer.instrumentation import PhaseObserver, PhaseTimer
+from compiler_analyzer.lexer import Lexer
+from compiler_analyzer.tokens import KIND_NAMES, TokenStream
+from metrics import LATENCY_BUCKETS, PHASE_BUCKETS, SIZE_BUCKETS, MetricsRegistry
+from request_log import RequestLog
 
 
 ROOT = Path(__file__).resolve().parent
 FRONTEND_DIR = ROOT / "frontend"
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+BATCH_MAX_ITEMS = 1000
+BATCH_SOURCE_SUFFIXES = (".c", ".cc", ".cpp", ".cxx")
+# ANALYSIS_TRACE_MEMORY=1 adds tracemalloc figures to requested timings.
+TRACE_MEMORY = os.environ.get("ANALYSIS_TRACE_MEMORY", "0") == "1"
+
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+}
+
+
+def _analyzer_version() -> str:
+    """Digest of the code that produces a response, so cached results from
+    an older analyzer or response format are never served."""
+    digest = hashlib.sha256()
+    for path in sorted((ROOT / "compiler_analyzer").glob("*.py")) + [Path(__file__).resolve()]:
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+ANALYZER_VERSION = _analyzer_version()
+
+
+class ResultCache:
+    """Content-addressed LRU cache of encoded analysis responses.
+
+    Keys are a hash of the analyzer version and the source as analyzed
+    (already stripped by the handler). Values are the JSON response bodies,
+    so a hit is served without re-encoding and the byte budget is exact.
+    ``max_bytes`` of 0 disables the in-memory tier.
+
+    With ``directory`` set, every stored response is also written there as
+    ``<key>.json`` and memory misses fall back to it, so warm results
+    survive restarts. The disk tier is not size-limited; since keys include
+    the analyzer version, it can be cleared at any time.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, directory: Optional[Path] = None) -> None:
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Configure from ``ANALYSIS_CACHE_BYTES`` and ``ANALYSIS_CACHE_DIR``."""
+        directory = os.environ.get("ANALYSIS_CACHE_DIR")
+        return cls(
+            max_bytes=int(os.environ.get("ANALYSIS_CACHE_BYTES", DEFAULT_CACHE_BYTES)),
+            directory=Path(directory) if directory else None,
+        )
+
+    @staticmethod
+    def key(source: str, phases: Optional[tuple[str, ...]] = None, variant: str = "") -> str:
+        """Cache key of a response; ``variant`` names another response format."""
+        digest = hashlib.sha256(ANALYZER_VERSION.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source.encode("utf-8"))
+        if phases is not None:
+            digest.update(b"\0" + ",".join(phases).encode("utf-8"))
+        if variant:
+            digest.update(b"\1" + variant.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+        body = self._read_disk(key)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, body)
+        return body
+
+    def put(self, key: str, body: bytes) -> None:
+        with self._lock:
+            self._remember(key, body)
+        self._write_disk(key, body)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remember(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = body
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if self.directory is None:
+            return None
+        try:
+            return self._disk_path(key).read_bytes()
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, body: bytes) -> None:
+        if self.directory is None:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
 
 
 def format_diagnostics(diags) -> str:
@@ -55,7 +223,111 @@ def format_codegen(lines) -> str:
     return "\n".join(lines) if lines else "No target code generated."
 
 
-def build_guided_feedback(source: str, syntax_diags, semantic_diags) -> str:
+def token_columns(tokens) -> dict:
+    """Tokens as parallel arrays; ``kind`` holds indexes into ``kinds``."""
+    stream = TokenStream.coerce(tokens)
+    return {
+        "kinds": list(KIND_NAMES),
+        "columns": {
+            "kind": list(stream.kind_ids),
+            "value": stream.values(),
+            "line": list(stream.lines),
+            "column": list(stream.columns),
+        },
+    }
+
+
+def ir_columns(ir_lines) -> dict:
+    return {
+        "columns": {
+            "op": [ins.op for ins in ir_lines],
+            "arg1": [ins.arg1 for ins in ir_lines],
+            "arg2": [ins.arg2 for ins in ir_lines],
+            "result": [ins.result for ins in ir_lines],
+            "comment": [ins.comment for ins in ir_lines],
+        }
+    }
+
+
+def diagnostic_columns(diags) -> dict:
+    return {
+        "columns": {
+            "level": [d.level for d in diags],
+            "phase": [d.phase for d in diags],
+            "message": [d.message for d in diags],
+            "line": [d.line for d in diags],
+            "column": [d.column for d in diags],
+            "suggestion": [d.suggestion for d in diags],
+        }
+    }
+
+
+def format_timings(timings) -> list[dict]:
+    return [
+        {
+            "phase": t.phase,
+            "wall_ms": round(t.wall_time * 1000, 3),
+            "cpu_ms": round(t.cpu_time * 1000, 3),
+            "allocated_bytes": t.allocated_bytes,
+            "peak_bytes": t.peak_bytes,
+        }
+        for t in timings
+    ]
+
+
+class FixEngine:
+    """Source fixes for a set of diagnostics, shared by the guided feedback
+    and the suggested code.
+
+    ``fix`` returns the corrected source, or ``source`` unchanged when no
+    allowed fix applies. Results are memoized by a digest of the source and
+    the diagnostics that drive the fixes. Resubmitting the same broken code,
+    or asking for it with other phases or as a stream, reuses the result.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        # None stands for "no fix", so unfixable sources are not stored twice.
+        self._entries: OrderedDict[tuple, Optional[str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fix(self, source: str, syntax_diags, semantic_diags) -> str:
+        if not syntax_diags and not semantic_diags:
+            return source
+        key = (
+            hashlib.sha256(source.encode("utf-8")).digest(),
+            tuple((d.message, d.line) for d in syntax_diags),
+            tuple((d.message, d.line) for d in semantic_diags),
+        )
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                fixed = self._entries[key]
+                return source if fixed is None else fixed
+            self.misses += 1
+        fixed = _auto_fix_common_cases(source, syntax_diags, semantic_diags)
+        with self._lock:
+            self._entries[key] = None if fixed == source else fixed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fixed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+FIX_ENGINE = FixEngine()
+
+
+def build_guided_feedback(source: str, syntax_diags, semantic_diags, fixed: Optional[str] = None) -> str:
+    """The issue list, plus the corrected source when a fix applies.
+
+    ``fixed`` is the ``FixEngine`` result when the caller already has it.
+    """
     issues: list[str] = []
     for d in syntax_diags:
         issues.append(f"- Syntax: {d.message} (line {d.line})")
@@ -65,7 +337,8 @@ def build_guided_feedback(source: str, syntax_diags, semantic_diags) -> str:
     if not issues:
         return "No major issues detected."
 
-    fixed = _auto_fix_common_cases(source, syntax_diags, semantic_diags)
+    if fixed is None:
+        fixed = FIX_ENGINE.fix(source, syntax_diags, semantic_diags)
 
     out = ["Detected Issues:"]
     out.extend(issues)
@@ -76,8 +349,11 @@ def build_guided_feedback(source: str, syntax_diags, semantic_diags) -> str:
     return "\n".join(out)
 
 
-def build_code_suggestion(source: str, syntax_diags, semantic_diags, optimizations, optimized_code: str) -> tuple[str, str]:
-    fixed = _auto_fix_common_cases(source, syntax_diags, semantic_diags)
+def build_code_suggestion(
+    source: str, syntax_diags, semantic_diags, optimizations, optimized_code: str, fixed: Optional[str] = None
+) -> tuple[str, str]:
+    if fixed is None:
+        fixed = FIX_ENGINE.fix(source, syntax_diags, semantic_diags)
     has_issue = bool(syntax_diags or semantic_diags)
     has_optimization = any(item != "No optimization rule was applicable." for item in (optimizations or []))
 
@@ -97,6 +373,8 @@ def build_code_suggestion(source: str, syntax_diags, semantic_diags, optimizatio
 
 def _auto_fix_common_cases(source: str, syntax_diags, semantic_diags) -> str:
     lines = source.splitlines()
+    # Indexes of the lines edited below; only these need validating.
+    changed: set[int] = set()
 
     # Fix missing semicolon diagnostics (parser can report the error on the next line).
     for d in syntax_diags:
@@ -118,6 +396,7 @@ def _auto_fix_common_cases(source: str, syntax_diags, semantic_diags) -> str:
                 continue
 
             lines[line_idx] = raw.rstrip() + ";"
+            changed.add(line_idx)
             break
 
     # Fix missing ')' based on parser diagnostics.
@@ -131,6 +410,7 @@ def _auto_fix_common_cases(source: str, syntax_diags, semantic_diags) -> str:
             updated = _insert_missing_closer(lines[line_idx], "(", ")")
             if updated != lines[line_idx]:
                 lines[line_idx] = updated
+                changed.add(line_idx)
                 break
 
     # Fix missing ']' based on parser diagnostics.
@@ -144,6 +424,7 @@ def _auto_fix_common_cases(source: str, syntax_diags, semantic_diags) -> str:
             updated = _insert_missing_closer(lines[line_idx], "[", "]")
             if updated != lines[line_idx]:
                 lines[line_idx] = updated
+                changed.add(line_idx)
                 break
 
     # Fix missing closing braces for block/initializer diagnostics.
@@ -174,22 +455,28 @@ def _auto_fix_common_cases(source: str, syntax_diags, semantic_diags) -> str:
                     continue
                 if _looks_like_local_declaration(stripped):
                     lines[line_idx] = raw.rstrip() + ";"
+                    changed.add(line_idx)
                     break
 
     # Fix common type mismatch case: int var = "5"; -> int var = 5;
     for d in semantic_diags:
-        m = re.search(r"cannot assign 'char\*' to 'int' variable '([A-Za-z_][A-Za-z0-9_]*)'", d.message)
+        m = _STRING_TO_INT_DIAG.search(d.message)
         if not m:
             continue
         var = m.group(1)
         assign_re = re.compile(rf"(\bint\s+{re.escape(var)}\s*=\s*)\"([0-9]+)\"(\s*;)")
         for i, line in enumerate(lines):
-            lines[i] = assign_re.sub(r"\g<1>\2\3", line)
+            if var not in line:
+                continue
+            updated = assign_re.sub(r"\g<1>\2\3", line)
+            if updated != line:
+                lines[i] = updated
+                changed.add(i)
 
     # Semantic-guided undeclared variable fixes.
     undeclared_vars: set[str] = set()
     for d in semantic_diags:
-        m = re.search(r"Undeclared variable '([A-Za-z_][A-Za-z0-9_]*)'", d.message)
+        m = _UNDECLARED_DIAG.search(d.message)
         if m:
             undeclared_vars.add(m.group(1))
 
@@ -198,26 +485,38 @@ def _auto_fix_common_cases(source: str, syntax_diags, semantic_diags) -> str:
         for_idx = _find_for_initializer_line(lines, var)
         if for_idx is not None:
             lines[for_idx] = _insert_int_in_for_initializer(lines[for_idx], var)
+            changed.add(for_idx)
             continue
 
         # Fallback: plain assignment at start of statement -> declare variable in place.
         assign_idx = _find_plain_assignment_line(lines, var)
         if assign_idx is not None:
             lines[assign_idx] = _insert_int_in_assignment(lines[assign_idx], var)
+            changed.add(assign_idx)
 
-    fixed = "\n".join(lines)
     # Safety guard: never return suggestions that modify code beyond explicit allowed fixes.
-    if not _only_allowed_fixes_applied(source, fixed):
+    if not _only_allowed_fixes_applied(source.splitlines(), lines, changed):
         return source
-    return fixed
+    return "\n".join(lines)
+
+
+_STRING_TO_INT_DIAG = re.compile(r"cannot assign 'char\*' to 'int' variable '([A-Za-z_][A-Za-z0-9_]*)'")
+_UNDECLARED_DIAG = re.compile(r"Undeclared variable '([A-Za-z_][A-Za-z0-9_]*)'")
+_DECLARATION_PREFIX = re.compile(
+    r"^(?:const\s+|static\s+|unsigned\s+|signed\s+|long\s+|short\s+)*"
+    r"(?:int|float|double|char|bool|size_t|long|short)\b"
+)
+_FUNCTION_HEADER = re.compile(
+    r"^(?:const\s+|static\s+|inline\s+|unsigned\s+|signed\s+|long\s+|short\s+)*"
+    r"(?:void|int|float|double|char|bool|size_t|long|short)\s+[*&\sA-Za-z_][\w\s\*&]*\([^)]*\)$"
+)
+_INT_STRING_LITERAL = re.compile(r"(\bint\s+[A-Za-z_][A-Za-z0-9_]*\s*=\s*)\"([0-9]+)\"(\s*;)")
+_FOR_INITIALIZER = re.compile(r"(\bfor\s*\(\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*=)")
+_PLAIN_ASSIGNMENT = re.compile(r"^(\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*=)")
 
 
 def _looks_like_local_declaration(stripped_line: str) -> bool:
-    decl_prefix = re.compile(
-        r"^(?:const\s+|static\s+|unsigned\s+|signed\s+|long\s+|short\s+)*"
-        r"(?:int|float|double|char|bool|size_t|long|short)\b"
-    )
-    if not decl_prefix.search(stripped_line):
+    if not _DECLARATION_PREFIX.search(stripped_line):
         return False
     # Common declaration patterns that should end with semicolon.
     return "=" in stripped_line or "[" in stripped_line or "," in stripped_line
@@ -234,11 +533,7 @@ def _looks_like_statement_needing_semicolon(stripped_line: str) -> bool:
         return False
 
     # Avoid adding semicolons to likely function headers/signatures.
-    function_header = re.compile(
-        r"^(?:const\s+|static\s+|inline\s+|unsigned\s+|signed\s+|long\s+|short\s+)*"
-        r"(?:void|int|float|double|char|bool|size_t|long|short)\s+[*&\sA-Za-z_][\w\s\*&]*\([^)]*\)$"
-    )
-    if function_header.search(stripped_line):
+    if _FUNCTION_HEADER.search(stripped_line):
         return False
 
     # Typical fixable statement forms.
@@ -250,20 +545,21 @@ def _looks_like_statement_needing_semicolon(stripped_line: str) -> bool:
     )
 
 
-def _only_allowed_fixes_applied(original_source: str, fixed_source: str) -> bool:
-    original_lines = original_source.splitlines()
-    fixed_lines = fixed_source.splitlines()
+def _only_allowed_fixes_applied(original_lines: list[str], fixed_lines: list[str], changed: set[int]) -> bool:
+    """Whether every edit is one of the allowed single-line fixes.
+
+    ``changed`` holds the indexes of the edited lines; the rest are known to
+    be identical and are not compared.
+    """
     if len(fixed_lines) < len(original_lines):
         return False
 
     # Allow only trailing synthetic '}' lines when source has unclosed blocks.
-    if len(fixed_lines) > len(original_lines):
-        extra = fixed_lines[len(original_lines) :]
-        if any(item.strip() != "}" for item in extra):
-            return False
-        fixed_lines = fixed_lines[: len(original_lines)]
+    if any(item.strip() != "}" for item in fixed_lines[len(original_lines) :]):
+        return False
 
-    for before, after in zip(original_lines, fixed_lines):
+    for idx in sorted(changed):
+        before, after = original_lines[idx], fixed_lines[idx]
         if before == after:
             continue
         if _is_semicolon_append_change(before, after):
@@ -285,20 +581,17 @@ def _is_semicolon_append_change(before: str, after: str) -> bool:
 
 
 def _is_int_string_literal_unquote_change(before: str, after: str) -> bool:
-    pattern = re.compile(r"(\bint\s+[A-Za-z_][A-Za-z0-9_]*\s*=\s*)\"([0-9]+)\"(\s*;)")
-    expected = pattern.sub(r"\g<1>\2\3", before)
+    expected = _INT_STRING_LITERAL.sub(r"\g<1>\2\3", before)
     return expected == after and expected != before
 
 
 def _is_for_initializer_declaration_fix(before: str, after: str) -> bool:
-    pattern = re.compile(r"(\bfor\s*\(\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*=)")
-    expected = pattern.sub(r"\g<1>int \g<2>\g<3>", before, count=1)
+    expected = _FOR_INITIALIZER.sub(r"\g<1>int \g<2>\g<3>", before, count=1)
     return expected == after and expected != before
 
 
 def _is_assignment_declaration_fix(before: str, after: str) -> bool:
-    pattern = re.compile(r"^(\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*=)")
-    expected = pattern.sub(r"\g<1>int \g<2>\g<3>", before, count=1)
+    expected = _PLAIN_ASSIGNMENT.sub(r"\g<1>int \g<2>\g<3>", before, count=1)
     return expected == after and expected != before
 
 
@@ -371,115 +664,1533 @@ def _is_single_closer_insertion_change(before: str, after: str) -> bool:
     return i == len(before) and j == len(after) and inserted in allowed
 
 
-class AnalyzerHandler(BaseHTTPRequestHandler):
-    analyzer = CompilerAnalyzer()
+# Events of /api/analyze/stream, in the order they are sent: the analyzer's
+# phases followed by the server-side fix suggestions.
+STREAM_PHASES = PHASES + ("guided_feedback",)
+
+
+PHASE_FIELDS = {
+    "lexical": ("tokens_count", "lexical"),
+    "syntax": ("syntax_error_count", "syntax"),
+    "parse_tree": ("parse_tree",),
+    "semantic": ("semantic_error_count", "semantic_warning_count", "semantic"),
+    "ir": ("ir",),
+    "optimization": ("optimization",),
+    "codegen": ("codegen",),
+    "complexity": ("complexity", "complexity_detail"),
+    "guided_feedback": ("guided_feedback", "suggested_code", "suggested_code_kind"),
+}
+
+
+def phase_payload(phase: str, report: AnalysisReport, source: str, structured: bool = False) -> dict:
+    """The /api/analyze response fields produced by one phase.
+
+    ``structured`` gives tokens, IR and diagnostics as column arrays (see
+    ``token_columns``) instead of formatted text, with every token kept.
+    """
+    if phase == "lexical":
+        lexical = token_columns(report.tokens) if structured else format_tokens(report.tokens)
+        return {"tokens_count": len(report.tokens), "lexical": lexical}
+    if phase == "syntax":
+        syntax = diagnostic_columns(report.syntax_errors) if structured else format_diagnostics(report.syntax_errors)
+        return {"syntax_error_count": len(report.syntax_errors), "syntax": syntax}
+    if phase == "parse_tree":
+        return {"parse_tree": report.parse_tree or "No parse tree available."}
+    if phase == "semantic" and structured:
+        return {
+            "semantic_error_count": len(report.semantic_errors),
+            "semantic_warning_count": len(report.semantic_warnings),
+            "semantic": diagnostic_columns(report.semantic_errors + report.semantic_warnings),
+        }
+    if phase == "semantic":
+        return {
+            "semantic_error_count": len(report.semantic_errors),
+            "semantic_warning_count": len(report.semantic_warnings),
+            "semantic": "\n".join([
+                format_diagnostics(report.semantic_errors),
+                format_diagnostics(report.semantic_warnings),
+            ]).strip(),
+        }
+    if phase == "ir":
+        return {"ir": ir_columns(report.ir) if structured else format_ir(report.ir)}
+    if phase == "optimization":
+        return {"optimization": "\n".join(report.optimizations_applied) if report.optimizations_applied else "No optimizations."}
+    if phase == "codegen":
+        return {"codegen": format_codegen(report.target_code)}
+    if phase == "complexity":
+        return {"complexity": report.complexity, "complexity_detail": "\n".join(report.complexity_steps)}
+    if phase == "guided_feedback":
+        # One fix computation feeds both the feedback text and the suggestion.
+        fixed = FIX_ENGINE.fix(source, report.syntax_errors, report.semantic_errors)
+        suggested_code, suggested_kind = build_code_suggestion(
+            source,
+            report.syntax_errors,
+            report.semantic_errors,
+            report.optimizations_applied,
+            format_codegen(report.target_code),
+            fixed,
+        )
+        return {
+            "guided_feedback": build_guided_feedback(source, report.syntax_errors, report.semantic_errors, fixed),
+            "suggested_code": suggested_code,
+            "suggested_code_kind": suggested_kind,
+        }
+    raise ValueError(f"unknown phase {phase!r}")
+
+
+# Analyzer phases whose results the fix suggestions read.
+GUIDED_FEEDBACK_REQUIRES = ("syntax", "semantic", "codegen")
+
+
+def parse_phases(value) -> Optional[tuple[str, ...]]:
+    """Read a request's ``phases`` field: a list or comma-separated names.
+
+    Returns the selected ``STREAM_PHASES`` in their usual order, or None when
+    the field is absent or empty (everything). Unknown names raise ValueError.
+    """
+    if value is None or value == "" or value == []:
+        return None
+    names = value.split(",") if isinstance(value, str) else value
+    if not isinstance(names, list):
+        raise ValueError("phases must be a list of phase names")
+    wanted = {str(name).strip() for name in names} - {""}
+    unknown = wanted.difference(STREAM_PHASES)
+    if unknown:
+        raise ValueError(f"unknown phases: {', '.join(sorted(unknown))}; expected {', '.join(STREAM_PHASES)}")
+    return tuple(phase for phase in STREAM_PHASES if phase in wanted) or None
+
+
+def analyzer_phases(phases: Optional[tuple[str, ...]]) -> Optional[tuple[str, ...]]:
+    """The analyzer phases to run for the response phases ``phases``."""
+    if phases is None:
+        return None
+    needed = [phase for phase in phases if phase in PHASES]
+    if "guided_feedback" in phases:
+        needed.extend(GUIDED_FEEDBACK_REQUIRES)
+    return resolve_phases(needed)
+
+
+def request_deadline(value, limit: float) -> Optional[float]:
+    """Seconds an analysis may run: a request's ``timeout`` field, capped at
+    the server's ``limit`` (0 for none). Invalid values raise ValueError."""
+    if value is None:
+        return limit or None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError("timeout must be a positive number of seconds")
+    return min(float(value), limit) if limit else float(value)
+
+
+def is_truncated(body: bytes) -> bool:
+    """Whether an encoded response is a partial one, which is never cached.
+
+    ``analyze_source`` puts the flag first so this needs no decoding.
+    """
+    return body.startswith(b'{"truncated": true')
+
+
+_COMPLEXITY_KEY = b'"complexity": '
+_JSON_DECODER = json.JSONDecoder()
+
+
+def response_complexity(body: bytes) -> Optional[str]:
+    """The ``complexity`` field of an encoded response, found without decoding all of it.
+
+    Only the top level of a response has that key; inside strings its
+    quotes would be escaped.
+    """
+    at = body.find(_COMPLEXITY_KEY)
+    if at < 0:
+        return None
+    start = at + len(_COMPLEXITY_KEY)
+    try:
+        value, _ = _JSON_DECODER.raw_decode(body[start : start + 1024].decode("utf-8", "ignore"))
+    except ValueError:
+        return None
+    return value if isinstance(value, str) else None
+
+
+def analyze_source(
+    analyzer: CompilerAnalyzer,
+    source: str,
+    phases: Optional[tuple[str, ...]] = None,
+    timings: bool = False,
+    deadline: Optional[float] = None,
+    structured: bool = False,
+) -> dict:
+    """Run the pipeline on ``source`` and build the /api/analyze response.
+
+    With ``phases`` (see ``parse_phases``) only those phases' fields are
+    built, and only the analyzer phases they need are run. ``timings`` adds
+    the per-phase timings, including building the guided feedback.
+    ``structured`` builds column arrays for the tabular fields (see
+    ``phase_payload``); ``paginate`` then cuts them into pages.
+
+    An analysis still running after ``deadline`` seconds is cut short: the
+    response then starts with ``"truncated": true`` and ``phases_completed``
+    and holds only those phases' fields, without guided feedback.
+    """
+    report = analyzer.analyze(source, analyzer_phases(phases), Deadline(deadline) if deadline else None)
+    data: dict = {}
+    wanted = phases or STREAM_PHASES
+    if report.truncated:
+        completed = set(report.phases_completed)
+        wanted = tuple(phase for phase in wanted if phase in completed)
+        data["truncated"] = True
+        data["phases_completed"] = list(wanted)
+    for phase in wanted:
+        if phase == "guided_feedback" and timings:
+            timer = PhaseTimer(phase, analyzer.trace_memory)
+            timer.start()
+            data.update(phase_payload(phase, report, source, structured))
+            report.timings.append(timer.stop())
+        else:
+            data.update(phase_payload(phase, report, source, structured))
+    if timings:
+        data["timings"] = format_timings(report.timings)
+    return data
+
+
+# Structured fields whose rows come in pages.
+PAGED_FIELDS = ("lexical", "ir")
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 10000
+
+
+def page_size(value) -> int:
+    """Read a request's ``page_size`` field; invalid values raise ValueError."""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be an integer from 1 to {MAX_PAGE_SIZE}")
+    return value
+
+
+def encode_cursor(field: str, offset: int, key: str) -> str:
+    return base64.urlsafe_b64encode(f"{field}:{offset}:{key}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, key: str) -> tuple[str, int]:
+    """The field and row offset of a cursor issued for the response cached at ``key``."""
+    try:
+        text = base64.urlsafe_b64decode(str(cursor) + "=" * (-len(str(cursor)) % 4)).decode("ascii")
+        field, offset, cursor_key = text.split(":")
+        offset = int(offset)
+    except ValueError:
+        raise ValueError("invalid cursor") from None
+    if field not in PAGED_FIELDS or offset < 0:
+        raise ValueError("invalid cursor")
+    if cursor_key != key:
+        raise ValueError("cursor belongs to a different source or phase selection")
+    return field, offset
+
+
+def paginate(data: dict, key: str, size: int, cursor: Optional[str] = None) -> dict:
+    """Cut a structured response's token and IR columns into pages.
+
+    Without ``cursor`` this is the whole response with the first page of
+    each paged field. With one it is just the requested page, under its
+    field name. Each page carries ``offset``, the ``total`` row count and a
+    ``next`` cursor (null on the last page). A cursor request sends the
+    same source, phases and ``structured`` flag again. It is then answered
+    from the result cache, and re-analyzed only if the entry was evicted.
+    """
+    if cursor is None:
+        fields, offset = PAGED_FIELDS, 0
+        page = dict(data)
+    else:
+        field, offset = decode_cursor(cursor, key)
+        fields = (field,)
+        page = {name: data[name] for name in ("truncated", "phases_completed") if name in data}
+    for field in fields:
+        if field not in data:
+            continue
+        table = data[field]
+        columns = table["columns"]
+        total = len(next(iter(columns.values())))
+        end = offset + size
+        page[field] = {
+            **table,
+            "columns": {name: values[offset:end] for name, values in columns.items()},
+            "offset": offset,
+            "total": total,
+            "next": encode_cursor(field, end, key) if end < total else None,
+        }
+    return page
+
+
+# API responses smaller than this are sent uncompressed.
+GZIP_MIN_BYTES = 1024
+
+
+def gzip_body(body: bytes, headers: dict, accept_encoding: Optional[str]) -> bytes:
+    """Compress a JSON API response for a client that accepts gzip.
+
+    Adds the ``Content-Encoding`` and ``Vary`` headers to ``headers`` and
+    returns the body to send.
+    """
+    if len(body) < GZIP_MIN_BYTES or "Content-Encoding" in headers or not _accepts_gzip(accept_encoding):
+        return body
+    headers["Content-Encoding"] = "gzip"
+    headers["Vary"] = "Accept-Encoding"
+    # Level 5 gets most of level 9's ratio on JSON text at several times the speed.
+    return gzip.compress(body, 5, mtime=0)
+
+
+class BatchError(ValueError):
+    """A batch request body that cannot be turned into a list of sources."""
+
+
+class BatchTooLarge(BatchError):
+    """An archive whose sources expand past the allowed size."""
+
+
+def read_batch_sources(
+    raw: bytes, content_type: str = "", max_archive_bytes: Optional[int] = None
+) -> list[tuple[str, str]]:
+    """Extract ``(name, source)`` pairs from a batch request body.
+
+    The body is either JSON, ``{"sources": [...]}`` with each item a source
+    string or a ``{"name", "source"}`` object, or a zip or tar archive (plain
+    or compressed) whose C/C++ files are taken in archive order. Archives
+    whose sources add up to more than ``max_archive_bytes`` uncompressed are
+    rejected before anything is extracted.
+    """
+    if "json" in content_type or raw[:1] in (b"{", b"["):
+        try:
+            payload = json.loads(raw.decode("utf-8")) if raw else {}
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise BatchError(f"invalid JSON body: {exc}") from exc
+        items = payload.get("sources") if isinstance(payload, dict) else payload
+        if not isinstance(items, list):
+            raise BatchError("sources must be an array")
+        sources = []
+        for idx, item in enumerate(items):
+            if isinstance(item, dict):
+                sources.append((str(item.get("name") or f"source_{idx}"), str(item.get("source", "")).strip()))
+            else:
+                sources.append((f"source_{idx}", str(item).strip()))
+    else:
+        sources = _read_archive_sources(raw, max_archive_bytes)
+    if len(sources) > BATCH_MAX_ITEMS:
+        raise BatchError(f"batch has {len(sources)} sources; the limit is {BATCH_MAX_ITEMS}")
+    return sources
+
+
+def _read_archive_sources(raw: bytes, max_bytes: Optional[int] = None) -> list[tuple[str, str]]:
+    def decode(data: bytes) -> str:
+        return data.decode("utf-8", errors="replace").strip()
+
+    def check_size(total: int) -> None:
+        if max_bytes is not None and total > max_bytes:
+            raise BatchTooLarge(f"archive sources expand to {total} bytes; the limit is {max_bytes}")
+
+    buffer = io.BytesIO(raw)
+    if zipfile.is_zipfile(buffer):
+        with zipfile.ZipFile(buffer) as archive:
+            infos = [
+                info
+                for info in archive.infolist()
+                if not info.is_dir() and info.filename.endswith(BATCH_SOURCE_SUFFIXES)
+            ]
+            check_size(sum(info.file_size for info in infos))
+            return [(info.filename, decode(archive.read(info))) for info in infos]
+    buffer.seek(0)
+    try:
+        with tarfile.open(fileobj=buffer, mode="r:*") as archive:
+            members = [
+                member
+                for member in archive.getmembers()
+                if member.isfile() and member.name.endswith(BATCH_SOURCE_SUFFIXES)
+            ]
+            check_size(sum(member.size for member in members))
+            return [(member.name, decode(archive.extractfile(member).read())) for member in members]
+    except tarfile.TarError as exc:
+        raise BatchError("body is neither JSON nor a zip/tar archive") from exc
+
+
+DEFAULT_ANALYSIS_TIMEOUT = 10.0
+# Cooperative limit checked inside the phases; kept below the pool's hard
+# timeout so a slow analysis normally answers with what it finished.
+DEFAULT_ANALYSIS_DEADLINE = 5.0
+# Analyzed once by each new worker so imports and regex caches are warm
+# before it takes its first request.
+WARMUP_SOURCE = """#include <stdio.h>
+int main() {
+    int s = 0;
+    for (int i = 0; i < 10; i++) { s = s + i; }
+    return s;
+}
+"""
+
+
+class AnalysisTimeout(Exception):
+    """An analysis ran past its deadline; its worker has been replaced."""
+
+
+class WorkerCrashed(Exception):
+    """A worker process died during an analysis; it has been replaced."""
+
+
+_worker_analyzer: Optional[CompilerAnalyzer] = None
+
+
+def _analyze_in_worker(
+    source: str,
+    phases: Optional[tuple[str, ...]] = None,
+    timings: bool = False,
+    deadline: Optional[float] = None,
+    structured: bool = False,
+) -> tuple[bool, bytes]:
+    """Run one analysis: the encoded response, or the error message on failure."""
+    try:
+        data = analyze_source(_worker_analyzer, source, phases, timings, deadline, structured)
+        return True, json.dumps(data).encode("utf-8")
+    except Exception as exc:
+        return False, f"analysis failed: {exc}".encode("utf-8")
+
+
+def _worker_main(conn) -> None:
+    global _worker_analyzer
+    _worker_analyzer = CompilerAnalyzer(trace_memory=TRACE_MEMORY)
+    _analyze_in_worker(WARMUP_SOURCE)
+    conn.send(True)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        conn.send(_analyze_in_worker(*request))
+
+
+class _Worker:
+    def __init__(self, process, conn) -> None:
+        self.process = process
+        self.conn = conn
+
+
+class WorkerPool:
+    """Fixed set of analysis processes, each with a warm ``CompilerAnalyzer``.
+
+    ``run`` hands a source to an idle worker and waits at most ``timeout``
+    seconds for the encoded response; it waits at most as long for a worker
+    to free up, and raises ``Overloaded`` when none does. A worker that
+    overruns is killed and a fresh one is started in the background, so one
+    pathological input costs a single worker for a single request. A
+    ``deadline`` shorter than ``timeout`` lets the worker stop by itself and
+    answer with a truncated response instead. Workers are spawned rather
+    than forked because replacements start while the server is already
+    multi-threaded.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: float = DEFAULT_ANALYSIS_TIMEOUT) -> None:
+        self.size = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.timeouts = 0
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._closed = False
+        starting = [self._start_worker() for _ in range(self.size)]
+        for worker in starting:
+            self._wait_ready(worker)
+
+    @classmethod
+    def from_env(cls) -> "WorkerPool":
+        """Configure from ``ANALYSIS_WORKERS`` and ``ANALYSIS_TIMEOUT`` (seconds)."""
+        return cls(
+            workers=int(os.environ.get("ANALYSIS_WORKERS", 0)) or None,
+            timeout=float(os.environ.get("ANALYSIS_TIMEOUT", DEFAULT_ANALYSIS_TIMEOUT)),
+        )
+
+    def run(
+        self,
+        source: str,
+        timeout: Optional[float] = None,
+        phases: Optional[tuple[str, ...]] = None,
+        timings: bool = False,
+        deadline: Optional[float] = None,
+        structured: bool = False,
+    ) -> tuple[bool, bytes]:
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            # Busy workers answer or are replaced within their own timeout;
+            # waiting longer than that means replacements are not starting.
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise Overloaded(f"no analysis worker became free within {timeout:g}s") from None
+        try:
+            worker.conn.send((source, phases, timings, deadline, structured))
+            if not worker.conn.poll(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                self._replace(worker)
+                worker = None
+                raise AnalysisTimeout(f"analysis timed out after {timeout:g}s")
+            return worker.conn.recv()
+        except (EOFError, OSError) as exc:
+            self._replace(worker)
+            worker = None
+            raise WorkerCrashed(f"analysis worker exited: {exc}") from exc
+        finally:
+            if worker is not None:
+                self._idle.put(worker)
+
+    def map(self, sources: list[str]) -> list[tuple[bool, bytes]]:
+        """``run`` every source, using all workers at once; results keep their order."""
+
+        def run_one(source: str) -> tuple[bool, bytes]:
+            try:
+                return self.run(source)
+            except (AnalysisTimeout, WorkerCrashed, Overloaded) as exc:
+                return False, str(exc).encode("utf-8")
+
+        with ThreadPoolExecutor(max_workers=self.size) as dispatch:
+            return list(dispatch.map(run_one, sources))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.size,
+                "idle": self._idle.qsize(),
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+            }
 
-    def do_OPTIONS(self) -> None:
-        self.send_response(HTTPStatus.NO_CONTENT)
-        self._send_cors_headers()
-        self.end_headers()
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=1)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.conn.close()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _start_worker(self) -> _Worker:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        return _Worker(process, parent)
+
+    def _wait_ready(self, worker: _Worker) -> None:
+        try:
+            worker.conn.recv()
+        except (EOFError, OSError):
+            worker.process.join()
+            raise WorkerCrashed("analysis worker failed to start") from None
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        if self._closed:
+            return
+        with self._lock:
+            self.restarts += 1
+        # Start-up takes a while; let the current request answer right away.
+        threading.Thread(target=lambda: self._wait_ready(self._start_worker()), daemon=True).start()
+
+
+def analyze_batch(sources: list[tuple[str, str]], cache: ResultCache, pool: WorkerPool) -> bytes:
+    """Analyze ``sources`` on ``pool`` and encode the batch response.
+
+    Results keep the request order. Cached sources are not re-analyzed, and
+    identical sources within the batch are analyzed once.
+    """
+    keys = [cache.key(source) if source else None for _, source in sources]
+    outcomes: dict[str, tuple[bool, bytes]] = {}
+    pending: dict[str, str] = {}
+    for key, (_, source) in zip(keys, sources):
+        if key is None or key in outcomes or key in pending:
+            continue
+        body = cache.get(key)
+        if body is not None:
+            outcomes[key] = (True, body)
+        else:
+            pending[key] = source
+
+    for key, outcome in zip(pending, pool.map(list(pending.values()))):
+        outcomes[key] = outcome
+        if outcome[0]:
+            cache.put(key, outcome[1])
+
+    parts = []
+    for idx, (key, (name, _)) in enumerate(zip(keys, sources)):
+        head = json.dumps({"index": idx, "name": name})[:-1].encode("utf-8")
+        if key is None:
+            parts.append(head + b', "status": "error", "error": "source is required"}')
+            continue
+        ok, body = outcomes[key]
+        if ok:
+            parts.append(head + b', "status": "ok", "result": ' + body + b"}")
+        else:
+            parts.append(head + b', "status": "error", "error": ' + json.dumps(body.decode("utf-8")).encode("utf-8") + b"}")
+    ok_count = sum(1 for key in keys if key is not None and outcomes[key][0])
+    summary = json.dumps({"count": len(sources), "ok": ok_count, "failed": len(sources) - ok_count})[:-1]
+    return summary.encode("utf-8") + b', "results": [' + b", ".join(parts) + b"]}"
+
+
+class Overloaded(Exception):
+    """No analysis slot or worker is free, and the wait queue is full or took too long."""
+
+
+class AdmissionControl:
+    """Limits on what the server accepts and how much it runs at once.
+
+    At most ``concurrency`` analyses run at a time; up to ``queue_size`` more
+    wait, each for at most ``queue_timeout`` seconds, and anything beyond that
+    is turned away with ``Overloaded`` (a 503 with ``Retry-After``). Sources
+    are checked against byte, line and token limits before they are queued,
+    and ``AnalyzerHTTPServer`` refuses connections past ``max_connections`` so
+    the number of handler threads stays bounded too.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_timeout: float = 5.0,
+        max_body_bytes: int = 1024 * 1024,
+        max_batch_bytes: int = 32 * 1024 * 1024,
+        max_lines: int = 50_000,
+        max_tokens: int = 500_000,
+        max_connections: Optional[int] = None,
+        retry_after: int = 1,
+    ) -> None:
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.queue_size = 4 * self.concurrency if queue_size is None else queue_size
+        self.queue_timeout = queue_timeout
+        self.max_body_bytes = max_body_bytes
+        self.max_batch_bytes = max_batch_bytes
+        self.max_lines = max_lines
+        self.max_tokens = max_tokens
+        # Room for cache hits, static files and /metrics next to the analyses.
+        self.max_connections = max_connections or self.concurrency + self.queue_size + 16
+        self.retry_after = retry_after
+        self._slots = threading.Semaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._lexer = Lexer("regex")
+        self.waiting = 0
+        self.running = 0
+        self.rejected: dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionControl":
+        """Configure from the ``ANALYSIS_*`` limit variables (see frontend/README.md)."""
+        env = os.environ.get
+        return cls(
+            concurrency=int(env("ANALYSIS_CONCURRENCY", 0)) or None,
+            queue_size=int(env("ANALYSIS_QUEUE_SIZE")) if env("ANALYSIS_QUEUE_SIZE") else None,
+            queue_timeout=float(env("ANALYSIS_QUEUE_TIMEOUT", 5.0)),
+            max_body_bytes=int(env("ANALYSIS_MAX_BODY_BYTES", 1024 * 1024)),
+            max_batch_bytes=int(env("ANALYSIS_MAX_BATCH_BYTES", 32 * 1024 * 1024)),
+            max_lines=int(env("ANALYSIS_MAX_LINES", 50_000)),
+            max_tokens=int(env("ANALYSIS_MAX_TOKENS", 500_000)),
+            max_connections=int(env("ANALYSIS_MAX_CONNECTIONS", 0)) or None,
+            retry_after=int(env("ANALYSIS_RETRY_AFTER", 1)),
+        )
+
+    def reject(self, reason: str) -> None:
+        with self._lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def check_source(self, source: str) -> Optional[str]:
+        """Why ``source`` is over the line or token limit, or None if it is not."""
+        lines = source.count("\n") + 1
+        if lines > self.max_lines:
+            return f"source has {lines} lines; the limit is {self.max_lines}"
+        # Every token holds at least one word run or one character the lexer
+        # does not skip, so in practice this count is an upper bound on the
+        # lexer's tokens (literals, comments and multi-character operators
+        # count extra). Only sources over it are lexed for the exact count.
+        if len(_TOKEN_ESTIMATE.findall(source)) > self.max_tokens:
+            tokens = len(self._lexer.tokenize_stream(source)[0])
+            if tokens > self.max_tokens:
+                return f"source has {tokens} tokens; the limit is {self.max_tokens}"
+        return None
+
+    def acquire(self) -> None:
+        """Wait for an analysis slot; raises ``Overloaded`` instead of queueing too long."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.queue_size:
+                    self.rejected["queue_full"] = self.rejected.get("queue_full", 0) + 1
+                    raise Overloaded("analysis queue is full")
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                self.reject("queue_timeout")
+                raise Overloaded(f"no analysis slot freed up within {self.queue_timeout:g}s")
+        with self._lock:
+            self.running += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.running -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "running": self.running,
+                "waiting": self.waiting,
+                "rejected": dict(self.rejected),
+            }
 
-    def do_GET(self) -> None:
-        parsed = urlparse(self.path)
-        path = parsed.path
-        if path == "/":
-            path = "/index.html"
 
-        file_path = (FRONTEND_DIR / path.lstrip("/")).resolve()
-        if not str(file_path).startswith(str(FRONTEND_DIR)):
-            self._send_json({"error": "Forbidden"}, HTTPStatus.FORBIDDEN)
-            return
+# Only space, tab, CR and newline are skipped by the lexer; other whitespace
+# (form feeds, NBSP, ...) comes out as one INVALID token per character.
+_TOKEN_ESTIMATE = re.compile(r"\w+|[^\w \t\r\n]")
 
-        if not file_path.exists() or not file_path.is_file():
-            self._send_json({"error": "Not found"}, HTTPStatus.NOT_FOUND)
+
+class AnalyzerHTTPServer(ThreadingHTTPServer):
+    """``ThreadingHTTPServer`` with at most ``admission.max_connections`` handler threads.
+
+    Connections past the limit are handed to a single refusal thread, which
+    answers 503 with ``Retry-After`` and closes them; when even that thread
+    falls behind they are closed straight away.
+    """
+
+    REFUSAL_BACKLOG = 64
+    # socketserver's default listen backlog of 5 drops connections in any
+    # burst before they can be counted, let alone refused.
+    request_queue_size = 128
+
+    def __init__(self, address, handler, admission: AdmissionControl) -> None:
+        self.admission = admission
+        self._connections = threading.BoundedSemaphore(admission.max_connections)
+        self._refusals: queue.Queue = queue.Queue(self.REFUSAL_BACKLOG)
+        super().__init__(address, handler)
+        threading.Thread(target=self._refuse_loop, daemon=True).start()
+
+    def process_request(self, request, client_address) -> None:
+        if not self._connections.acquire(blocking=False):
+            self.admission.reject("connections")
+            try:
+                self._refusals.put_nowait(request)
+            except queue.Full:
+                self.shutdown_request(request)
             return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._connections.release()
+            raise
+
+    def process_request_thread(self, request, client_address) -> None:
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._connections.release()
+
+    def _refuse_loop(self) -> None:
+        body = b'{"error": "server is at its connection limit"}'
+        response = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            f"Retry-After: {self.admission.retry_after}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii") + body
+        while True:
+            request = self._refusals.get()
+            try:
+                request.settimeout(0.5)
+                request.sendall(response)
+                request.shutdown(socket.SHUT_WR)
+                # Take in what the client is still sending so closing does not
+                # reset the connection before it reads the response; give up
+                # after a second so a trickling client cannot stall the loop.
+                deadline = time.monotonic() + 1.0
+                while request.recv(65536) and time.monotonic() < deadline:
+                    pass
+            except OSError:
+                pass
+            finally:
+                request.close()
+
+
+METRICS = MetricsRegistry()
+METRICS.counter("analyzer_http_requests_total", "HTTP requests by endpoint, method and status code.")
+METRICS.histogram("analyzer_http_request_duration_seconds", "Time to handle a request, by endpoint.", LATENCY_BUCKETS)
+METRICS.gauge("analyzer_http_requests_in_flight", "Requests being handled.")
+METRICS.histogram("analyzer_input_bytes", "Size of each analyzed source, by endpoint.", SIZE_BUCKETS)
+METRICS.counter("analyzer_analyses_truncated_total", "Analyses cut short by their deadline, by endpoint.")
+METRICS.histogram(
+    "analyzer_phase_duration_seconds",
+    "Wall time of each analysis phase run in the server process.",
+    PHASE_BUCKETS,
+)
+# Paths reported as themselves; anything else is "static" (GET) or "other".
+METRIC_ENDPOINTS = {"/api/analyze", "/api/analyze/stream", "/api/analyze/batch", "/api/cache", "/metrics"}
+
+
+def metric_endpoint(method: str, path: str) -> str:
+    """The ``endpoint`` label for a request: API paths as is, else static or other."""
+    if path in METRIC_ENDPOINTS:
+        return path
+    return "static" if method == "GET" else "other"
+
+
+@dataclass(frozen=True)
+class StaticAsset:
+    body: bytes
+    gzip_body: Optional[bytes]
+    content_type: str
+    etag: str
+    last_modified: str
+    mtime_ns: int
+    size: int
+
+
+class StaticAssets:
+    """In-memory copy of the frontend directory, served with validators.
+
+    Every file is read, hashed for its ``ETag`` and gzip-compressed (when
+    that saves space) once, at startup. A request then only costs a
+    ``stat`` to notice edits: a file whose mtime or size changed is read
+    again, a new one is picked up, and a removed one is dropped.
+    Conditional requests with a matching ``If-None-Match`` (or, without
+    one, an ``If-Modified-Since`` not older than the file) get
+    ``304 Not Modified``.
+    """
+
+    def __init__(self, root: Path, cache_control: str = "no-cache") -> None:
+        self.root = root
+        self.cache_control = cache_control
+        self._assets: Dict[Path, StaticAsset] = {}
+        if root.is_dir():
+            for file_path in root.rglob("*"):
+                if file_path.is_file():
+                    self._load(file_path.resolve())
+
+    def response(
+        self,
+        path: str,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
+    ) -> tuple[HTTPStatus, bytes, dict]:
+        """Status, body and headers (including ``Content-Type``) for ``GET path``."""
+        if path == "/":
+            path = "/index.html"
 
+        file_path = (self.root / path.lstrip("/")).resolve()
+        if not str(file_path).startswith(str(self.root)):
+            return _static_error(HTTPStatus.FORBIDDEN, "Forbidden")
+
+        asset = self._current(file_path)
+        if asset is None:
+            return _static_error(HTTPStatus.NOT_FOUND, "Not found")
+
+        gzipped = asset.gzip_body is not None and _accepts_gzip(accept_encoding)
+        etag = f'"{asset.etag}-gz"' if gzipped else f'"{asset.etag}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": asset.last_modified,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if _not_modified(asset, etag, if_none_match, if_modified_since):
+            return HTTPStatus.NOT_MODIFIED, b"", headers
+        headers["Content-Type"] = asset.content_type
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return HTTPStatus.OK, asset.gzip_body, headers
+        return HTTPStatus.OK, asset.body, headers
+
+    def _current(self, file_path: Path) -> Optional[StaticAsset]:
+        try:
+            stat = file_path.stat()
+        except OSError:
+            self._assets.pop(file_path, None)
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+        asset = self._assets.get(file_path)
+        if asset is not None and asset.mtime_ns == stat.st_mtime_ns and asset.size == stat.st_size:
+            return asset
+        return self._load(file_path)
+
+    def _load(self, file_path: Path) -> Optional[StaticAsset]:
+        # Handler threads may load the same file at once; either copy will do.
+        try:
+            stat = file_path.stat()
+            body = file_path.read_bytes()
+        except OSError:
+            self._assets.pop(file_path, None)
+            return None
+        compressed = gzip.compress(body, 9, mtime=0)
         mime, _ = mimetypes.guess_type(file_path.name)
-        mime = mime or "application/octet-stream"
-        content = file_path.read_bytes()
+        asset = StaticAsset(
+            body=body,
+            gzip_body=compressed if len(compressed) < len(body) * 0.9 else None,
+            content_type=mime or "application/octet-stream",
+            etag=hashlib.sha256(body).hexdigest()[:20],
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+        )
+        self._assets[file_path] = asset
+        return asset
+
+
+def _static_error(status: HTTPStatus, message: str) -> tuple[HTTPStatus, bytes, dict]:
+    return status, json.dumps({"error": message}).encode("utf-8"), {"Content-Type": JSON_CONTENT_TYPE}
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            q = params.strip().lower()
+            return not (q.startswith("q=") and _quality(q[2:]) == 0)
+    return False
+
+
+def _quality(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 1.0
+
+
+def _not_modified(
+    asset: StaticAsset, etag: str, if_none_match: Optional[str], if_modified_since: Optional[str]
+) -> bool:
+    if if_none_match is not None:
+        # Weak comparison, as for GET; If-Modified-Since is then ignored.
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since.timestamp() >= asset.mtime_ns // 1_000_000_000
+    return False
+
+
+STATIC_ASSETS = StaticAssets(FRONTEND_DIR, os.environ.get("ANALYSIS_STATIC_CACHE_CONTROL", "no-cache"))
+
+
+def _record_input(source: str, endpoint: str) -> None:
+    METRICS.observe("analyzer_input_bytes", len(source.encode("utf-8")), (("endpoint", endpoint),))
+
+
+# Per-phase times (ms) of the analysis running on this thread, for the request log.
+_request_phases = threading.local()
+
+
+class _PhaseMetrics(PhaseObserver):
+    def phase_finished(self, phase, report, timing) -> None:
+        METRICS.observe("analyzer_phase_duration_seconds", timing.wall_time, (("phase", phase),))
+        phases = getattr(_request_phases, "phases", None)
+        if phases is not None:
+            phases[phase] = round(timing.wall_time * 1000, 3)
+
+
+@dataclass(frozen=True)
+class AnalysisJob:
+    """An /api/analyze request the cache could not answer, ready to analyze."""
+
+    source: str
+    phases: Optional[tuple[str, ...]]
+    timings: bool
+    seconds: Optional[float]
+    structured: bool
+    key: str
+    size: int
+    cursor: Optional[str]
 
-        self.send_response(HTTPStatus.OK)
+
+def _analysis_error(message: str, status: HTTPStatus, headers: Optional[dict] = None) -> tuple[HTTPStatus, bytes, dict]:
+    return status, json.dumps({"error": message}).encode("utf-8"), headers or {}
+
+
+class AnalyzerHandler(BaseHTTPRequestHandler):
+    analyzer = CompilerAnalyzer(trace_memory=TRACE_MEMORY)
+    cache = ResultCache.from_env()
+    # Set by main() when ANALYSIS_BACKEND=process; batches always use a pool.
+    use_pool = False
+    _pool: Optional[WorkerPool] = None
+    _pool_lock = threading.Lock()
+    admission = AdmissionControl.from_env()
+    # Socket timeout, so slow clients cannot hold connection slots forever.
+    timeout = float(os.environ.get("ANALYSIS_SOCKET_TIMEOUT", 30.0))
+    # Longest an /api/analyze or stream analysis runs before it is cut short
+    # (seconds, 0 for no limit); requests may ask for less with "timeout".
+    deadline = float(os.environ.get("ANALYSIS_DEADLINE", DEFAULT_ANALYSIS_DEADLINE))
+    # Set ANALYSIS_REQUEST_LOG to record every request (see frontend/README.md).
+    request_log = RequestLog.from_env()
+
+    @classmethod
+    def pool(cls) -> WorkerPool:
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = WorkerPool.from_env()
+            return cls._pool
+
+    def do_OPTIONS(self) -> None:
+        self.send_response(HTTPStatus.NO_CONTENT)
         self._send_cors_headers()
-        self.send_header("Content-Type", mime)
-        self.send_header("Content-Length", str(len(content)))
         self.end_headers()
-        self.wfile.write(content)
+
+    @classmethod
+    def collect_metrics(cls):
+        """Cache, admission and worker pool families for ``METRICS``, read when scraped."""
+        stats = cls.cache.stats()
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        yield "analyzer_cache_hits_total", "counter", "Result cache hits by tier.", [
+            ((("tier", "memory"),), stats["hits"]),
+            ((("tier", "disk"),), stats["disk_hits"]),
+        ]
+        yield "analyzer_cache_misses_total", "counter", "Result cache misses.", [((), stats["misses"])]
+        yield "analyzer_cache_evictions_total", "counter", "Entries evicted from the in-memory cache.", [((), stats["evictions"])]
+        yield "analyzer_cache_hit_ratio", "gauge", "Share of cache lookups served from either tier.", [
+            ((), (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0)
+        ]
+        yield "analyzer_cache_bytes", "gauge", "Bytes held by the in-memory cache.", [((), stats["bytes"])]
+        yield "analyzer_cache_entries", "gauge", "Entries in the in-memory cache.", [((), stats["entries"])]
+
+        stats = FIX_ENGINE.stats()
+        yield "analyzer_fix_cache_hits_total", "counter", "Guided-feedback fixes reused from the fix engine.", [
+            ((), stats["hits"])
+        ]
+        yield "analyzer_fix_cache_misses_total", "counter", "Guided-feedback fixes computed.", [((), stats["misses"])]
+
+        if cls.request_log is not None:
+            stats = cls.request_log.stats()
+            yield "analyzer_request_log_written_total", "counter", "Requests written to the request log.", [
+                ((), stats["written"])
+            ]
+            yield "analyzer_request_log_dropped_total", "counter", "Requests the request log had to drop.", [
+                ((), stats["dropped"])
+            ]
+
+        stats = cls.admission.stats()
+        yield "analyzer_queue_depth", "gauge", "Analyses waiting for a slot.", [((), stats["waiting"])]
+        yield "analyzer_analyses_running", "gauge", "Analyses holding a slot.", [((), stats["running"])]
+        yield "analyzer_concurrency_limit", "gauge", "Analysis slots.", [((), stats["concurrency"])]
+        yield "analyzer_queue_limit", "gauge", "Analyses allowed to wait for a slot.", [((), stats["queue_size"])]
+        yield "analyzer_rejections_total", "counter", "Requests turned away, by reason.", [
+            ((("reason", reason),), count) for reason, count in sorted(stats["rejected"].items())
+        ]
+
+        pool = cls._pool
+        if pool is None:
+            return
+        stats = pool.stats()
+        busy = stats["workers"] - stats["idle"]
+        yield "analyzer_workers", "gauge", "Analysis worker processes.", [((), stats["workers"])]
+        yield "analyzer_workers_busy", "gauge", "Workers running an analysis or being replaced.", [((), busy)]
+        yield "analyzer_worker_utilization", "gauge", "Share of workers busy.", [((), busy / stats["workers"])]
+        yield "analyzer_worker_timeouts_total", "counter", "Analyses killed at their deadline.", [((), stats["timeouts"])]
+        yield "analyzer_worker_restarts_total", "counter", "Worker processes replaced.", [((), stats["restarts"])]
+
+    def send_response(self, code, message=None) -> None:
+        self._status = int(code)
+        super().send_response(code, message)
+
+    def _observed(self, method: str, handle) -> None:
+        self._endpoint = metric_endpoint(method, urlparse(self.path).path)
+        self._status = 0
+        # Filled in by the handlers for the request log.
+        self._capture: dict = {}
+        METRICS.inc("analyzer_http_requests_in_flight")
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            handle()
+        finally:
+            seconds = time.perf_counter() - start
+            endpoint = (("endpoint", self._endpoint),)
+            METRICS.observe("analyzer_http_request_duration_seconds", seconds, endpoint)
+            if self.request_log is not None:
+                self.request_log.record(method, self.path, self._status, started, seconds, self.headers, self._capture)
+            # Only after the record is queued, so close_request_log waits for it.
+            METRICS.inc("analyzer_http_requests_in_flight", amount=-1)
+            METRICS.inc(
+                "analyzer_http_requests_total",
+                (("endpoint", self._endpoint), ("method", method), ("status", str(self._status))),
+            )
+
+    def _record_input(self, source: str) -> None:
+        _record_input(source, self._endpoint)
+
+    def do_GET(self) -> None:
+        self._observed("GET", self._do_get)
 
     def do_POST(self) -> None:
+        self._observed("POST", self._do_post)
+
+    def _do_get(self) -> None:
+        parsed = urlparse(self.path)
+        path = parsed.path
+        if path == "/api/cache":
+            self._send_json(self.cache.stats(), HTTPStatus.OK)
+            return
+        if path == "/metrics":
+            body = METRICS.render().encode("utf-8")
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path == "/api/analyze/stream":
+            query = parse_qs(parsed.query)
+            try:
+                phases = parse_phases(query.get("phases", [""])[0])
+                timeout = query.get("timeout", [""])[0]
+                seconds = request_deadline(float(timeout) if timeout else None, self.deadline)
+            except ValueError as exc:
+                self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+                return
+            self._handle_stream(
+                query.get("source", [""])[0].strip(), query.get("format", [""])[0], phases, seconds
+            )
+            return
+        status, content, headers = STATIC_ASSETS.response(
+            path,
+            self.headers.get("If-None-Match"),
+            self.headers.get("If-Modified-Since"),
+            self.headers.get("Accept-Encoding"),
+        )
+        self._send_body(content, status, headers, headers.pop("Content-Type", None))
+
+    def _do_post(self) -> None:
         parsed = urlparse(self.path)
+        if parsed.path == "/api/analyze/batch":
+            self._handle_batch()
+            return
+        if parsed.path == "/api/analyze/stream":
+            raw = self._read_body(self.admission.max_body_bytes)
+            if raw is None:
+                return
+            self._capture["raw"] = raw
+            try:
+                payload = json.loads(raw.decode("utf-8")) if raw else {}
+            except (ValueError, UnicodeDecodeError):
+                self._send_json({"error": "invalid JSON body"}, HTTPStatus.BAD_REQUEST)
+                return
+            try:
+                phases = parse_phases(payload.get("phases"))
+                seconds = request_deadline(payload.get("timeout"), self.deadline)
+            except ValueError as exc:
+                self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+                return
+            fmt = parse_qs(parsed.query).get("format", [""])[0] or str(payload.get("format", ""))
+            self._handle_stream(str(payload.get("source", "")).strip(), fmt, phases, seconds)
+            return
         if parsed.path != "/api/analyze":
             self._send_json({"error": "Not found"}, HTTPStatus.NOT_FOUND)
             return
 
+        raw = self._read_body(self.admission.max_body_bytes)
+        if raw is None:
+            return
+        self._capture["raw"] = raw
+        status, body, headers = self.analyze_request(raw, self._endpoint, self._capture)
+        self._send_compressed(body, status, headers)
+
+    @classmethod
+    def analyze_request(
+        cls, raw: bytes, endpoint: str = "/api/analyze", capture: Optional[dict] = None
+    ) -> tuple[HTTPStatus, bytes, dict]:
+        """Answer an /api/analyze request body: status, JSON body and extra headers.
+
+        ``lookup_request`` followed, on a cache miss, by ``run_analysis``; it
+        blocks while the analysis waits for a slot. ``capture``, if given,
+        receives the source, cache status, phase times, complexity and
+        truncated flag for the request log.
+        """
+        if capture is None:
+            capture = {}
+        answer = cls.lookup_request(raw, endpoint, capture)
+        if isinstance(answer, AnalysisJob):
+            answer = cls.run_analysis(answer, endpoint, capture)
+        return answer
+
+    @classmethod
+    def lookup_request(
+        cls, raw: bytes, endpoint: str, capture: dict
+    ) -> Union[tuple[HTTPStatus, bytes, dict], AnalysisJob]:
+        """Validate an /api/analyze body and answer it from the cache if possible.
+
+        Returns the response, or the ``AnalysisJob`` to hand to
+        ``run_analysis`` when the cache cannot answer. Never waits for an
+        analysis slot, so the asyncio front end runs it on a separate
+        executor and cache hits do not queue behind analyses.
+        """
         try:
-            length = int(self.headers.get("Content-Length", "0"))
-            raw = self.rfile.read(length)
             payload = json.loads(raw.decode("utf-8")) if raw else {}
             source = str(payload.get("source", "")).strip()
             if not source:
-                self._send_json({"error": "source is required"}, HTTPStatus.BAD_REQUEST)
+                return _analysis_error("source is required", HTTPStatus.BAD_REQUEST)
+            capture["source"] = source
+            _record_input(source, endpoint)
+            problem = cls._source_problem(source)
+            if problem is not None:
+                return _analysis_error(problem, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            structured = payload.get("structured") is True
+            try:
+                phases = parse_phases(payload.get("phases"))
+                seconds = request_deadline(payload.get("timeout"), cls.deadline)
+                size = page_size(payload.get("page_size"))
+            except ValueError as exc:
+                return _analysis_error(str(exc), HTTPStatus.BAD_REQUEST)
+            cursor = payload.get("cursor") if structured else None
+
+            # Timings describe this run, so such requests bypass the cache.
+            timings = payload.get("timings") is True and cursor is None
+            key = cls.cache.key(source, phases, "structured" if structured else "")
+            if cursor is not None:
+                try:
+                    decode_cursor(cursor, key)
+                except ValueError as exc:
+                    return _analysis_error(str(exc), HTTPStatus.BAD_REQUEST)
+            job = AnalysisJob(source, phases, timings, seconds, structured, key, size, cursor)
+            body = None if timings else cls.cache.get(key)
+            if body is None:
+                return job
+            return cls._analysis_response(job, body, None, "HIT", capture)
+        except Exception as exc:  # pragma: no cover
+            return _analysis_error(f"analysis failed: {exc}", HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    @classmethod
+    def run_analysis(cls, job: AnalysisJob, endpoint: str, capture: dict) -> tuple[HTTPStatus, bytes, dict]:
+        """Run the analysis ``lookup_request`` could not answer, and cache the result."""
+        try:
+            data = None
+            cls.admission.acquire()
+            try:
+                if cls.use_pool:
+                    ok, body = cls.pool().run(
+                        job.source,
+                        phases=job.phases,
+                        timings=job.timings,
+                        deadline=job.seconds,
+                        structured=job.structured,
+                    )
+                    if not ok:
+                        return _analysis_error(body.decode("utf-8"), HTTPStatus.INTERNAL_SERVER_ERROR)
+                else:
+                    _request_phases.phases = capture["phases"] = {}
+                    try:
+                        data = analyze_source(
+                            cls.analyzer, job.source, job.phases, job.timings, job.seconds, job.structured
+                        )
+                    finally:
+                        _request_phases.phases = None
+                    body = json.dumps(data).encode("utf-8")
+            finally:
+                cls.admission.release()
+            # Worker processes only hand back the encoded response.
+            truncated = data.get("truncated") is True if data is not None else is_truncated(body)
+            capture["truncated"] = truncated
+            if truncated:
+                METRICS.inc("analyzer_analyses_truncated_total", (("endpoint", endpoint),))
+            elif not job.timings:
+                cls.cache.put(job.key, body)
+            return cls._analysis_response(job, body, data, "BYPASS" if job.timings else "MISS", capture)
+        except Overloaded as exc:
+            retry = {"Retry-After": str(cls.admission.retry_after)}
+            return _analysis_error(str(exc), HTTPStatus.SERVICE_UNAVAILABLE, retry)
+        except AnalysisTimeout as exc:
+            return _analysis_error(str(exc), HTTPStatus.GATEWAY_TIMEOUT)
+        except Exception as exc:  # pragma: no cover
+            return _analysis_error(f"analysis failed: {exc}", HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def _analysis_response(
+        job: AnalysisJob, body: bytes, data: Optional[dict], cache_status: str, capture: dict
+    ) -> tuple[HTTPStatus, bytes, dict]:
+        if job.structured:
+            # The cache holds every row; each response carries one page.
+            page = paginate(data if data is not None else json.loads(body), job.key, job.size, job.cursor)
+            body = json.dumps(page).encode("utf-8")
+        capture["cache"] = cache_status
+        capture["complexity"] = data.get("complexity") if data is not None else response_complexity(body)
+        return HTTPStatus.OK, body, {"X-Cache": cache_status}
+
+    def _handle_stream(
+        self, source: str, fmt: str, phases: Optional[tuple[str, ...]] = None, deadline: Optional[float] = None
+    ) -> None:
+        """Send each phase's response fields as soon as the phase finishes.
+
+        Events are Server-Sent Events by default, or one JSON object per line
+        with ``format=ndjson`` (or an ``Accept: application/x-ndjson`` header).
+        Each carries the phase name and the fields it adds to the /api/analyze
+        response; a final ``done`` (or ``error``) event ends the stream.
+        With ``phases`` only those phases' events are sent. Streaming
+        analyses always run on the handler thread. An analysis cut short
+        after ``deadline`` seconds ends with a ``done`` event carrying
+        ``truncated`` and ``phases_completed``.
+        """
+        if not source:
+            self._send_json({"error": "source is required"}, HTTPStatus.BAD_REQUEST)
+            return
+        self._record_input(source)
+        self._capture["source"] = source
+        if not self._admit_source(source):
+            return
+        ndjson = fmt == "ndjson" or (not fmt and "application/x-ndjson" in self.headers.get("Accept", ""))
+        key = self.cache.key(source, phases)
+        body = self.cache.get(key)
+        if body is None:
+            # Take the slot before any headers go out, so overload is a plain 503.
+            try:
+                self.admission.acquire()
+            except Overloaded as exc:
+                self._send_overloaded(exc)
                 return
 
-            report = self.analyzer.analyze(source)
-            optimized_codegen = format_codegen(report.target_code)
-            suggested_code, suggested_kind = build_code_suggestion(
-                source,
-                report.syntax_errors,
-                report.semantic_errors,
-                report.optimizations_applied,
-                optimized_codegen,
-            )
+        def emit(event: str, data: dict) -> None:
+            if ndjson:
+                chunk = json.dumps({"event": event, "data": data}) + "\n"
+            else:
+                chunk = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            self.wfile.write(chunk.encode("utf-8"))
+            self.wfile.flush()
 
-            data = {
-                "tokens_count": len(report.tokens),
-                "syntax_error_count": len(report.syntax_errors),
-                "semantic_error_count": len(report.semantic_errors),
-                "semantic_warning_count": len(report.semantic_warnings),
-                "complexity": report.complexity,
-                "lexical": format_tokens(report.tokens),
-                "syntax": format_diagnostics(report.syntax_errors),
-                "parse_tree": report.parse_tree or "No parse tree available.",
-                "semantic": "\n".join([
-                    format_diagnostics(report.semantic_errors),
-                    format_diagnostics(report.semantic_warnings),
-                ]).strip(),
-                "ir": format_ir(report.ir),
-                "optimization": "\n".join(report.optimizations_applied) if report.optimizations_applied else "No optimizations.",
-                "codegen": optimized_codegen,
-                "complexity_detail": "\n".join(report.complexity_steps),
-                "guided_feedback": build_guided_feedback(source, report.syntax_errors, report.semantic_errors),
-                "suggested_code": suggested_code,
-                "suggested_code_kind": suggested_kind,
-            }
-            self._send_json(data, HTTPStatus.OK)
+        try:
+            self.send_response(HTTPStatus.OK)
+            self._send_cors_headers()
+            self.send_header("Content-Type", "application/x-ndjson" if ndjson else "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            wanted = phases or STREAM_PHASES
+            if body is not None:
+                self._capture["cache"] = "HIT"
+                cached = json.loads(body)
+                self._capture["complexity"] = cached.get("complexity")
+                for phase in wanted:
+                    emit(phase, {name: cached[name] for name in PHASE_FIELDS[phase]})
+            else:
+                self._capture["cache"] = "MISS"
+                response: dict = {}
+                sent = []
+                iterator = self.analyzer.analyze_iter(
+                    source, analyzer_phases(phases), Deadline(deadline) if deadline else None
+                )
+                report = None
+                _request_phases.phases = self._capture["phases"] = {}
+                for phase, report in iterator:
+                    if phase not in wanted:
+                        continue
+                    data = phase_payload(phase, report, source)
+                    response.update(data)
+                    sent.append(phase)
+                    emit(phase, data)
+                _request_phases.phases = None
+                self._capture["complexity"] = response.get("complexity")
+                if report is None or report.truncated:
+                    METRICS.inc("analyzer_analyses_truncated_total", (("endpoint", self._endpoint),))
+                    self._capture["truncated"] = True
+                    emit("done", {"truncated": True, "phases_completed": sent})
+                    return
+                if "guided_feedback" in wanted:
+                    data = phase_payload("guided_feedback", report, source)
+                    response.update(data)
+                    emit("guided_feedback", data)
+                self.cache.put(key, json.dumps(response).encode("utf-8"))
+            emit("done", {})
+        except (BrokenPipeError, ConnectionResetError):
+            return
         except Exception as exc:  # pragma: no cover
-            self._send_json({"error": f"analysis failed: {exc}"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+            try:
+                emit("error", {"error": f"analysis failed: {exc}"})
+            except OSError:
+                pass
+        finally:
+            _request_phases.phases = None
+            if body is None:
+                self.admission.release()
+
+    def _handle_batch(self) -> None:
+        raw = self._read_body(self.admission.max_batch_bytes)
+        if raw is None:
+            return
+        self._capture["raw"] = raw
+        try:
+            sources = read_batch_sources(raw, self.headers.get("Content-Type", ""), self.admission.max_batch_bytes)
+        except BatchTooLarge as exc:
+            self.admission.reject("body_too_large")
+            self._send_json({"error": str(exc)}, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            return
+        except BatchError as exc:
+            self._send_json({"error": str(exc)}, HTTPStatus.BAD_REQUEST)
+            return
+        for name, source in sources:
+            if source:
+                self._record_input(source)
+                if not self._admit_source(source, name):
+                    return
+        try:
+            self.admission.acquire()
+        except Overloaded as exc:
+            self._send_overloaded(exc)
+            return
+        try:
+            body = analyze_batch(sources, self.cache, self.pool())
+            self._send_compressed(body, HTTPStatus.OK)
+        except Exception as exc:  # pragma: no cover
+            self._send_json({"error": f"batch analysis failed: {exc}"}, HTTPStatus.INTERNAL_SERVER_ERROR)
+        finally:
+            self.admission.release()
+
+    def _read_body(self, limit: int) -> Optional[bytes]:
+        """The request body, or None after answering a bad or oversized one.
+
+        An oversized body is refused from its ``Content-Length`` alone, without
+        reading it.
+        """
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json({"error": "invalid Content-Length"}, HTTPStatus.BAD_REQUEST)
+            return None
+        if length > limit:
+            self.admission.reject("body_too_large")
+            self.close_connection = True
+            self._send_json(
+                {"error": f"request body is {length} bytes; the limit is {limit}"},
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            )
+            return None
+        return self.rfile.read(length)
+
+    @classmethod
+    def _source_problem(cls, source: str, name: str = "source") -> Optional[str]:
+        """Why ``source`` is over the line or token limit (counted as a rejection), or None."""
+        problem = cls.admission.check_source(source)
+        if problem is None:
+            return None
+        cls.admission.reject("source_too_large")
+        return problem if name == "source" else f"{name}: {problem}"
+
+    def _admit_source(self, source: str, name: str = "source") -> bool:
+        """Answer 413 and return False if ``source`` is over the line or token limit."""
+        problem = self._source_problem(source, name)
+        if problem is None:
+            return True
+        self._send_json({"error": problem}, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        return False
+
+    def _send_overloaded(self, exc: Overloaded) -> None:
+        self._send_json(
+            {"error": str(exc)}, HTTPStatus.SERVICE_UNAVAILABLE, {"Retry-After": str(self.admission.retry_after)}
+        )
 
     def log_message(self, fmt: str, *args) -> None:
         return
 
-    def _send_json(self, data: dict, status: HTTPStatus) -> None:
-        body = json.dumps(data).encode("utf-8")
+    def _send_json(self, data: dict, status: HTTPStatus, headers: Optional[dict] = None) -> None:
+        self._send_body(json.dumps(data).encode("utf-8"), status, headers)
+
+    def _send_compressed(self, body: bytes, status: HTTPStatus, headers: Optional[dict] = None) -> None:
+        headers = dict(headers or {})
+        body = gzip_body(body, headers, self.headers.get("Accept-Encoding"))
+        self._send_body(body, status, headers)
+
+    def _send_body(
+        self,
+        body: bytes,
+        status: HTTPStatus,
+        headers: Optional[dict] = None,
+        content_type: Optional[str] = JSON_CONTENT_TYPE,
+    ) -> None:
+        """Send a complete response; a ``content_type`` of None (a 304) sends no body."""
         self.send_response(status)
         self._send_cors_headers()
-        self.send_header("Content-Type", "application/json; charset=utf-8")
-        self.send_header("Content-Length", str(len(body)))
+        if content_type is not None:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write(body)
+        if content_type is not None:
+            self.wfile.write(body)
 
     def _send_cors_headers(self) -> None:
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        for name, value in CORS_HEADERS.items():
+            self.send_header(name, value)
+
+
+AnalyzerHandler.analyzer.add_observer(_PhaseMetrics())
+METRICS.add_collector(AnalyzerHandler.collect_metrics)
+
+
+def exit_on_sigterm() -> None:
+    """Turn SIGTERM, which loadgen and bench_server send, into a normal exit."""
+
+    def stop(signum, frame) -> None:
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+
+
+def close_request_log(timeout: float = 5.0) -> None:
+    """Let requests being handled finish, then write out the buffered records.
+
+    Handler threads are daemons and answer before they log, so without the
+    wait the last responses sent would be missing from the log.
+    """
+    if AnalyzerHandler.request_log is None:
+        return
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if METRICS.snapshot().get(("analyzer_http_requests_in_flight", ()), 0) <= 0:
+            break
+        time.sleep(0.01)
+    AnalyzerHandler.request_log.close()
 
 
 def main() -> None:
-    import os
     host = "0.0.0.0"
     port = int(os.environ.get("PORT", 8000))
-    server = ThreadingHTTPServer((host, port), AnalyzerHandler)
+    if os.environ.get("ANALYSIS_BACKEND", "thread") == "process":
+        # Start and warm the workers before accepting connections.
+        AnalyzerHandler.use_pool = True
+        AnalyzerHandler.pool()
+    server = AnalyzerHTTPServer((host, port), AnalyzerHandler, AnalyzerHandler.admission)
     print(f"Server running at http://{host}:{port}")
-    server.serve_forever()
-    
+    exit_on_sigterm()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        close_request_log()
+
+
 if __name__ == "__main__":
     main()
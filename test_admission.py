@@ -0,0 +1,115 @@
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+from server import AdmissionControl, AnalyzerHandler, AnalyzerHTTPServer, Overloaded, ResultCache
+
+
+def _rejects(fn, reason):
+    try:
+        fn()
+    except Overloaded:
+        return
+    raise AssertionError(f"expected Overloaded ({reason})")
+
+
+def test_slots_queue_and_rejections():
+    admission = AdmissionControl(concurrency=1, queue_size=1, queue_timeout=0.2)
+    admission.acquire()
+    waited = []
+    waiter = threading.Thread(target=lambda: _rejects(admission.acquire, "timeout") or waited.append(1))
+    waiter.start()
+    while admission.stats()["waiting"] == 0:
+        pass
+    _rejects(admission.acquire, "queue full")
+    waiter.join()
+    assert waited == [1]
+    admission.release()
+    admission.acquire()
+    admission.release()
+    stats = admission.stats()
+    assert (stats["running"], stats["waiting"]) == (0, 0)
+    assert stats["rejected"] == {"queue_full": 1, "queue_timeout": 1}
+
+
+def test_source_limits():
+    admission = AdmissionControl(max_lines=3, max_tokens=5)
+    assert admission.check_source("int a;\nb;") is None
+    assert "4 lines" in admission.check_source("a;\nb;\nc;\nd;")
+    # The cheap estimate counts the words in the string; the lexer sees 4 tokens.
+    assert admission.check_source('s = "one two three four five";') is None
+    assert "6 tokens" in admission.check_source("a = b + c;")
+    # Whitespace the lexer does not skip comes out as one token per character.
+    for space in ("\x0b", "\x0c", "\x1c", "\x85", "\xa0"):
+        assert "13 tokens" in admission.check_source(f"a{space * 10}b;"), repr(space)
+
+
+def _post(base, path, payload):
+    request = urllib.request.Request(base + path, data=json.dumps(payload).encode("utf-8"), method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.headers, json.loads(exc.read())
+
+
+def test_server_rejects_oversized_and_overloaded_requests():
+    admission = AdmissionControl(
+        concurrency=1, queue_size=0, max_body_bytes=200, max_lines=5, max_tokens=50, max_connections=2, retry_after=7
+    )
+    saved = AnalyzerHandler.admission, AnalyzerHandler.cache
+    AnalyzerHandler.admission, AnalyzerHandler.cache = admission, ResultCache()
+    server = AnalyzerHTTPServer(("127.0.0.1", 0), AnalyzerHandler, admission)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        status, _, data = _post(base, "/api/analyze", {"source": "x" * 500})
+        assert status == 413 and "limit is 200" in data["error"]
+        status, _, data = _post(base, "/api/analyze", {"source": "a;\n" * 6})
+        assert status == 413 and "6 lines" in data["error"]
+        status, _, data = _post(base, "/api/analyze", {"source": "int main() {" + "\f" * 60 + "}"})
+        assert status == 413 and "66 tokens" in data["error"]
+
+        admission.acquire()
+        try:
+            status, headers, _ = _post(base, "/api/analyze", {"source": "int main() { return 0; }"})
+            assert status == 503 and headers["Retry-After"] == "7"
+            status, _, _ = _post(base, "/api/analyze/stream", {"source": "int main() { return 0; }"})
+            assert status == 503
+        finally:
+            admission.release()
+        status, _, _ = _post(base, "/api/analyze", {"source": "int main() { return 0; }"})
+        assert status == 200
+
+        # Two idle connections use up the handler threads; the next is refused.
+        while server._connections._value < 2:
+            pass  # earlier handler threads are still closing
+        idle = [socket.create_connection(server.server_address) for _ in range(2)]
+        try:
+            status, headers, data = _post(base, "/api/analyze", {"source": "int main() { return 0; }"})
+            assert status == 503 and headers["Retry-After"] == "7"
+        finally:
+            for conn in idle:
+                conn.close()
+        assert admission.stats()["rejected"] == {
+            "body_too_large": 1,
+            "source_too_large": 2,
+            "queue_full": 2,
+            "connections": 1,
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+        AnalyzerHandler.admission, AnalyzerHandler.cache = saved
+
+
+if __name__ == "__main__":
+    for test in (
+        test_slots_queue_and_rejections,
+        test_source_limits,
+        test_server_rejects_oversized_and_overloaded_requests,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import re
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from async_server import AsyncAnalyzerServer, encode_response, parse_head
+from server import AdmissionControl, AnalyzerHandler, ResultCache
+
+
+def _request(path, payload=None, headers=""):
+    if payload is None:
+        return f"GET {path} HTTP/1.1\r\nHost: test\r\n{headers}\r\n".encode("latin-1")
+    body = json.dumps(payload).encode("utf-8")
+    head = f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n{headers}\r\n"
+    return head.encode("latin-1") + body
+
+
+def _read_response(reader):
+    status = int(reader.readline().split()[1])
+    headers = {}
+    for line in iter(reader.readline, b"\r\n"):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.lower()] = value.strip()
+    return status, headers, reader.read(int(headers["content-length"]))
+
+
+class _Running:
+    def __init__(self, admission=None, executor=None):
+        self.saved = AnalyzerHandler.cache, AnalyzerHandler.admission
+        AnalyzerHandler.cache = ResultCache()
+        AnalyzerHandler.admission = admission or AnalyzerHandler.admission
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.server = AsyncAnalyzerServer(executor)
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+
+    def connect(self):
+        sock = socket.create_connection(("127.0.0.1", self.server.port), timeout=10)
+        return sock, sock.makefile("rb")
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        AnalyzerHandler.cache, AnalyzerHandler.admission = self.saved
+
+
+def test_parse_head():
+    request = parse_head(b"POST /api/analyze?x=1 HTTP/1.0\r\nContent-Length: 3\r\nConnection: Keep-Alive\r\n\r\n")
+    assert (request.method, request.path, request.headers["content-length"]) == ("POST", "/api/analyze", "3")
+    assert request.keep_alive
+    assert not parse_head(b"GET / HTTP/1.0\r\n\r\n").keep_alive
+    assert not parse_head(b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n").keep_alive
+
+
+def test_bodyless_responses_have_no_content_length():
+    for status in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+        head, _, body = encode_response(status, b"ignored", {"ETag": '"1"'}, True).partition(b"\r\n\r\n")
+        assert b"content-length" not in head.lower() and body == b""
+    assert b"Content-Length: 2\r\n" in encode_response(HTTPStatus.OK, b"{}", {}, True)
+
+    running = _Running()
+    try:
+        sock, reader = running.connect()
+        options = b"OPTIONS /api/analyze HTTP/1.1\r\nHost: test\r\n\r\n"
+        sock.sendall(options + _request("/api/cache", headers="Connection: close\r\n"))
+        assert int(reader.readline().split()[1]) == 204
+        head = b"".join(iter(reader.readline, b"\r\n")).lower()
+        assert b"content-length" not in head
+        # The next response on the connection starts right after the 204's headers.
+        status, _, body = _read_response(reader)
+        assert status == 200 and "entries" in json.loads(body)
+        assert reader.read() == b""
+        sock.close()
+    finally:
+        running.close()
+
+
+def test_keep_alive_and_pipelining():
+    running = _Running()
+    try:
+        sock, reader = running.connect()
+        for _ in range(2):
+            sock.sendall(_request("/api/analyze", {"source": "int main() { return 0; }"}))
+            status, headers, body = _read_response(reader)
+            assert status == 200 and headers["connection"] == "keep-alive"
+            assert json.loads(body)["tokens_count"] == 9
+        assert headers["x-cache"] == "HIT"
+
+        # Several requests in one write; answers come back in request order.
+        sources = [f"int main() {{ {'int a; ' * count}return 0; }}" for count in range(1, 6)]
+        batch = b"".join(_request("/api/analyze", {"source": source}) for source in sources)
+        sock.sendall(batch)
+        counts = [json.loads(_read_response(reader)[2])["tokens_count"] for _ in sources]
+        assert counts == [9 + 3 * count for count in range(1, 6)]
+        # Pipelined requests run concurrently, so this one goes after the answers.
+        sock.sendall(_request("/api/cache") + _request("/missing", headers="Connection: close\r\n"))
+        status, _, body = _read_response(reader)
+        assert status == 200 and json.loads(body)["entries"] == 6
+        status, headers, _ = _read_response(reader)
+        assert status == 404 and headers["connection"] == "close"
+        assert reader.read() == b""
+        sock.close()
+    finally:
+        running.close()
+
+
+def test_limits_and_unsupported_requests():
+    running = _Running(AdmissionControl(max_body_bytes=100))
+    try:
+        sock, reader = running.connect()
+        sock.sendall(_request("/api/analyze", {"source": "x" * 200}))
+        status, headers, body = _read_response(reader)
+        assert status == 413 and headers["connection"] == "close" and b"limit is 100" in body
+        sock.close()
+
+        sock, reader = running.connect()
+        sock.sendall(b"POST /api/analyze HTTP/1.1\r\nContent-Length: 30\r\nExpect: 100-continue\r\n\r\n")
+        assert reader.readline() == b"HTTP/1.1 100 Continue\r\n" and reader.readline() == b"\r\n"
+        sock.sendall(json.dumps({"source": "int main() { }"}).ljust(30).encode("utf-8"))
+        assert _read_response(reader)[0] == 200
+        sock.sendall(_request("/api/analyze/stream", {"source": "int x;"}))
+        assert _read_response(reader)[0] == 501
+        sock.sendall(_request("/index.html"))
+        status, headers, body = _read_response(reader)
+        assert status == 200 and headers["content-type"] == "text/html" and re.search(rb"<html", body, re.I)
+        sock.sendall(b"not http\r\n\r\n")
+        assert _read_response(reader)[0] == 400
+        sock.close()
+    finally:
+        running.close()
+
+
+
+def test_cache_hits_do_not_queue_behind_waiting_analyses():
+    admission = AdmissionControl(concurrency=1, queue_size=1, queue_timeout=30)
+    # A single analysis thread, so one analysis waiting for a slot fills it.
+    running = _Running(admission, ThreadPoolExecutor(max_workers=1))
+    try:
+        sock, reader = running.connect()
+        sock.sendall(_request("/api/analyze", {"source": "int a;"}))
+        assert _read_response(reader)[1]["x-cache"] == "MISS"
+        admission.acquire()
+        try:
+            waiting, waiting_reader = running.connect()
+            close = "Connection: close\r\n"
+            waiting.sendall(_request("/api/analyze", {"source": "int b;"}, headers=close))
+            while admission.stats()["waiting"] == 0:
+                pass
+            sock.sendall(_request("/api/analyze", {"source": "int a;"}, headers=close))
+            status, headers, _ = _read_response(reader)
+            assert status == 200 and headers["x-cache"] == "HIT"
+        finally:
+            admission.release()
+        assert _read_response(waiting_reader)[1]["x-cache"] == "MISS"
+        assert reader.read() == waiting_reader.read() == b""
+        sock.close()
+        waiting.close()
+    finally:
+        running.close()
+
+
+if __name__ == "__main__":
+    for test in (
+        test_parse_head,
+        test_bodyless_responses_have_no_content_length,
+        test_keep_alive_and_pipelining,
+        test_limits_and_unsupported_requests,
+        test_cache_hits_do_not_queue_behind_waiting_analyses,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
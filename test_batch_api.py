@@ -0,0 +1,68 @@
+import io
+import json
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from compiler_analyzer import CompilerAnalyzer
+from server import BatchError, ResultCache, WorkerPool, analyze_batch, analyze_source, read_batch_sources
+
+ROOT = Path(__file__).resolve().parent
+SAMPLES = sorted((ROOT / "samples").glob("*.c"))
+
+
+def _archive(kind: str) -> bytes:
+    buffer = io.BytesIO()
+    if kind == "zip":
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for path in SAMPLES:
+                archive.write(path, f"class/{path.name}")
+            archive.writestr("class/notes.txt", "not a source file")
+    else:
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for path in SAMPLES:
+                archive.add(path, f"class/{path.name}")
+    return buffer.getvalue()
+
+
+def test_sources_from_json_and_archives():
+    body = json.dumps({"sources": ["int main() {}", {"name": "b.c", "source": " x; "}]}).encode()
+    assert read_batch_sources(body, "application/json") == [("source_0", "int main() {}"), ("b.c", "x;")]
+    for kind in ("zip", "tar"):
+        sources = read_batch_sources(_archive(kind), "application/octet-stream")
+        assert [name for name, _ in sources] == [f"class/{path.name}" for path in SAMPLES]
+        assert sources[0][1] == SAMPLES[0].read_text(encoding="utf-8").strip()
+    with pytest.raises(BatchError):
+        read_batch_sources(b"\x00garbage", "application/octet-stream")
+    with pytest.raises(BatchError):
+        read_batch_sources(b'{"sources": "int main() {}"}', "application/json")
+
+
+def test_batch_results_are_ordered_with_per_item_status():
+    sources = [(path.name, path.read_text(encoding="utf-8").strip()) for path in SAMPLES]
+    sources.insert(1, ("empty.c", ""))
+    sources.append(("again.c", sources[0][1]))
+    cache = ResultCache()
+    with WorkerPool(2) as pool:
+        result = json.loads(analyze_batch(sources, cache, pool))
+
+    assert (result["count"], result["ok"], result["failed"]) == (len(sources), len(sources) - 1, 1)
+    assert [item["name"] for item in result["results"]] == [name for name, _ in sources]
+    assert result["results"][1] == {"index": 1, "name": "empty.c", "status": "error", "error": "source is required"}
+    for item, (_, source) in zip(result["results"], sources):
+        if source:
+            assert item["status"] == "ok"
+            assert item["result"]["complexity"] == analyze_source(CompilerAnalyzer(), source)["complexity"]
+    # The repeated source shares one cache entry with its first copy.
+    assert cache.stats()["entries"] == len(SAMPLES)
+
+
+if __name__ == "__main__":
+    for test in (
+        test_sources_from_json_and_archives,
+        test_batch_results_are_ordered_with_per_item_status,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
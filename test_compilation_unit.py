@@ -0,0 +1,141 @@
+from pathlib import Path
+
+from compiler_analyzer import CompilationUnit, CompilerAnalyzer
+from compiler_analyzer.ir import IRGenerator
+from compiler_analyzer.lexer import Lexer
+from compiler_analyzer.parser import Parser
+
+ROOT = Path(__file__).resolve().parent
+SOURCE = """#include <stdio.h>
+int main() {
+    int a[3] = {1, 2, 3};
+    if ((a[0] + 1) > 0) { return a[1]; }
+    return 0;
+}
+"""
+
+
+def _unit(source: str) -> CompilationUnit:
+    stream, _ = Lexer("regex").tokenize_stream(source)
+    return CompilationUnit.build(stream)
+
+
+def test_preprocessor_lines_are_filtered_once():
+    unit = _unit(SOURCE)
+    assert unit.raw.kind(0) == "PREPROCESSOR"
+    assert unit.values[0] == "int"
+    assert len(unit) == len(unit.raw) - 1
+
+
+def test_brackets_are_matched_per_kind():
+    unit = _unit(SOURCE)
+    values = unit.values
+    for i, v in enumerate(values):
+        partner = unit.partners[i]
+        if v in "([{":
+            assert values[partner] == {"(": ")", "[": "]", "{": "}"}[v]
+            assert unit.partners[partner] == i
+        elif v not in ")]}":
+            assert partner == -1
+    assert _unit("( ] { )").partners.tolist() == [3, -1, -1, 0]
+
+
+def test_depths_follow_matched_brackets():
+    assert _unit("f ( a [ 1 ] ) ;").depths.tolist() == [0, 0, 1, 1, 2, 1, 0, 0]
+    # An unclosed opener nests the rest; a stray closer changes nothing.
+    assert _unit("( a ] b").depths.tolist() == [0, 1, 1, 1]
+
+
+def test_tokens_on_line():
+    unit = _unit(SOURCE)
+    assert [unit.values[i] for i in unit.tokens_on_line(2)] == ["int", "main", "(", ")", "{"]
+    assert list(unit.tokens_on_line(1)) == []
+    assert [unit.values[i] for i in unit.tokens_on_line(6)] == ["}"]
+    assert list(unit.tokens_on_line(99)) == []
+
+
+def test_parser_uses_partners_for_nested_calls():
+    depth = 200
+    source = "int main() { y = " + "f(a, " * depth + "1" + ")" * depth + "; }"
+    result = Parser(_unit(source)).parse()
+    node = result.expressions[0].expr
+    for _ in range(depth):
+        assert node.kind == "call" and [arg.value for arg in node.args[:1]] == ["a"]
+        node = node.args[1]
+    assert node.kind == "literal" and node.value == "1"
+
+
+def test_parser_builds_statement_tree():
+    program = Parser(_unit(SOURCE + "int square(int x);\n")).parse().program
+    main, proto = program.body
+    assert (main.kind, main.name, proto.kind, proto.name) == ("function", "main", "function", "square")
+    assert proto.body == []
+    block = main.body[0]
+    assert [s.kind for s in block.body] == ["decl", "if", "return"]
+    cond = block.body[1].parts[0]
+    values = _unit(SOURCE).values
+    assert " ".join(values[cond.start : cond.stop]) == "( a [ 0 ] + 1 ) > 0"
+    assert block.body[1].body[0].body[0].kind == "return"
+
+
+
+def test_malformed_function_header_keeps_its_body():
+    for source, name in (
+        ("int main()y {\n    int s = 0;\n    s = s + 1;\n    return s;\n}\n", "main"),
+        ("int f(int a < b) {\n    int s = 0;\n    s = s + 1;\n    return s;\n}\n", "f"),
+    ):
+        unit = _unit(source)
+        result = Parser(unit).parse()
+        assert any("Expected '{' for function body" in e.message for e in result.errors)
+        ir = IRGenerator().generate(unit, result.expressions, result.program)
+        assert [(i.op, i.result) for i in ir if i.op == "FUNC_BEGIN"] == [("FUNC_BEGIN", name)]
+        assert ("=", "s + 1", "s") in [(i.op, i.arg1, i.result) for i in ir]
+        assert ir[-2].op == "RETURN" and ir[-2].arg1 == "s"
+    # Without any '{' the function stays body-less.
+    program = Parser(_unit("int g() x; int h;")).parse().program
+    assert program.body[0].body == []
+
+
+
+def test_ir_survives_statements_without_a_target_or_callee():
+    report = CompilerAnalyzer().analyze("int main() {\n    = 1;\n    (a)(b);\n    return 0;\n}\n")
+    ops = [(i.op, i.arg1, i.result) for i in report.ir]
+    assert ("=", "1", "unknown") in ops and ("CALL", "unknown", "") in ops
+    assert report.complexity
+
+
+def test_unclosed_brackets_do_not_swallow_the_rest_of_the_file():
+    source = (ROOT / "samples" / "binary_search.c").read_text(encoding="utf-8")
+    source = source.replace("int high = n - 1;", "int high =if( n - 1;")
+    report = CompilerAnalyzer().analyze(source)
+    ops = [(i.op, i.arg1, i.result) for i in report.ir]
+    assert ("IF_FALSE", "n - 1", "IF_ELSE_1") in ops and ("IF_FALSE", "low <= high", "WHILE_END_4") in ops
+    assert [result for op, _, result in ops if op == "FUNC_BEGIN"] == ["binarySearch", "main"]
+    assert ("RETURN", "0", "") in ops
+
+    for header, condition in (
+        ("for (int i = 0; i < n; i++ {", "i < n"),  # never closed
+        ("while > (i < n) {", "> ( i < n )"),  # no '('
+        ("if (i < n { i = n; } while (i {", "i"),  # both, then a stray '{'
+    ):
+        source = f"int f(int n) {{\n    int i = 0;\n    {header}\n        i = i + 1;\n    }}\n    return i;\n}}\nint main() {{ return f(3); }}\n"
+        ops = [(i.op, i.arg1, i.result) for i in CompilerAnalyzer().analyze(source).ir]
+        assert condition in [arg for op, arg, _ in ops if op == "IF_FALSE"], header
+        assert ("=", "i + 1", "i") in ops and ("RETURN", "i", "") in ops, header
+        assert [result for op, _, result in ops if op == "FUNC_BEGIN"] == ["f", "main"], header
+
+
+if __name__ == "__main__":
+    for test in (
+        test_preprocessor_lines_are_filtered_once,
+        test_brackets_are_matched_per_kind,
+        test_depths_follow_matched_brackets,
+        test_tokens_on_line,
+        test_parser_uses_partners_for_nested_calls,
+        test_parser_builds_statement_tree,
+        test_malformed_function_header_keeps_its_body,
+        test_ir_survives_statements_without_a_target_or_callee,
+        test_unclosed_brackets_do_not_swallow_the_rest_of_the_file,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,53 @@
+import dataclasses
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from compiler_analyzer import CompilerAnalyzer
+
+ROOT = Path(__file__).resolve().parent
+SOURCES = [
+    path.read_text(encoding="utf-8")
+    for path in sorted((ROOT / "samples").glob("*.c")) + sorted((ROOT / "examples" / "c").glob("*.c"))
+]
+
+
+def _snapshot(report):
+    fields = {f.name: getattr(report, f.name) for f in dataclasses.fields(report) if f.name not in {"tokens", "timings"}}
+    fields["tokens"] = [dataclasses.astuple(t) for t in report.tokens]
+    return fields
+
+
+def test_shared_analyzer_matches_serial_runs_under_threads():
+    expected = [_snapshot(CompilerAnalyzer().analyze(source)) for source in SOURCES]
+    order = random.Random(7).choices(range(len(SOURCES)), k=20 * len(SOURCES))
+
+    shared = CompilerAnalyzer()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # force frequent thread switches mid-phase
+    try:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda idx: _snapshot(shared.analyze(SOURCES[idx])), order))
+    finally:
+        sys.setswitchinterval(interval)
+
+    for idx, result in zip(order, results):
+        assert result == expected[idx]
+
+
+def test_repeated_runs_do_not_drift():
+    analyzer = CompilerAnalyzer()
+    first = _snapshot(analyzer.analyze(SOURCES[0]))
+    for source in SOURCES:
+        analyzer.analyze(source)
+    assert _snapshot(analyzer.analyze(SOURCES[0])) == first
+
+
+if __name__ == "__main__":
+    for test in (
+        test_shared_analyzer_matches_serial_runs_under_threads,
+        test_repeated_runs_do_not_drift,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+from compiler_analyzer import CompilerAnalyzer, Deadline, PhaseObserver
+from server import AnalyzerHandler, ResultCache, analyze_source, request_deadline
+
+LOOPS = "".join(f"    for (int i{k} = 0; i{k} < n; i{k}++) {{ s = s + i{k} * 2; }}\n" for k in range(3000))
+LARGE_SOURCE = "int main() {\n    int s = 0;\n" + LOOPS + "    return s;\n}\n"
+SMALL_SOURCE = "int main() {\n    int s = 0;\n    for (int i = 0; i < n; i++) { s = s + i; }\n    return s;\n}\n"
+
+
+class CancelAt(PhaseObserver):
+    """Cancels ``deadline`` as ``phase`` starts, so that phase stops at its first check."""
+
+    def __init__(self, deadline, phase):
+        self.deadline = deadline
+        self.phase = phase
+        self.events = []
+
+    def phase_started(self, phase):
+        if phase == self.phase:
+            self.deadline.cancel()
+
+    def phase_finished(self, phase, report, timing):
+        self.events.append((phase, report.truncated))
+
+
+def test_cancelled_deadline_runs_nothing():
+    deadline = Deadline()
+    deadline.cancel()
+    report = CompilerAnalyzer().analyze(SMALL_SOURCE, deadline=deadline)
+    assert report.truncated and report.phases_completed == [] and report.tokens == []
+
+
+def test_deadline_stops_inside_a_phase():
+    analyzer = CompilerAnalyzer()
+    deadline = Deadline()
+    analyzer.add_observer(CancelAt(deadline, "semantic"))
+    report = analyzer.analyze(SMALL_SOURCE, deadline=deadline)
+    assert report.truncated and report.phases_completed == ["lexical", "syntax", "parse_tree"]
+    assert [t.phase for t in report.timings] == report.phases_completed + ["semantic"]
+    assert analyzer.observers[0].events[-2:] == [("parse_tree", False), ("semantic", True)]
+    assert report.semantic_errors == [] and report.ir == []
+
+
+def test_expired_deadline_returns_quickly():
+    analyzer = CompilerAnalyzer()
+    start = time.perf_counter()
+    report = analyzer.analyze(LARGE_SOURCE, deadline=Deadline(0.05))
+    assert report.truncated and time.perf_counter() - start < 0.3
+    assert len(report.phases_completed) < 8
+
+    full = analyzer.analyze(SMALL_SOURCE, deadline=Deadline(60))
+    assert not full.truncated and len(full.phases_completed) == len(full.timings) == 8
+
+
+def test_incremental_analyzer_recovers_from_a_truncated_run():
+    analyzer = CompilerAnalyzer(incremental=True)
+    analyzer.analyze(SMALL_SOURCE)
+    for seconds in (0.01, 0.05, 0.1):
+        assert analyzer.analyze(LARGE_SOURCE, deadline=Deadline(seconds)).truncated
+        report = analyzer.analyze(SMALL_SOURCE)
+        expected = CompilerAnalyzer().analyze(SMALL_SOURCE)
+        assert report.target_code == expected.target_code and report.complexity == expected.complexity
+
+
+def test_truncated_responses_are_partial_and_not_cached():
+    assert request_deadline(None, 5.0) == 5.0 and request_deadline(None, 0) is None
+    assert request_deadline(0.5, 5.0) == 0.5 and request_deadline(30, 5.0) == 5.0
+    for bad in (0, -1, "1", True):
+        try:
+            request_deadline(bad, 5.0)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted timeout {bad!r}")
+
+    data = analyze_source(CompilerAnalyzer(), LARGE_SOURCE, deadline=0.05)
+    assert list(data)[:2] == ["truncated", "phases_completed"]
+    assert "guided_feedback" not in data and "complexity" not in data
+    assert "tokens_count" in data and "lexical" in data["phases_completed"]
+
+    cache, AnalyzerHandler.cache = AnalyzerHandler.cache, ResultCache()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AnalyzerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        for _ in range(2):
+            request = urllib.request.Request(
+                base + "/api/analyze",
+                data=json.dumps({"source": LARGE_SOURCE, "timeout": 0.05}).encode("utf-8"),
+                method="POST",
+            )
+            with urllib.request.urlopen(request) as response:
+                assert response.headers["X-Cache"] == "MISS"
+                assert json.loads(response.read())["truncated"] is True
+        assert AnalyzerHandler.cache.stats()["entries"] == 0
+
+        request = urllib.request.Request(
+            base + "/api/analyze/stream?format=ndjson",
+            data=json.dumps({"source": LARGE_SOURCE, "timeout": 0.05}).encode("utf-8"),
+            method="POST",
+        )
+        with urllib.request.urlopen(request) as response:
+            events = [json.loads(line) for line in response.read().splitlines()]
+        done = events[-1]
+        assert done["event"] == "done" and done["data"]["truncated"] is True
+        assert done["data"]["phases_completed"] == [event["event"] for event in events[:-1]]
+        assert AnalyzerHandler.cache.stats()["entries"] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+        AnalyzerHandler.cache = cache
+
+
+if __name__ == "__main__":
+    for test in (
+        test_cancelled_deadline_runs_nothing,
+        test_deadline_stops_inside_a_phase,
+        test_expired_deadline_returns_quickly,
+        test_incremental_analyzer_recovers_from_a_truncated_run,
+        test_truncated_responses_are_partial_and_not_cached,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
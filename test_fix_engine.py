@@ -0,0 +1,53 @@
+from compiler_analyzer import CompilerAnalyzer
+from server import FixEngine, build_code_suggestion, build_guided_feedback
+
+
+def _report(source):
+    return CompilerAnalyzer().analyze(source)
+
+
+def test_fixes_are_computed_once_per_source_and_diagnostics():
+    engine = FixEngine()
+    source = "int main() {\n    int a = 1\n    return a;\n}"
+    report = _report(source)
+    fixed = engine.fix(source, report.syntax_errors, report.semantic_errors)
+    assert "int a = 1;" in fixed
+    assert engine.fix(source, report.syntax_errors, report.semantic_errors) == fixed
+    assert engine.stats() == {"entries": 1, "hits": 1, "misses": 1}
+    # Clean code is returned as is without touching the cache.
+    assert engine.fix("int main() { return 0; }", [], []) == "int main() { return 0; }"
+    assert engine.stats()["entries"] == 1
+
+
+def test_feedback_and_suggestion_share_the_fix():
+    source = "int main() {\n    x = 5;\n    return x;\n}"
+    report = _report(source)
+    engine = FixEngine()
+    fixed = engine.fix(source, report.syntax_errors, report.semantic_errors)
+    assert "    int x = 5;" in fixed.splitlines()
+    feedback = build_guided_feedback(source, report.syntax_errors, report.semantic_errors, fixed)
+    assert "Suggested Corrected Version:" in feedback and fixed in feedback
+    code, kind = build_code_suggestion(source, report.syntax_errors, report.semantic_errors, [], "", fixed)
+    assert (code, kind) == (fixed, "source-fix")
+
+
+def test_unfixable_sources_are_remembered_as_unchanged():
+    engine = FixEngine(max_entries=1)
+    source = "int main() {\n    return y + ;\n}"
+    report = _report(source)
+    assert engine.fix(source, report.syntax_errors, report.semantic_errors) == source
+    assert engine.fix(source, report.syntax_errors, report.semantic_errors) == source
+    other = "int main() {\n    int b = 2\n}"
+    other_report = _report(other)
+    engine.fix(other, other_report.syntax_errors, other_report.semantic_errors)
+    assert engine.stats()["entries"] == 1
+
+
+if __name__ == "__main__":
+    for test in (
+        test_fixes_are_computed_once_per_source_and_diagnostics,
+        test_feedback_and_suggestion_share_the_fix,
+        test_unfixable_sources_are_remembered_as_unchanged,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,69 @@
+import dataclasses
+from pathlib import Path
+
+from compiler_analyzer import CompilerAnalyzer
+
+ROOT = Path(__file__).resolve().parent
+SOURCES = sorted((ROOT / "samples").glob("*.c")) + sorted((ROOT / "examples" / "c").glob("*.c"))
+
+# (marker, replacement) edits applied in turn to every source; each one is
+# analyzed by an incremental and a plain analyzer side by side.
+EDITS = [
+    ("{", "{\n    int extra = 1 + 2;"),
+    ("\n", "\n\n\n"),
+    ("return", "return 0; return"),
+    (";", ";;"),
+    ("(", "(("),
+    ("((", "("),
+    ("}", "} int helper(int x) { if (x) { return x; } return 0; }"),
+]
+
+
+def _snapshot(report):
+    fields = {f.name: getattr(report, f.name) for f in dataclasses.fields(report) if f.name not in {"tokens", "timings"}}
+    fields["tokens"] = [dataclasses.astuple(t) for t in report.tokens]
+    return fields
+
+
+def _edited(source: str, marker: str, replacement: str) -> str:
+    # Edit the last occurrence so the earlier functions stay unchanged.
+    idx = source.rfind(marker)
+    if idx < 0:
+        return source + replacement
+    return source[:idx] + replacement + source[idx + len(marker) :]
+
+
+def test_incremental_reports_match_full_analysis():
+    for path in SOURCES:
+        source = path.read_text(encoding="utf-8")
+        full = CompilerAnalyzer()
+        incremental = CompilerAnalyzer(incremental=True)
+        assert _snapshot(incremental.analyze(source)) == _snapshot(full.analyze(source)), path.name
+        for marker, replacement in EDITS:
+            source = _edited(source, marker, replacement)
+            assert _snapshot(incremental.analyze(source)) == _snapshot(full.analyze(source)), (path.name, marker)
+
+
+def test_unchanged_functions_are_reused():
+    source = (ROOT / "samples" / "binary_search.c").read_text(encoding="utf-8")
+    analyzer = CompilerAnalyzer(incremental=True)
+    analyzer.analyze(source)
+    cache = analyzer.cache
+
+    edited = source.replace("return 0;", "int unused = 4;\n    return 0;")
+    calls = []
+    parsed = cache.parsed
+    cache.parsed = lambda unit, start: calls.append(parsed(unit, start)) or calls[-1]
+    analyzer.analyze(edited)
+
+    reused = [hit[0].name for hit in calls if hit is not None]
+    assert reused == ["binarySearch"]
+
+
+if __name__ == "__main__":
+    for test in (
+        test_incremental_reports_match_full_analysis,
+        test_unchanged_functions_are_reused,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,70 @@
+import tracemalloc
+from pathlib import Path
+
+from compiler_analyzer import CompilerAnalyzer, PhaseObserver
+from compiler_analyzer.engine import PHASES
+from server import STREAM_PHASES, analyze_source
+
+ROOT = Path(__file__).resolve().parent
+SOURCE = (ROOT / "samples" / "binary_search.c").read_text(encoding="utf-8")
+
+
+class Recorder(PhaseObserver):
+    def __init__(self):
+        self.events = []
+
+    def phase_started(self, phase):
+        self.events.append(("start", phase))
+
+    def phase_finished(self, phase, report, timing):
+        assert report.timings[-1] is timing and timing.phase == phase
+        self.events.append(("end", phase))
+
+
+def test_every_phase_is_timed_and_observed():
+    analyzer = CompilerAnalyzer()
+    recorder = Recorder()
+    analyzer.add_observer(recorder)
+    report = analyzer.analyze(SOURCE)
+    assert [t.phase for t in report.timings] == list(PHASES)
+    assert all(t.wall_time >= 0 and t.cpu_time >= 0 for t in report.timings)
+    assert all(t.allocated_bytes is None and t.peak_bytes is None for t in report.timings)
+    assert recorder.events == [(kind, phase) for phase in PHASES for kind in ("start", "end")]
+
+    analyzer.remove_observer(recorder)
+    report = analyzer.analyze(SOURCE, ["complexity"])
+    assert [t.phase for t in report.timings] == ["complexity"]
+    assert len(recorder.events) == 2 * len(PHASES)
+
+
+def test_memory_tracing_is_opt_in_and_restored():
+    assert not tracemalloc.is_tracing()
+    report = CompilerAnalyzer(trace_memory=True).analyze(SOURCE)
+    assert not tracemalloc.is_tracing()
+    assert all(t.peak_bytes is not None and t.allocated_bytes is not None for t in report.timings)
+    assert max(t.peak_bytes for t in report.timings) > 0
+
+    tracemalloc.start()
+    try:
+        CompilerAnalyzer(trace_memory=True).analyze(SOURCE)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_response_timings_are_opt_in():
+    analyzer = CompilerAnalyzer()
+    assert "timings" not in analyze_source(analyzer, SOURCE)
+    timings = analyze_source(analyzer, SOURCE, timings=True)["timings"]
+    assert [t["phase"] for t in timings] == list(STREAM_PHASES)
+    assert set(timings[0]) == {"phase", "wall_ms", "cpu_ms", "allocated_bytes", "peak_bytes"}
+
+
+if __name__ == "__main__":
+    for test in (
+        test_every_phase_is_timed_and_observed,
+        test_memory_tracing_is_opt_in_and_restored,
+        test_response_timings_are_opt_in,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
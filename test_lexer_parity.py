@@ -0,0 +1,100 @@
+import io
+from pathlib import Path
+
+from compiler_analyzer.lexer import Lexer
+
+ROOT = Path(__file__).resolve().parent
+SOURCES = sorted((ROOT / "samples").glob("*.c")) + sorted((ROOT / "examples" / "c").glob("*.c"))
+
+# Edge cases the character scanner handles in a particular way.
+EDGE_CASES = [
+    'int main() { char *s = "unterminated',
+    "int main() { /* never closed\n int x = 1;",
+    "char c = 'a\nint x = 1;\n",
+    's = "line\\\ncontinued";\nint y = 2;',
+    "x = .5 + 1.e3 + 0x1F;",
+    "a <<= b >>= c -> d :: e;",
+    "int é = 1; @ $",
+]
+
+
+# (offset, deleted, inserted) edits applied to every source by the relex tests.
+# Offsets past the end of a source are clamped.
+EDITS = [
+    (0, 0, "int z;\n"),
+    (10, 3, ""),
+    (25, 0, "/* "),
+    (25, 0, "\""),
+    (40, 1, "\n\n"),
+    (60, 0, "é"),
+    (10**6, 0, " x"),
+]
+
+
+def _compare(source: str) -> bool:
+    return Lexer("scan").tokenize(source) == Lexer("regex").tokenize(source)
+
+
+def _compare_relex(source: str, offset: int, deleted: int, inserted: str) -> bool:
+    lexer = Lexer("regex")
+    offset = min(offset, len(source))
+    deleted = min(deleted, len(source) - offset)
+    stream, errors = lexer.tokenize_stream(source)
+    result = lexer.relex(stream, offset, deleted, inserted, errors)
+    edited = source[:offset] + inserted + source[offset + deleted :]
+    expected, expected_errors = lexer.tokenize_stream(edited)
+    return (
+        result.stream.to_tokens() == expected.to_tokens()
+        and list(result.stream.starts) == list(expected.starts)
+        and result.errors == expected_errors
+    )
+
+
+def test_regex_engine_matches_scan_engine_on_samples():
+    for path in SOURCES:
+        assert _compare(path.read_text(encoding="utf-8")), path.name
+
+
+def test_regex_engine_matches_scan_engine_on_edge_cases():
+    for source in EDGE_CASES:
+        assert _compare(source), source
+
+
+def _compare_streamed(source: str, chunk_size: int) -> bool:
+    lexer = Lexer("regex")
+    expected = lexer.tokenize(source)
+    for reader in (io.StringIO(source), io.BytesIO(source.encode("utf-8"))):
+        errors = []
+        tokens = list(lexer.iter_tokens(reader, errors, chunk_size))
+        if (tokens, errors) != expected:
+            return False
+    return True
+
+
+def test_relex_matches_full_tokenize():
+    sources = [path.read_text(encoding="utf-8") for path in SOURCES] + EDGE_CASES
+    for source in sources:
+        for edit in EDITS:
+            assert _compare_relex(source, *edit), (source[:40], edit)
+
+
+def test_streamed_tokens_match_tokenize_across_chunk_boundaries():
+    sources = [path.read_text(encoding="utf-8") for path in SOURCES] + EDGE_CASES
+    for source in sources:
+        for chunk_size in (1, 3, 16, 4096):
+            assert _compare_streamed(source, chunk_size), (source[:40], chunk_size)
+
+
+if __name__ == "__main__":
+    for path in SOURCES:
+        status = "PASS" if _compare(path.read_text(encoding="utf-8")) else "FAIL"
+        print(f"[{status}] {path.relative_to(ROOT)}")
+    for source in EDGE_CASES:
+        status = "PASS" if _compare(source) else "FAIL"
+        print(f"[{status}] {source!r}")
+    for path in SOURCES:
+        source = path.read_text(encoding="utf-8")
+        status = "PASS" if all(_compare_relex(source, *edit) for edit in EDITS) else "FAIL"
+        print(f"[{status}] relex {path.relative_to(ROOT)}")
+        status = "PASS" if all(_compare_streamed(source, size) for size in (1, 3, 16, 4096)) else "FAIL"
+        print(f"[{status}] streamed {path.relative_to(ROOT)}")
@@ -0,0 +1,76 @@
+import json
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+from loadgen import Job, Result, load_log, run, schedule, summarize, synthetic_corpus
+from server import AnalyzerHandler, ResultCache
+
+
+def test_load_log_reads_captures_and_bare_sources():
+    lines = [
+        {"ts": 100.0, "method": "POST", "path": "/api/analyze", "headers": {"Accept-Encoding": "gzip", "Host": "x"},
+         "body": {"source": "int main() { return 0; }"}},
+        {"ts": 100.5, "method": "GET", "path": "/api/health"},
+        {"source": "int f() { return 1; }"},
+        {"request_id": "user-001", "title": "not a request"},
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        log = Path(tmp) / "capture.jsonl"
+        log.write_text("\n".join(json.dumps(line) for line in lines) + "\nnot json\n\n", encoding="utf-8")
+        jobs, skipped = load_log(log)
+    assert skipped == 2
+    assert [(job.method, job.path, job.offset) for job in jobs] == [
+        ("POST", "/api/analyze", 0.0),
+        ("GET", "/api/health", 0.5),
+        ("POST", "/api/analyze", None),
+    ]
+    assert dict(jobs[0].headers) == {"accept-encoding": "gzip", "content-type": "application/json"}
+    assert jobs[0].label == "capture.jsonl:1 /api/analyze int main() { return 0; }"
+    assert jobs[1].body == b"" and json.loads(jobs[2].body) == {"source": "int f() { return 1; }"}
+
+
+def test_schedule_paces_and_replays_timing():
+    jobs = [Job("a", "GET", "/", offset=0.0), Job("b", "GET", "/", offset=1.0)]
+    assert [start for start, _ in schedule(jobs, 3, 0.0, False, 1.0)] == [None, None, None]
+    assert [start for start, _ in schedule(jobs, 3, 4.0, False, 1.0)] == [0.0, 0.25, 0.5]
+    # The second pass starts one average gap after the log ends.
+    assert [start for start, _ in schedule(jobs, 4, 0.0, True, 2.0)] == [0.0, 0.5, 1.0, 1.5]
+
+
+def test_summary_percentiles_errors_and_slowest():
+    results = [Result(f"in{i % 10}", 200, (i + 1) / 1000) for i in range(100)]
+    results.append(Result("bad", 503, 0.5, "HTTP 503"))
+    summary = summarize(results, 2.0, slowest=2)
+    assert summary["throughput"] == 50.5 and summary["errors"] == 1
+    assert summary["statuses"] == {"200": 100, "503": 1}
+    assert summary["latency_ms"]["p50"] == 51.0 and summary["latency_ms"]["max"] == 500.0
+    assert [item["input"] for item in summary["slowest"]] == ["bad", "in9"]
+
+
+def test_run_against_server():
+    cache, AnalyzerHandler.cache = AnalyzerHandler.cache, ResultCache()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AnalyzerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        jobs = synthetic_corpus(5) + [Job("missing", "GET", "/api/nope")]
+        results, seconds = run(f"http://127.0.0.1:{server.server_address[1]}", schedule(jobs, 12, 0.0, False, 1.0), 3)
+    finally:
+        server.shutdown()
+        server.server_close()
+        AnalyzerHandler.cache = cache
+    summary = summarize(results, seconds)
+    assert summary["requests"] == 12
+    assert summary["statuses"] == {"200": 10, "404": 2} and summary["error_kinds"] == {"HTTP 404": 2}
+
+
+if __name__ == "__main__":
+    for test in (
+        test_load_log_reads_captures_and_bare_sources,
+        test_schedule_paces_and_replays_timing,
+        test_summary_percentiles_errors_and_slowest,
+        test_run_against_server,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
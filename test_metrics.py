@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+from metrics import MetricsRegistry
+from server import METRICS, AnalyzerHandler, ResultCache
+
+
+def test_thread_shards_are_summed():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs.")
+    registry.histogram("job_seconds", "Job time.", (0.1, 1.0))
+
+    def work():
+        for value in (0.05, 0.1, 0.5, 2.0):
+            registry.inc("jobs_total", (("kind", 'a"b'),))
+            registry.observe("job_seconds", value)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    work()
+
+    lines = registry.render().splitlines()
+    assert 'jobs_total{kind="a\\"b"} 20' in lines
+    assert 'job_seconds_bucket{le="0.1"} 10' in lines
+    assert 'job_seconds_bucket{le="1"} 15' in lines
+    assert 'job_seconds_bucket{le="+Inf"} 20' in lines
+    assert "job_seconds_count 20" in lines and "job_seconds_sum 13.25" in lines
+    # The finished threads' shards have been folded into one total.
+    assert len(registry._shards) == 1
+    assert registry.render().splitlines() == lines
+
+
+def test_metrics_endpoint():
+    cache, AnalyzerHandler.cache = AnalyzerHandler.cache, ResultCache()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AnalyzerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    before = METRICS.snapshot()
+    try:
+        for _ in range(2):
+            request = urllib.request.Request(
+                base + "/api/analyze",
+                data=json.dumps({"source": "int main() { return 0; }"}).encode("utf-8"),
+                method="POST",
+            )
+            urllib.request.urlopen(request).read()
+        with urllib.request.urlopen(base + "/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            text = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+        AnalyzerHandler.cache = cache
+
+    endpoint = (("endpoint", "/api/analyze"),)
+    requests = (("endpoint", "/api/analyze"), ("method", "POST"), ("status", "200"))
+
+    def added(name, labels):
+        old = before.get((name, labels), 0)
+        new = after[(name, labels)]
+        return [b - a for a, b in zip(old or [0] * len(new), new)] if isinstance(new, list) else new - old
+
+    # A handler thread records its request just after sending the response.
+    deadline = time.monotonic() + 2
+    after = METRICS.snapshot()
+    while added("analyzer_http_requests_total", requests) < 2 and time.monotonic() < deadline:
+        after = METRICS.snapshot()
+    assert added("analyzer_http_requests_total", requests) == 2
+    assert sum(added("analyzer_http_request_duration_seconds", endpoint)[:-1]) == 2
+    assert added("analyzer_input_bytes", endpoint)[0] == 2  # both in the first (<= 256) bucket
+    assert added("analyzer_phase_duration_seconds", (("phase", "lexical"),))[:-1] != [0] * 13
+
+    lines = text.splitlines()
+    assert "analyzer_cache_hit_ratio 0.5" in lines
+    assert any(line.startswith('analyzer_http_requests_total{endpoint="/api/analyze",method="POST"') for line in lines)
+
+
+if __name__ == "__main__":
+    for test in (
+        test_thread_shards_are_summed,
+        test_metrics_endpoint,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import server
+from compiler_analyzer import CompilerAnalyzer
+from compiler_analyzer.engine import PHASES, resolve_phases
+from server import PHASE_FIELDS, analyze_source, parse_phases
+
+ROOT = Path(__file__).resolve().parent
+SOURCE = (ROOT / "samples" / "binary_search.c").read_text(encoding="utf-8")
+
+
+def test_dependencies_are_resolved_in_pipeline_order():
+    assert resolve_phases(None) == PHASES
+    assert resolve_phases(["complexity"]) == ("complexity",)
+    assert resolve_phases(["codegen", "parse_tree"]) == (
+        "lexical", "syntax", "parse_tree", "ir", "optimization", "codegen",
+    )
+    try:
+        resolve_phases(["typecheck"])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown phase accepted")
+
+
+def test_unselected_phases_do_not_run():
+    analyzer = CompilerAnalyzer()
+    rendered = []
+    build = analyzer._build_parse_tree
+    analyzer._build_parse_tree = lambda *args: rendered.append(1) or build(*args)
+
+    full = analyzer.analyze(SOURCE)
+    assert rendered == [1]
+    report = analyzer.analyze(SOURCE, phases=["complexity"])
+    assert rendered == [1]
+    assert list(report.tokens) == [] and report.ir == []
+    assert (report.complexity, report.complexity_steps) == (full.complexity, full.complexity_steps)
+
+    assert [phase for phase, _ in analyzer.analyze_iter(SOURCE, ["semantic"])] == ["lexical", "syntax", "semantic"]
+    assert analyzer.analyze(SOURCE, ["codegen"]).target_code == full.target_code
+
+
+def test_response_contains_only_requested_phases():
+    calls = []
+    feedback = server.build_guided_feedback
+    server.build_guided_feedback = lambda *args: calls.append(args) or feedback(*args)
+    try:
+        analyzer = CompilerAnalyzer()
+        full = analyze_source(analyzer, SOURCE)
+        assert len(calls) == 1
+        phases = parse_phases("complexity")
+        data = analyze_source(analyzer, SOURCE, phases)
+        assert len(calls) == 1
+        assert data == {name: full[name] for name in PHASE_FIELDS["complexity"]}
+        phases = parse_phases(["guided_feedback", "ir"])
+        assert phases == ("ir", "guided_feedback")
+        data = analyze_source(analyzer, SOURCE, phases)
+        assert data == {name: full[name] for phase in phases for name in PHASE_FIELDS[phase]}
+    finally:
+        server.build_guided_feedback = feedback
+
+
+def test_phase_field_validation():
+    assert parse_phases(None) is None and parse_phases("") is None and parse_phases([]) is None
+    assert parse_phases(" codegen , lexical") == ("lexical", "codegen")
+    for bad in (["lexical", "nope"], {"lexical": True}):
+        try:
+            parse_phases(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{bad!r} accepted")
+
+
+def test_partial_runs_keep_incremental_results_consistent():
+    incremental = CompilerAnalyzer(incremental=True)
+    incremental.analyze(SOURCE)
+    edited = SOURCE.replace("return 0;", "int unused = 4;\n    return 0;")
+    incremental.analyze(edited, ["syntax"])
+    incremental.analyze(edited, ["complexity"])
+    assert incremental.analyze(edited).optimized_ir == CompilerAnalyzer().analyze(edited).optimized_ir
+
+
+if __name__ == "__main__":
+    for test in (
+        test_dependencies_are_resolved_in_pipeline_order,
+        test_unselected_phases_do_not_run,
+        test_response_contains_only_requested_phases,
+        test_phase_field_validation,
+        test_partial_runs_keep_incremental_results_consistent,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,183 @@
+import json
+import os
+import tempfile
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+from bench_server import SERVERS, free_port, start_server
+from loadgen import load_log
+from request_log import RequestLog
+from server import AnalyzerHandler, ResultCache, response_complexity
+
+SOURCE = "int main() {\n    int s = 0;\n    for (int i = 0; i < n; i++) { s = s + i; }\n    return s;\n}"
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_records_are_written_in_the_background_and_rotated():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "requests.jsonl"
+        log = RequestLog(path, max_bytes=600, backups=2, slow_ms=100.0)
+        capture = {"raw": b'{"source": "int a;"}', "source": "int a;", "cache": "MISS", "complexity": "O(n)"}
+        log.record("POST", "/api/analyze", 200, 1000.0, 0.5, {"accept-encoding": "gzip", "host": "x"}, capture)
+        log.record("GET", "/api/analyze/stream?source=int+b%3B", 200, 1000.25, 0.001, {}, {"source": "int b;"})
+        assert log.flush()
+        slow, fast = _lines(path)
+        assert slow["body"] == {"source": "int a;"} and slow["headers"] == {"accept-encoding": "gzip"}
+        assert (slow["complexity"], slow["cache"], slow["duration_ms"], slow["source_bytes"]) == ("O(n)", "MISS", 500.0, 6)
+        # Fast requests keep the hash and size, but not the source.
+        assert fast["path"] == "/api/analyze/stream" and "body" not in fast and "headers" not in fast
+        assert len(fast["source_sha256"]) == 64
+
+        for index in range(20):
+            log.record("GET", f"/api/cache?{index}", 200, 1001.0, 0.001, {}, {})
+        log.close()
+        assert sorted(p.name for p in Path(tmp).iterdir()) == ["requests.jsonl", "requests.jsonl.1", "requests.jsonl.2"]
+        assert all(p.stat().st_size <= 600 for p in Path(tmp).iterdir())
+        assert log.stats() == {"written": 22, "dropped": 0, "buffered": 0}
+
+
+def test_full_buffer_drops_instead_of_blocking():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RequestLog(Path(tmp) / "requests.jsonl", buffer_size=2)
+        # Holding the (reentrant) lock keeps the writer from draining the buffer.
+        with log._cond:
+            for index in range(3):
+                log.record("GET", f"/{index}", 200, 0.0, 0.001, {}, {})
+        log.close()
+        assert log.stats() == {"written": 2, "dropped": 1, "buffered": 0}
+        assert [entry["path"] for entry in _lines(Path(tmp) / "requests.jsonl")] == ["/0", "/1"]
+
+
+def test_buffered_records_keep_the_body_only_when_logged_in_full():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RequestLog(Path(tmp) / "requests.jsonl", slow_ms=100.0)
+        raw = json.dumps({"source": "x" * 100_000}).encode("utf-8")
+        capture = {"raw": raw, "source": "x" * 100_000, "complexity": "O(1)"}
+        with log._cond:
+            log.record("POST", "/api/analyze", 200, 0.0, 0.001, {}, capture)
+            log.record("POST", "/api/analyze", 200, 0.0, 0.5, {}, capture)
+            (fast, fast_source, fast_raw), (slow, slow_source, slow_raw) = log._buffer
+        # Nothing is copied or hashed on the request thread.
+        assert fast_raw is None and len(json.dumps(fast)) < 500 and "source_sha256" not in fast
+        assert fast_source is slow_source is capture["source"] and slow_raw is raw
+        log.close()
+        lines = _lines(log.path)
+        assert [len(entry.get("body", {}).get("source", "")) for entry in lines] == [0, 100_000]
+        assert [entry["source_bytes"] for entry in lines] == [100_000, 100_000]
+
+
+def test_a_bad_record_is_dropped_and_the_writer_keeps_going():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RequestLog(Path(tmp) / "requests.jsonl")
+        log.record("GET", "/a", 200, 0.0, 0.001, {}, {"phases": {"lexical": object()}})
+        assert log.flush(timeout=2)
+        log.record("GET", "/b", 200, 0.0, 0.001, {}, {})
+        assert log.flush(timeout=2)
+        log.close()
+        assert log.stats() == {"written": 1, "dropped": 1, "buffered": 0}
+        assert [entry["path"] for entry in _lines(log.path)] == ["/b"]
+
+
+def test_analyze_request_fills_the_capture():
+    assert response_complexity(b'{"tokens": "\\"complexity\\": 1", "complexity": "O(n^2)"}') == "O(n^2)"
+    assert response_complexity(b'{"tokens": []}') is None
+
+    cache, AnalyzerHandler.cache = AnalyzerHandler.cache, ResultCache()
+    try:
+        captures = []
+        for payload in ({"source": SOURCE}, {"source": SOURCE}, {"source": SOURCE, "structured": True}):
+            captures.append({})
+            status, _, _ = AnalyzerHandler.analyze_request(json.dumps(payload).encode("utf-8"), capture=captures[-1])
+            assert status == 200
+        loops = "".join(f"    for (int i{k} = 0; i{k} < n; i{k}++) {{ s = s + i{k}; }}\n" for k in range(3000))
+        large = "int main() {\n    int s = 0;\n" + loops + "    return s;\n}"
+        captures.append({})
+        raw = json.dumps({"source": large, "timeout": 0.05}).encode("utf-8")
+        AnalyzerHandler.analyze_request(raw, capture=captures[-1])
+    finally:
+        AnalyzerHandler.cache = cache
+    assert [(c["cache"], c["complexity"], c.get("truncated")) for c in captures[:3]] == [
+        ("MISS", "O(n)", False),
+        ("HIT", "O(n)", None),
+        ("MISS", "O(n)", False),
+    ]
+    assert captures[3]["truncated"] is True and captures[3]["complexity"] is None
+    # Only small values are kept; the response itself is not.
+    assert all("response" not in c for c in captures)
+
+
+def test_server_capture_replays_with_loadgen():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "capture.jsonl"
+        saved = AnalyzerHandler.request_log, AnalyzerHandler.cache
+        AnalyzerHandler.request_log, AnalyzerHandler.cache = RequestLog(path, sample_rate=1.0), ResultCache()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), AnalyzerHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            for _ in range(2):
+                request = urllib.request.Request(
+                    base + "/api/analyze", data=json.dumps({"source": SOURCE}).encode("utf-8"), method="POST"
+                )
+                urllib.request.urlopen(request).read()
+            urllib.request.urlopen(base + "/api/cache").read()
+        finally:
+            server.shutdown()
+            server.server_close()
+            AnalyzerHandler.request_log.close()
+            AnalyzerHandler.request_log, AnalyzerHandler.cache = saved
+
+        first, second, cache = _lines(path)
+        assert [entry["cache"] for entry in (first, second)] == ["MISS", "HIT"]
+        assert first["complexity"] == "O(n)" and first["body"] == {"source": SOURCE}
+        assert set(first["phases"]) >= {"lexical", "syntax", "complexity"} and "phases" not in second
+        assert cache["path"] == "/api/cache" and cache["status"] == 200
+        jobs, skipped = load_log(path)
+        assert skipped == 0
+        assert [(job.method, job.path) for job in jobs] == [("POST", "/api/analyze")] * 2 + [("GET", "/api/cache")]
+        assert json.loads(jobs[0].body) == {"source": SOURCE}
+
+
+
+def test_servers_write_out_the_log_when_terminated():
+    with tempfile.TemporaryDirectory() as tmp:
+        for script in sorted(set(SERVERS.values())):
+            path = Path(tmp) / f"{script}.jsonl"
+            port = free_port()
+            os.environ["ANALYSIS_REQUEST_LOG"] = str(path)
+            try:
+                process = start_server(script, port)
+            finally:
+                del os.environ["ANALYSIS_REQUEST_LOG"]
+            try:
+                request = urllib.request.Request(
+                    f"http://127.0.0.1:{port}/api/analyze",
+                    data=json.dumps({"source": SOURCE}).encode("utf-8"),
+                    method="POST",
+                )
+                urllib.request.urlopen(request).read()
+            finally:
+                # The record is still buffered: only the shutdown writes it out.
+                process.terminate()
+                assert process.wait(timeout=10) == 0
+            (entry,) = _lines(path)
+            assert (entry["path"], entry["status"], entry["cache"]) == ("/api/analyze", 200, "MISS")
+
+
+if __name__ == "__main__":
+    for test in (
+        test_records_are_written_in_the_background_and_rotated,
+        test_full_buffer_drops_instead_of_blocking,
+        test_buffered_records_keep_the_body_only_when_logged_in_full,
+        test_a_bad_record_is_dropped_and_the_writer_keeps_going,
+        test_analyze_request_fills_the_capture,
+        test_server_capture_replays_with_loadgen,
+        test_servers_write_out_the_log_when_terminated,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,60 @@
+import json
+import tempfile
+from pathlib import Path
+
+from compiler_analyzer import CompilerAnalyzer
+from server import ResultCache, analyze_source
+
+ROOT = Path(__file__).resolve().parent
+
+
+def test_lru_eviction_respects_byte_budget():
+    cache = ResultCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"  # "a" is now the most recent entry
+    cache.put("c", b"123")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345" and cache.get("c") == b"123"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+    assert stats["bytes"] == 8 <= stats["max_bytes"]
+
+
+def test_oversized_and_disabled_entries_are_not_kept():
+    cache = ResultCache(max_bytes=4)
+    cache.put("big", b"12345")
+    assert cache.get("big") is None
+    disabled = ResultCache(max_bytes=0)
+    disabled.put("a", b"1")
+    assert disabled.get("a") is None and disabled.stats()["entries"] == 0
+
+
+def test_disk_tier_survives_a_new_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = (ROOT / "samples" / "linear_search.c").read_text(encoding="utf-8").strip()
+        key = ResultCache.key(source)
+        body = json.dumps(analyze_source(CompilerAnalyzer(), source)).encode("utf-8")
+        ResultCache(directory=Path(tmp)).put(key, body)
+
+        restarted = ResultCache(directory=Path(tmp))
+        assert restarted.get(key) == body
+        assert restarted.get(key) == body
+        stats = restarted.stats()
+        assert (stats["disk_hits"], stats["hits"], stats["misses"]) == (1, 1, 0)
+
+
+def test_keys_depend_on_source_content():
+    assert ResultCache.key("int main() {}") == ResultCache.key("int main() {}")
+    assert ResultCache.key("int main() {}") != ResultCache.key("int main() { }")
+
+
+if __name__ == "__main__":
+    for test in (
+        test_lru_eviction_respects_byte_budget,
+        test_oversized_and_disabled_entries_are_not_kept,
+        test_disk_tier_survives_a_new_cache,
+        test_keys_depend_on_source_content,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
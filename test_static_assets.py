@@ -0,0 +1,83 @@
+import gzip
+import os
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+from server import STATIC_ASSETS, AnalyzerHandler, StaticAssets
+
+
+def test_validators_gzip_and_invalidation():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        (root / "app.js").write_text("console.log('analyzer');\n" * 50)
+        (root / "tiny.txt").write_text("x")
+        assets = StaticAssets(root, "public, max-age=60")
+
+        status, body, headers = assets.response("/app.js")
+        assert status == HTTPStatus.OK and body.startswith(b"console.log")
+        assert headers["Content-Type"] == "text/javascript" and headers["Cache-Control"] == "public, max-age=60"
+        etag = headers["ETag"]
+
+        status, body, gz_headers = assets.response("/app.js", accept_encoding="br, gzip;q=0.8")
+        assert gz_headers["Content-Encoding"] == "gzip" and gz_headers["ETag"] != etag
+        assert gzip.decompress(body).startswith(b"console.log")
+        assert "Content-Encoding" not in assets.response("/app.js", accept_encoding="gzip;q=0")[2]
+        # Not worth compressing.
+        assert "Content-Encoding" not in assets.response("/tiny.txt", accept_encoding="gzip")[2]
+
+        assert assets.response("/app.js", if_none_match=etag)[:2] == (HTTPStatus.NOT_MODIFIED, b"")
+        assert assets.response("/app.js", if_none_match=f'"other", W/{etag}')[0] == HTTPStatus.NOT_MODIFIED
+        assert assets.response("/app.js", if_none_match=etag, accept_encoding="gzip")[0] == HTTPStatus.OK
+        modified = headers["Last-Modified"]
+        assert assets.response("/app.js", if_modified_since=modified)[0] == HTTPStatus.NOT_MODIFIED
+        # If-None-Match wins over If-Modified-Since.
+        assert assets.response("/app.js", if_none_match='"other"', if_modified_since=modified)[0] == HTTPStatus.OK
+
+        # Edits, new files and removals are noticed from the file's stat.
+        (root / "app.js").write_text("console.log('changed');\n")
+        stat = (root / "app.js").stat()
+        os.utime(root / "app.js", ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+        status, body, headers = assets.response("/app.js", if_none_match=etag)
+        assert status == HTTPStatus.OK and body == b"console.log('changed');\n" and headers["ETag"] != etag
+        (root / "new.css").write_text("body {}")
+        assert assets.response("/new.css")[2]["Content-Type"] == "text/css"
+        (root / "new.css").unlink()
+        assert assets.response("/new.css")[0] == HTTPStatus.NOT_FOUND
+        assert assets.response("/../etc/passwd")[0] == HTTPStatus.FORBIDDEN
+
+
+def test_server_answers_conditional_requests():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AnalyzerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(base + "/") as response:
+            etag = response.headers["ETag"]
+            assert response.headers["Vary"] == "Accept-Encoding" and response.read().lstrip().startswith(b"<!")
+        request = urllib.request.Request(base + "/index.html", headers={"If-None-Match": etag})
+        try:
+            urllib.request.urlopen(request)
+            raise AssertionError("expected 304")
+        except urllib.error.HTTPError as exc:
+            assert exc.code == 304 and exc.headers["ETag"] == etag and exc.read() == b""
+        request = urllib.request.Request(base + "/styles.css", headers={"Accept-Encoding": "gzip"})
+        with urllib.request.urlopen(request) as response:
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert gzip.decompress(response.read()) == STATIC_ASSETS.response("/styles.css")[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    for test in (
+        test_validators_gzip_and_invalidation,
+        test_server_answers_conditional_requests,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,77 @@
+import json
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+from compiler_analyzer import CompilerAnalyzer
+from compiler_analyzer.engine import PHASES
+from server import PHASE_FIELDS, STREAM_PHASES, AnalyzerHandler, ResultCache, analyze_source, phase_payload
+
+ROOT = Path(__file__).resolve().parent
+SOURCE = (ROOT / "samples" / "binary_search.c").read_text(encoding="utf-8").strip()
+
+
+def test_analyze_iter_yields_phases_in_order():
+    analyzer = CompilerAnalyzer()
+    seen = []
+    for phase, report in analyzer.analyze_iter(SOURCE):
+        seen.append(phase)
+        if phase == "lexical":
+            assert report.tokens and report.ir == []
+    assert tuple(seen) == PHASES
+    full = analyzer.analyze(SOURCE)
+    assert (report.ir, report.target_code, report.complexity) == (full.ir, full.target_code, full.complexity)
+
+
+def test_phase_payloads_make_up_the_full_response():
+    report = CompilerAnalyzer().analyze(SOURCE)
+    merged = {}
+    for phase in STREAM_PHASES:
+        payload = phase_payload(phase, report, SOURCE)
+        assert tuple(payload) == PHASE_FIELDS[phase]
+        merged.update(payload)
+    assert merged == analyze_source(CompilerAnalyzer(), SOURCE)
+
+
+def _stream(port: int) -> list:
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/analyze/stream?format=ndjson",
+        data=json.dumps({"source": SOURCE}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        assert response.headers["Content-Type"] == "application/x-ndjson"
+        return [json.loads(line) for line in response.read().decode("utf-8").splitlines()]
+
+
+def test_stream_endpoint_sends_one_event_per_phase():
+    cache, AnalyzerHandler.cache = AnalyzerHandler.cache, ResultCache()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AnalyzerHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        fresh = _stream(server.server_address[1])
+        cached = _stream(server.server_address[1])
+        assert AnalyzerHandler.cache.stats()["hits"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        AnalyzerHandler.cache = cache
+
+    assert [event["event"] for event in fresh] == list(STREAM_PHASES) + ["done"]
+    assert cached == fresh
+    response = {}
+    for event in fresh:
+        response.update(event["data"])
+    assert response == analyze_source(CompilerAnalyzer(), SOURCE)
+
+
+if __name__ == "__main__":
+    for test in (
+        test_analyze_iter_yields_phases_in_order,
+        test_phase_payloads_make_up_the_full_response,
+        test_stream_endpoint_sends_one_event_per_phase,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,104 @@
+import gzip
+import json
+import threading
+import urllib.request
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+from compiler_analyzer import CompilerAnalyzer
+from server import AnalyzerHandler, ResultCache, gzip_body
+
+ROOT = Path(__file__).resolve().parent
+SOURCE = (ROOT / "samples" / "binary_search.c").read_text(encoding="utf-8").strip()
+
+
+def _analyze(**fields):
+    status, body, headers = AnalyzerHandler.analyze_request(json.dumps({"source": SOURCE, **fields}).encode("utf-8"))
+    return status, json.loads(body), headers
+
+
+def test_columns_and_cursor_pages():
+    cache, AnalyzerHandler.cache = AnalyzerHandler.cache, ResultCache()
+    try:
+        report = CompilerAnalyzer().analyze(SOURCE)
+        status, data, headers = _analyze(structured=True, page_size=40)
+        assert status == HTTPStatus.OK and headers["X-Cache"] == "MISS"
+        lexical = data["lexical"]
+        assert set(lexical["columns"]) == {"kind", "value", "line", "column"}
+        assert (lexical["offset"], lexical["total"], len(lexical["columns"]["value"])) == (0, len(report.tokens), 40)
+        assert data["tokens_count"] == len(report.tokens)
+        assert set(data["semantic"]["columns"]) == {"level", "phase", "message", "line", "column", "suggestion"}
+        assert isinstance(data["parse_tree"], str) and "guided_feedback" in data
+
+        # Following the cursors gives back every token and IR row in order.
+        for field, expected in (
+            ("lexical", [(t.kind, t.value, t.line, t.column) for t in report.tokens]),
+            ("ir", [(i.op, i.arg1, i.arg2, i.result, i.comment) for i in report.ir]),
+        ):
+            page, rows = data[field], []
+            while True:
+                columns = page["columns"]
+                if field == "lexical":
+                    names = [page["kinds"][kind] for kind in columns["kind"]]
+                    rows.extend(zip(names, columns["value"], columns["line"], columns["column"]))
+                else:
+                    rows.extend(zip(*(columns[name] for name in ("op", "arg1", "arg2", "result", "comment"))))
+                if page["next"] is None:
+                    break
+                status, more, headers = _analyze(structured=True, page_size=40, cursor=page["next"])
+                assert status == HTTPStatus.OK and headers["X-Cache"] == "HIT" and list(more) == [field]
+                page = more[field]
+            assert rows == expected
+
+        status, data, _ = _analyze(structured=True, phases=["complexity"], cursor=lexical["next"])
+        assert status == HTTPStatus.BAD_REQUEST and "different source" in data["error"]
+        assert _analyze(structured=True, cursor="bm9wZQ")[0] == HTTPStatus.BAD_REQUEST
+        assert _analyze(structured=True, page_size=0)[0] == HTTPStatus.BAD_REQUEST
+        # The plain response is unchanged and cached separately.
+        status, data, headers = _analyze()
+        assert headers["X-Cache"] == "MISS" and data["lexical"].startswith("#   kind")
+    finally:
+        AnalyzerHandler.cache = cache
+
+
+def test_gzip_responses():
+    cache, AnalyzerHandler.cache = AnalyzerHandler.cache, ResultCache()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AnalyzerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def post(source, encoding):
+        request = urllib.request.Request(
+            base + "/api/analyze",
+            data=json.dumps({"source": source}).encode("utf-8"),
+            headers={"Accept-Encoding": encoding},
+            method="POST",
+        )
+        with urllib.request.urlopen(request) as response:
+            return response.headers, response.read()
+
+    try:
+        headers, plain = post(SOURCE, "identity")
+        assert headers["Content-Encoding"] is None
+        headers, body = post(SOURCE, "gzip, deflate")
+        assert headers["Content-Encoding"] == "gzip" and headers["Vary"] == "Accept-Encoding"
+        assert gzip.decompress(body) == plain and len(body) < len(plain) / 3
+        # Small responses are not worth compressing.
+        headers = {}
+        assert gzip_body(b'{"error": "source is required"}', headers, "gzip") == b'{"error": "source is required"}'
+        assert headers == {}
+        assert gzip_body(plain, headers, "gzip;q=0, identity") == plain
+    finally:
+        server.shutdown()
+        server.server_close()
+        AnalyzerHandler.cache = cache
+
+
+if __name__ == "__main__":
+    for test in (
+        test_columns_and_cursor_pages,
+        test_gzip_responses,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from compiler_analyzer import CompilerAnalyzer
+from server import AnalysisTimeout, Overloaded, WorkerPool, analyze_source
+
+ROOT = Path(__file__).resolve().parent
+SOURCE = "\n".join(path.read_text(encoding="utf-8") for path in sorted((ROOT / "samples").glob("*.c")))
+
+
+def test_workers_return_the_same_response_as_in_process_analysis():
+    with WorkerPool(1) as pool:
+        ok, body = pool.run(SOURCE)
+    assert ok
+    assert json.loads(body) == json.loads(json.dumps(analyze_source(CompilerAnalyzer(), SOURCE)))
+
+
+def test_timed_out_worker_is_killed_and_replaced():
+    with WorkerPool(1) as pool:
+        with pytest.raises(AnalysisTimeout):
+            pool.run(SOURCE, timeout=0.0001)
+        assert (pool.timeouts, pool.restarts) == (1, 1)
+        # The next request waits for the replacement worker and succeeds.
+        ok, body = pool.run(SOURCE)
+        assert ok and json.loads(body)["complexity"]
+
+
+
+def test_requests_fail_instead_of_hanging_when_no_worker_starts():
+    with WorkerPool(1, timeout=0.5) as pool:
+        # Replacements die before they report ready, so the pool shrinks to nothing.
+        pool._wait_ready = lambda worker: worker.process.kill()
+        with pytest.raises(AnalysisTimeout):
+            pool.run(SOURCE, timeout=0.0001)
+        with pytest.raises(Overloaded):
+            pool.run(SOURCE)
+        assert pool.map([SOURCE]) == [(False, b"no analysis worker became free within 0.5s")]
+        assert pool.stats() == {"workers": 1, "idle": 0, "timeouts": 1, "restarts": 1}
+
+
+if __name__ == "__main__":
+    for test in (
+        test_workers_return_the_same_response_as_in_process_analysis,
+        test_timed_out_worker_is_killed_and_replaced,
+        test_requests_fail_instead_of_hanging_when_no_worker_starts,
+    ):
+        test()
+        print(f"[PASS] {test.__name__}")